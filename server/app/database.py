@@ -4,7 +4,7 @@ import os
 # Always load .env from the project/server root
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -45,6 +45,37 @@ Base = declarative_base()
 def init_db():
     Base.metadata.create_all(bind=engine)
 
+
+def upgrade_schema():
+    """
+    Bring existing tables up to date with the models.
+
+    create_all() only creates missing tables, so columns and indexes added to
+    a model later would never reach an existing database. This adds missing
+    columns that are nullable or have a server default, and creates missing
+    indexes. Anything else (type changes, dropped columns) is left alone.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        with engine.begin() as conn:
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    print(f"Cannot add required column {table.name}.{column.name} without a server default")
+                    continue
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}'
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    ddl += f" DEFAULT {getattr(default, 'text', default)}"
+                conn.execute(text(ddl))
+                print(f"Added column {table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -1,14 +1,28 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import sys
 from . import models  # This imports all models from models/__init__.py
-from .database import engine, Base
+from .database import engine, Base, upgrade_schema
+from . import utils
+from .utils.cpu_pool import shutdown_cpu_pool
+from .utils.passwords import password_hasher
+from .utils.pdf_cache import pdf_cache
+from .utils.pdf_render import pdf_renderer
+from .utils.refresh_tokens import purge_refresh_tokens_periodically
+from .utils.token_revocations import sync_token_revocations_periodically
+from .utils.shares import sweep_shares_periodically
+from .utils.record_store import backfill_content_hashes
+from .utils.rate_limit import RateLimitMiddleware
+from .utils.uploads import RequestSizeLimitMiddleware
 from .routers import ocr, auth, collections, records, qr, doctor, patient, admin, public, hospitals, family
 
 # Initialize database tables
 try:
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
     print("Database tables created/verified successfully")
 except Exception as e:
     print(f"ERROR creating database tables: {e}")
@@ -17,14 +31,36 @@ except Exception as e:
         sys.exit(1)
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    purge_task = asyncio.create_task(purge_refresh_tokens_periodically())
+    sweep_task = asyncio.create_task(sweep_shares_periodically())
+    revocation_task = asyncio.create_task(sync_token_revocations_periodically())
+    backfill_task = asyncio.create_task(asyncio.to_thread(backfill_content_hashes))
+    pdf_renderer.start()
+    yield
+    purge_task.cancel()
+    sweep_task.cancel()
+    revocation_task.cancel()
+    backfill_task.cancel()
+    await utils.close_http_client()
+    shutdown_cpu_pool()
+    pdf_renderer.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Added before CORS so throttled and oversized-request responses still carry CORS headers
+app.add_middleware(RequestSizeLimitMiddleware)
+app.add_middleware(RateLimitMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"]
 )
 
 
@@ -55,5 +91,8 @@ def health_check():
         "database_configured": bool(SQLALCHEMY_DATABASE_URL),
         "database_type": "postgresql" if SQLALCHEMY_DATABASE_URL and "postgresql" in SQLALCHEMY_DATABASE_URL else "unknown",
         "environment": os.environ.get("ENV", "development"),
-        "port": os.environ.get("PORT", "8000")
+        "port": os.environ.get("PORT", "8000"),
+        "agent_registry": utils.agent_registry_stats,
+        "password_hashing": password_hasher.metrics(),
+        "pdf_rendering": {**pdf_renderer.metrics(), "cache": pdf_cache.metrics()}
     }
@@ -10,6 +10,9 @@ from .record import Record
 from .share import Share
 from .hospital import Hospital
 from .family import Family
+from .refresh_token import RefreshToken
+from .token_revocation import TokenRevocation
+from .ocr_job import OcrJobState
 
 __all__ = [
     "UserRole",
@@ -20,4 +23,7 @@ __all__ = [
     "Share",
     "Hospital",
     "Family",
+    "RefreshToken",
+    "TokenRevocation",
+    "OcrJobState",
 ]
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from datetime import datetime
+from ..database import Base
+
+
+class OcrJobState(Base):
+    __tablename__ = "ocr_jobs"
+    
+    # Progress and results of a background OCR job, readable from any worker
+    id = Column(String(36), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    collection_id = Column(String(36), nullable=True)
+    status = Column(String(20), nullable=False, default="queued")
+    total_files = Column(Integer, nullable=False, default=0)
+    processed_files = Column(Integer, nullable=False, default=0)
+    total_images = Column(Integer, nullable=False, default=0)  # Images and scanned PDF pages sent to OCR
+    processed_images = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    results = Column(Text, nullable=True)  # JSON list of per-file results
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True, index=True)
@@ -1,16 +1,26 @@
-from sqlalchemy import DateTime, Column, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import DateTime, Column, ForeignKey, Integer, String, Text, Index
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
+import hashlib
 import uuid
 from ..database import Base
 
 
+def record_content_hash(content: str) -> str:
+    """SHA-256 of record content, for duplicate lookups without comparing text."""
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
 class Record(Base):
     __tablename__ = "records"
+    __table_args__ = (
+        Index("ix_records_user_content_hash", "user_id", "content_hash"),
+    )
     
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
     filename = Column(String(255), nullable=False)
     content = Column(Text, nullable=False)  # Extracted text from OCR
+    content_hash = Column(String(64), nullable=True)  # Kept in sync with content by _hash_content
     file_size = Column(Integer, nullable=True)  # File size in bytes
     file_type = Column(String(50), nullable=True)  # MIME type
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -25,3 +35,10 @@ class Record(Base):
     owner = relationship("User", back_populates="records", foreign_keys=[user_id])
     creator = relationship("User", foreign_keys=[created_by_id])
     collection = relationship("Collection", back_populates="records")
+    
+    @validates("content")
+    def _hash_content(self, key, content):
+        # Runs on every assignment, including constructor kwargs, so all
+        # write paths (OCR, manual, doctor, updates, bulk inserts) keep it current
+        self.content_hash = record_content_hash(content)
+        return content
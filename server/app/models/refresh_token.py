@@ -0,0 +1,15 @@
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String
+from datetime import datetime
+from ..database import Base
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    
+    jti = Column(String(36), primary_key=True)  # Token ID (the "jti" claim)
+    session_id = Column(String(36), nullable=False, index=True)  # Rotation family shared by all tokens of a login
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    used = Column(Boolean, nullable=False, default=False)  # Exchanged for a new token pair
+    revoked = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -19,6 +19,11 @@ class Share(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     is_active = Column(Boolean, default=True)
+    expires_at = Column(DateTime, nullable=True, index=True)  # None: never expires
+    # Target, creator and expiry of an active share (see utils.shares); unique,
+    # so concurrent requests for the same link cannot both insert. Cleared
+    # when the share is deactivated.
+    reuse_key = Column(String(100), nullable=True, unique=True, index=True)
     
     # Relationships
     creator = relationship("User")
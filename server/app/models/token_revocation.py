@@ -0,0 +1,12 @@
+from sqlalchemy import Column, DateTime, Integer
+from datetime import datetime
+from ..database import Base
+
+
+class TokenRevocation(Base):
+    __tablename__ = "token_revocations"
+    
+    # No foreign key: deleted users keep their row until it is purged
+    user_id = Column(Integer, primary_key=True)
+    min_version = Column(Integer, nullable=False)  # Access tokens with a lower "ver" are rejected
+    revoked_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
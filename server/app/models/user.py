@@ -40,6 +40,9 @@ class User(Base):
     family_id = Column(Integer, ForeignKey("families.id"), nullable=True)  # User's family
     is_family_admin = Column(Boolean, default=False)  # Whether user is the family admin
     
+    # Bumped to revoke every token issued before a change to the user's access
+    token_version = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    
     # Relationships
     collections = relationship("Collection", back_populates="owner", cascade="all, delete-orphan", foreign_keys="Collection.user_id")
     records = relationship("Record", back_populates="owner", cascade="all, delete-orphan", foreign_keys="Record.user_id")
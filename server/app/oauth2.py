@@ -2,15 +2,20 @@ from datetime import datetime, timedelta
 from pathlib import Path
 import os
 import base64
+import uuid
 import pyotp
 
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 import jwt
-from sqlalchemy.orm import session
+from sqlalchemy.orm import session, object_session
 
 from . import database, models, schemas
+from .utils.totp import totp_verifier
+from .utils.refresh_tokens import get_refresh_token_store
+from .utils.user_cache import cache_user, get_cached_snapshot, get_cached_token_version, get_cached_user
+from .utils.token_revocations import record_revocation, is_token_revoked, DELETED_USER_VERSION
 
 load_dotenv()
 
@@ -35,9 +40,30 @@ def get_totp_provisioning_uri(username: str, secret: str):
 
 
 def verify_totp(secret: str, code: str):
-    """Verify the TOTP code against the secret"""
-    totp = pyotp.TOTP(secret)
-    return totp.verify(code)
+    """Verify the TOTP code against the secret (see utils.totp for login checks)"""
+    return totp_verifier.verify_secret(secret, code)
+
+
+def token_claims(user: models.User) -> dict:
+    """Claims identifying a user in access and refresh tokens"""
+    return {
+        "user_id": user.id,
+        "role": user.role,
+        "family_id": user.family_id,
+        "is_family_admin": bool(user.is_family_admin),
+        "ver": user.token_version or 0
+    }
+
+
+def revoke_tokens(user: models.User):
+    """Invalidate every token issued to the user so far (takes effect on commit)"""
+    user.token_version = (user.token_version or 0) + 1
+    record_revocation(object_session(user), user.id, user.token_version)
+
+
+def revoke_deleted_user(db: session, user_id: int):
+    """Reject every access token of a user being deleted (takes effect on commit)"""
+    record_revocation(db, user_id, DELETED_USER_VERSION)
 
 
 def create_access_token(data: dict):
@@ -58,7 +84,13 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 
-def create_refresh_token(data: dict):
+def create_refresh_token(data: dict, session_id: str = None):
+    """
+    Create a refresh token and record it in the refresh-token store.
+
+    Tokens rotated from an earlier one pass its ``session_id`` so that reuse
+    of any token in the chain can revoke the whole session.
+    """
     to_encode = data.copy()
     
     # Convert UserRole enum to string if present
@@ -69,9 +101,12 @@ def create_refresh_token(data: dict):
     to_encode.update({"token_type": "refresh"})
     
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    jti = str(uuid.uuid4())
+    session_id = session_id or str(uuid.uuid4())
+    to_encode.update({"exp": expire, "jti": jti, "sid": session_id})
 
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    get_refresh_token_store().add(jti, session_id, to_encode["user_id"], expire)
 
     return encoded_jwt
 
@@ -92,7 +127,11 @@ def verify_token(token: str, credentials_exception, expected_token_type=None):
         if expected_token_type and token_type != expected_token_type:
             raise credentials_exception
             
-        token_data = schemas.TokenData(id=int(id), role=role, token_type=token_type)
+        token_data = schemas.TokenData(
+            id=int(id), role=role, token_type=token_type, version=payload.get("ver"),
+            family_id=payload.get("family_id"), is_family_admin=payload.get("is_family_admin"),
+            jti=payload.get("jti"), session_id=payload.get("sid")
+        )
     except jwt.ExpiredSignatureError:
         raise credentials_exception
     except jwt.InvalidTokenError:
@@ -108,16 +147,121 @@ def verify_refresh_token(token: str, credentials_exception):
     return verify_token(token, credentials_exception, expected_token_type="refresh")
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: session = Depends(database.get_db)
-):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail=f"Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    token_data = verify_access_token(token, credentials_exception)
+
+
+def load_user(db: session, token_data: schemas.TokenData, credentials_exception, use_cache: bool = True):
+    """
+    Load the user a token was issued to, from the user cache or the database.
+
+    Pass ``use_cache=False`` when the caller modifies the user: a cached
+    snapshot can be stale (changes made on another worker) or belong to a
+    user deleted since, and flushing it would write the stale values back.
+    """
+    if is_token_revoked(token_data.id, token_data.version):
+        raise credentials_exception
+    if use_cache:
+        user = get_cached_user(db, token_data.id, token_data.version)
+        if user is not None:
+            return user
+
     user = db.query(models.User).filter(models.User.id == token_data.id).first()
     if user is None:
         raise credentials_exception
+    # Tokens issued before the user's access changed are revoked
+    if token_data.version is not None and token_data.version != (user.token_version or 0):
+        raise credentials_exception
+    cache_user(user)
     return user
+
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme), db: session = Depends(database.get_db)
+):
+    token_data = verify_access_token(token, _credentials_exception())
+    return load_user(db, token_data, _credentials_exception())
+
+
+def get_current_user_for_update(
+    token: str = Depends(oauth2_scheme), db: session = Depends(database.get_db)
+):
+    """Like get_current_user, but always loads the user row, for endpoints that modify it"""
+    token_data = verify_access_token(token, _credentials_exception())
+    return load_user(db, token_data, _credentials_exception(), use_cache=False)
+
+
+def principal_for_user(user) -> schemas.Principal:
+    return schemas.Principal(
+        id=user.id,
+        role=user.role,
+        family_id=user.family_id,
+        is_family_admin=bool(user.is_family_admin),
+        version=user.token_version or 0
+    )
+
+
+def get_current_principal(
+    token: str = Depends(oauth2_scheme), db: session = Depends(database.get_db)
+) -> schemas.Principal:
+    """
+    Identify the caller without loading the user row.
+
+    Revoked tokens (below the user's minimum version) are rejected first.
+    Then uses the cached user when its version matches the token, otherwise
+    the token's claims. The database is consulted when the cached user has
+    a different version (either side may be stale) and for tokens issued
+    before claims were embedded.
+    """
+    credentials_exception = _credentials_exception()
+    token_data = verify_access_token(token, credentials_exception)
+    if is_token_revoked(token_data.id, token_data.version):
+        raise credentials_exception
+
+    snapshot = get_cached_snapshot(token_data.id, token_data.version)
+    if snapshot is not None:
+        return principal_for_user(models.User(**snapshot))
+
+    if (
+        token_data.role
+        and token_data.is_family_admin is not None
+        and get_cached_token_version(token_data.id) is None
+    ):
+        return schemas.Principal(
+            id=token_data.id,
+            role=token_data.role,
+            family_id=token_data.family_id,
+            is_family_admin=token_data.is_family_admin,
+            version=token_data.version,
+            from_token=True
+        )
+
+    return principal_for_user(load_user(db, token_data, credentials_exception))
+
+
+def require_role(*roles: models.UserRole, detail: str = "Not enough permissions"):
+    """
+    Build a dependency that admits only principals with one of ``roles``.
+
+    Token claims can predate a role change (e.g. a patient who just
+    registered as a doctor), so a rejection based on claims alone is
+    confirmed against the stored user before returning 403.
+    """
+    def dependency(
+        principal: schemas.Principal = Depends(get_current_principal),
+        db: session = Depends(database.get_db)
+    ) -> schemas.Principal:
+        if principal.role in roles:
+            return principal
+        if principal.from_token:
+            token_data = schemas.TokenData(id=principal.id, version=principal.version)
+            principal = principal_for_user(load_user(db, token_data, _credentials_exception()))
+            if principal.role in roles:
+                return principal
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+
+    return dependency
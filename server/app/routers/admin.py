@@ -1,27 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List, Optional
+from typing import List, Optional, Union
 from .. import models, schemas, utils, oauth2, database
+from ..utils.loaders import collections_response, COLLECTION_VIEW_PATTERN
+from ..utils.user_cache import invalidate_user_cache
+from ..utils.passwords import password_hasher
+from ..utils.refresh_tokens import get_refresh_token_store
+from ..utils.share_cache import invalidate_shared_collection, invalidate_shared_record, share_cache
+from ..utils.shares import owned_share_targets
 
 router = APIRouter(
     prefix="/admin",
     tags=["Admin"]
 )
 
-# Admin dependency
-def get_admin_user(current_user: models.User = Depends(oauth2.get_current_user)):
-    if current_user.role != models.UserRole.ADMIN:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
-        )
-    return current_user
+# Admin dependency (checked from token claims, no user lookup)
+get_admin_user = oauth2.require_role(models.UserRole.ADMIN, detail="Admin access required")
 
 @router.get("/dashboard", response_model=schemas.AdminStats)
 def get_admin_dashboard(
     db: Session = Depends(database.get_db),
-    admin_user: models.User = Depends(get_admin_user)
+    admin_user: schemas.Principal = Depends(get_admin_user)
 ):
     """Get admin dashboard statistics"""
     try:
@@ -63,7 +63,7 @@ def get_all_users(
     role: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
     db: Session = Depends(database.get_db),
-    admin_user: models.User = Depends(get_admin_user)
+    admin_user: schemas.Principal = Depends(get_admin_user)
 ):
     """Get all users with pagination and filtering"""
     try:
@@ -95,7 +95,7 @@ def get_all_users(
 def get_user_by_id(
     user_id: int,
     db: Session = Depends(database.get_db),
-    admin_user: models.User = Depends(get_admin_user)
+    admin_user: schemas.Principal = Depends(get_admin_user)
 ):
     """Get detailed user information"""
     user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -110,7 +110,7 @@ def get_user_by_id(
 def create_user(
     user_data: schemas.AdminUserCreate,
     db: Session = Depends(database.get_db),
-    admin_user: models.User = Depends(get_admin_user)
+    admin_user: schemas.Principal = Depends(get_admin_user)
 ):
     """Create a new user with any role"""
     try:
@@ -122,7 +122,7 @@ def create_user(
             raise HTTPException(status_code=400, detail="Username already taken")
 
         # Hash password
-        hashed_password = utils.hash(user_data.password)
+        hashed_password = password_hasher.hash(user_data.password)
         
         # Create user
         new_user = models.User(
@@ -164,7 +164,7 @@ def update_user(
     user_id: int,
     user_data: schemas.AdminUserUpdate,
     db: Session = Depends(database.get_db),
-    admin_user: models.User = Depends(get_admin_user)
+    admin_user: schemas.Principal = Depends(get_admin_user)
 ):
     """Update any user's information"""
     try:
@@ -179,8 +179,13 @@ def update_user(
         update_data = user_data.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(user, field, value)
+        if "role" in update_data:
+            oauth2.revoke_tokens(user)
         
         db.commit()
+        if "role" in update_data:
+            get_refresh_token_store().revoke_user(user.id)
+        invalidate_user_cache(user.id)
         db.refresh(user)
         return user
     except HTTPException:
@@ -196,7 +201,7 @@ def update_user(
 def delete_user(
     user_id: int,
     db: Session = Depends(database.get_db),
-    admin_user: models.User = Depends(get_admin_user)
+    admin_user: schemas.Principal = Depends(get_admin_user)
 ):
     """Delete any user account"""
     try:
@@ -214,8 +219,13 @@ def delete_user(
                 detail="Cannot delete your own admin account"
             )
         
+        oauth2.revoke_deleted_user(db, user.id)
+        shared_targets = owned_share_targets(db, user.id)
         db.delete(user)
         db.commit()
+        share_cache.invalidate(*shared_targets)
+        get_refresh_token_store().revoke_user(user_id)
+        invalidate_user_cache(user_id)
         
         return {"message": f"User {user.username} deleted successfully"}
     except HTTPException:
@@ -232,7 +242,7 @@ def update_user_role(
     user_id: int,
     role_data: schemas.RoleUpdateRequest,
     db: Session = Depends(database.get_db),
-    admin_user: models.User = Depends(get_admin_user)
+    admin_user: schemas.Principal = Depends(get_admin_user)
 ):
     """Update a user's role"""
     try:
@@ -257,8 +267,11 @@ def update_user_role(
         if role_data.new_role == models.UserRole.DOCTOR:
             user.resume_verification_status = True
             user.resume_verification_confidence = 100
+        oauth2.revoke_tokens(user)
         
         db.commit()
+        get_refresh_token_store().revoke_user(user.id)
+        invalidate_user_cache(user.id)
         db.refresh(user)
         
         return user
@@ -271,17 +284,18 @@ def update_user_role(
             detail=f"Error updating user role: {str(e)}"
         )
 
-@router.get("/collections", response_model=List[schemas.CollectionResponse])
+@router.get("/collections", response_model=Union[List[schemas.CollectionResponse], List[schemas.CollectionListItem]])
 def get_all_collections(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    view: str = Query("full", pattern=COLLECTION_VIEW_PATTERN, description="`summary` returns record counts instead of records"),
     db: Session = Depends(database.get_db),
-    admin_user: models.User = Depends(get_admin_user)
+    admin_user: schemas.Principal = Depends(get_admin_user)
 ):
     """Get all collections across all users"""
     try:
-        collections = db.query(models.Collection).offset(skip).limit(limit).all()
-        return collections
+        query = db.query(models.Collection).order_by(models.Collection.created_at.desc()).offset(skip).limit(limit)
+        return collections_response(db, query, view)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -293,7 +307,7 @@ def get_all_records(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(database.get_db),
-    admin_user: models.User = Depends(get_admin_user)
+    admin_user: schemas.Principal = Depends(get_admin_user)
 ):
     """Get all records across all users"""
     try:
@@ -309,7 +323,7 @@ def get_all_records(
 def delete_collection(
     collection_id: str,
     db: Session = Depends(database.get_db),
-    admin_user: models.User = Depends(get_admin_user)
+    admin_user: schemas.Principal = Depends(get_admin_user)
 ):
     """Delete any collection"""
     try:
@@ -322,6 +336,7 @@ def delete_collection(
         
         db.delete(collection)
         db.commit()
+        invalidate_shared_collection(collection_id)
         
         return {"message": f"Collection {collection.name} deleted successfully"}
     except HTTPException:
@@ -337,7 +352,7 @@ def delete_collection(
 def delete_record(
     record_id: str,
     db: Session = Depends(database.get_db),
-    admin_user: models.User = Depends(get_admin_user)
+    admin_user: schemas.Principal = Depends(get_admin_user)
 ):
     """Delete any record"""
     try:
@@ -348,8 +363,10 @@ def delete_record(
                 detail="Record not found"
             )
         
+        collection_id = record.collection_id
         db.delete(record)
         db.commit()
+        invalidate_shared_record(record_id, collection_id)
         
         return {"message": f"Record {record.filename} deleted successfully"}
     except HTTPException:
@@ -4,6 +4,12 @@ from sqlalchemy.orm import Session
 import qrcode
 import io
 from .. import models, schemas, utils, oauth2, database
+from ..utils.user_cache import invalidate_user_cache
+from ..utils.passwords import password_hasher
+from ..utils.totp import totp_verifier
+from ..utils.refresh_tokens import get_refresh_token_store, ROTATED
+from ..utils.share_cache import share_cache
+from ..utils.shares import owned_share_targets
 
 router = APIRouter(tags=["Authentication"])
 
@@ -18,7 +24,7 @@ def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
         raise HTTPException(status_code=400, detail="Username already taken")
 
     # Override any role in the request - all users start as patients
-    hashed_password = utils.hash(user.password)    
+    hashed_password = password_hasher.hash(user.password)
     new_user = models.User(
         email=user.email,
         username=user.username,
@@ -39,8 +45,8 @@ def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
     db.refresh(new_user)
     
     # Generate tokens
-    access_token = oauth2.create_access_token(data={"user_id": new_user.id, "role": new_user.role})
-    refresh_token = oauth2.create_refresh_token(data={"user_id": new_user.id, "role": new_user.role})
+    access_token = oauth2.create_access_token(data=oauth2.token_claims(new_user))
+    refresh_token = oauth2.create_refresh_token(data=oauth2.token_claims(new_user))
     
     return {
         "access_token": access_token, 
@@ -57,13 +63,20 @@ def login(
 ):
     """Login endpoint that works with both Swagger UI and API clients"""
     user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not utils.verify(form_data.password, user.password):
+    valid, new_hash = password_hasher.verify(form_data.password, user.password if user else None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Upgrade hashes made with an older cost factor
+    if new_hash:
+        user.password = new_hash
+        db.commit()
+        invalidate_user_cache(user.id)
+    
     # Check if 2FA is enabled for this user
     if user.totp_enabled:
         return {
@@ -72,8 +85,8 @@ def login(
         }
     
     # If 2FA is not enabled, proceed with normal login
-    access_token = oauth2.create_access_token(data={"user_id": user.id, "role": user.role})
-    refresh_token = oauth2.create_refresh_token(data={"user_id": user.id, "role": user.role})
+    access_token = oauth2.create_access_token(data=oauth2.token_claims(user))
+    refresh_token = oauth2.create_refresh_token(data=oauth2.token_claims(user))
     
     return {
         "access_token": access_token,
@@ -90,6 +103,15 @@ def verify_totp(
     db: Session = Depends(database.get_db)
 ):
     """Verify TOTP code and complete login if successful"""
+    # Throttled and malformed attempts are rejected before any database work
+    totp_verifier.check_rate_limit(user_id)
+    if not totp_verifier.is_well_formed(totp_data.totp_code):
+        totp_verifier.record_failure(user_id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid TOTP code"
+        )
+    
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(
@@ -104,15 +126,15 @@ def verify_totp(
         )
     
     # Verify the TOTP code
-    if not oauth2.verify_totp(user.totp_secret, totp_data.totp_code):
+    if not totp_verifier.verify(user.id, user.totp_secret, totp_data.totp_code):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid TOTP code"
         )
     
     # Code is valid, generate tokens
-    access_token = oauth2.create_access_token(data={"user_id": user.id, "role": user.role})
-    refresh_token = oauth2.create_refresh_token(data={"user_id": user.id, "role": user.role})
+    access_token = oauth2.create_access_token(data=oauth2.token_claims(user))
+    refresh_token = oauth2.create_refresh_token(data=oauth2.token_claims(user))
     
     return {
         "access_token": access_token,
@@ -125,7 +147,7 @@ def verify_totp(
 def setup_totp(
     response_format: str = "json",
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: models.User = Depends(oauth2.get_current_user_for_update)
 ):
     """Generate and setup TOTP for a user
     
@@ -144,6 +166,7 @@ def setup_totp(
     # Store the secret but don't enable it yet (verification required)
     current_user.totp_secret = totp_secret
     db.commit()
+    invalidate_user_cache(current_user.id)
     
     # Return QR code image if requested
     if response_format == "qrcode":
@@ -178,7 +201,7 @@ def setup_totp(
 def activate_totp(
     totp_data: schemas.TOTPVerify,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: models.User = Depends(oauth2.get_current_user_for_update)
 ):
     """Verify and activate TOTP for a user"""
     if not current_user.totp_secret:
@@ -188,7 +211,8 @@ def activate_totp(
         )
     
     # Verify the TOTP code
-    if not oauth2.verify_totp(current_user.totp_secret, totp_data.totp_code):
+    totp_verifier.check_rate_limit(current_user.id)
+    if not totp_verifier.verify(current_user.id, current_user.totp_secret, totp_data.totp_code):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid TOTP code"
@@ -197,6 +221,7 @@ def activate_totp(
     # Enable TOTP for the user
     current_user.totp_enabled = True
     db.commit()
+    invalidate_user_cache(current_user.id)
     
     return {"message": "TOTP successfully enabled"}
 
@@ -204,7 +229,7 @@ def activate_totp(
 def disable_totp(
     totp_data: schemas.TOTPDisable,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: models.User = Depends(oauth2.get_current_user_for_update)
 ):
     """Disable TOTP for a user"""
     if not current_user.totp_enabled:
@@ -214,7 +239,8 @@ def disable_totp(
         )
     
     # Verify the TOTP code one last time
-    if not oauth2.verify_totp(current_user.totp_secret, totp_data.totp_code):
+    totp_verifier.check_rate_limit(current_user.id)
+    if not totp_verifier.verify(current_user.id, current_user.totp_secret, totp_data.totp_code):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid TOTP code"
@@ -224,6 +250,7 @@ def disable_totp(
     current_user.totp_enabled = False
     current_user.totp_secret = None
     db.commit()
+    invalidate_user_cache(current_user.id)
     
     return {"message": "TOTP successfully disabled"}
 
@@ -237,8 +264,13 @@ def delete_user(
     user_obj = db.query(models.User).filter(models.User.id == current_user.id).first()
     if not user_obj:
         raise HTTPException(status_code=404, detail="User not found")
+    oauth2.revoke_deleted_user(db, user_obj.id)
+    shared_targets = owned_share_targets(db, user_obj.id)
     db.delete(user_obj)
     db.commit()
+    share_cache.invalidate(*shared_targets)
+    get_refresh_token_store().revoke_user(current_user.id)
+    invalidate_user_cache(current_user.id)
     return {"detail": "User deleted"}
 
 @router.put("/user", response_model=schemas.UserOut)
@@ -286,6 +318,7 @@ def update_user(
         user_obj.visit_date = user_update.visit_date
     
     db.commit()
+    invalidate_user_cache(user_obj.id)
     db.refresh(user_obj)
     return user_obj
 
@@ -301,14 +334,26 @@ def refresh_token(refresh_token: str, db: Session = Depends(database.get_db)):
     # Verify the refresh token
     token_data = oauth2.verify_refresh_token(refresh_token, credentials_exception)
     
+    # Each refresh token can be exchanged once; reuse revokes the session.
+    # Tokens without a jti predate rotation and cannot be tracked, so they
+    # are refused (the client logs in again).
+    if not token_data.jti:
+        raise credentials_exception
+    if get_refresh_token_store().consume(token_data.jti, token_data.id) != ROTATED:
+        raise credentials_exception
+    
     # Get the user from the database
     user = db.query(models.User).filter(models.User.id == token_data.id).first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    if token_data.version is not None and token_data.version != (user.token_version or 0):
+        raise credentials_exception
     
     # Generate new tokens
-    new_access_token = oauth2.create_access_token(data={"user_id": user.id})
-    new_refresh_token = oauth2.create_refresh_token(data={"user_id": user.id})
+    new_access_token = oauth2.create_access_token(data=oauth2.token_claims(user))
+    new_refresh_token = oauth2.create_refresh_token(
+        data=oauth2.token_claims(user), session_id=token_data.session_id
+    )
     
     return {
         "access_token": new_access_token,
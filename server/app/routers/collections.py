@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Union
 from ..database import get_db
-from ..models import Collection, Record, Share, User
-from ..schemas import CollectionCreate, CollectionResponse, RecordResponse, CollectionUpdate, MessageResponse, SharedCollectionResponse
+from ..models import Collection, Record, User
+from ..schemas import CollectionCreate, CollectionResponse, CollectionListItem, RecordResponse, CollectionUpdate, MessageResponse, SharedCollectionResponse
 from ..oauth2 import get_current_user
-from ..utils.family_auth import get_accessible_user_ids, can_access_user_records, can_modify_user_record
+from ..utils.family_auth import get_access_scope, can_access_user_records, can_modify_user_record
+from ..utils.loaders import collections_response, COLLECTION_VIEW_PATTERN
+from ..utils.shares import resolve_collection_share
+from ..utils.share_cache import share_cache, SharedPayload, COLLECTION, invalidate_shared_collection, invalidate_shared_record
 
 router = APIRouter(
     prefix='/collections',
@@ -30,10 +33,11 @@ async def create_collection(
     db.refresh(db_collection)
     return db_collection
 
-@router.get("/", response_model=List[CollectionResponse])
+@router.get("/", response_model=Union[List[CollectionResponse], List[CollectionListItem]])
 async def get_all_collections(
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    view: str = Query("full", pattern=COLLECTION_VIEW_PATTERN, description="`summary` returns record counts instead of records")
 ):
     """
     Get all collections accessible to the current user.
@@ -42,13 +46,13 @@ async def get_all_collections(
     - Doctors: see their patients' collections
     - Admins: see all collections
     """
-    accessible_user_ids = get_accessible_user_ids(current_user, db)
+    scope = get_access_scope(current_user)
     
-    collections = db.query(Collection).filter(
-        Collection.user_id.in_(accessible_user_ids)
-    ).all()
+    query = db.query(Collection).filter(
+        scope.filter(Collection.user_id)
+    )
     
-    return collections
+    return collections_response(db, query, view)
 
 @router.get("/{collection_id}", response_model=CollectionResponse)
 async def get_collection(
@@ -109,6 +113,7 @@ async def update_collection(
     db_collection.description = collection.description
     db.commit()
     db.refresh(db_collection)
+    invalidate_shared_collection(db_collection.id)
     return db_collection
 
 @router.patch("/{collection_id}", response_model=CollectionResponse)
@@ -146,6 +151,7 @@ async def update_collection_partial(
         
     db.commit()
     db.refresh(db_collection)
+    invalidate_shared_collection(db_collection.id)
     return db_collection
 
 @router.get("/{collection_id}/records", response_model=List[RecordResponse])
@@ -193,8 +199,10 @@ async def add_record_to_collection(
     if not record:
         raise HTTPException(status_code=404, detail="Record not found")
     
+    previous_collection_id = record.collection_id
     record.collection_id = collection_id
     db.commit()
+    invalidate_shared_record(record_id, previous_collection_id, collection_id)
     
     return {"message": "Record added to collection successfully"}
 
@@ -227,6 +235,7 @@ async def remove_record_from_collection(
     
     record.collection_id = None
     db.commit()
+    invalidate_shared_record(record_id, collection_id)
     
     return {"message": "Record removed from collection successfully"}
 
@@ -264,48 +273,42 @@ async def delete_collection(
     # Delete the collection
     db.delete(collection)
     db.commit()
+    invalidate_shared_collection(collection_id)
     
     return {"message": "Collection deleted successfully"}
 
 @router.get("/share/{share_token}", response_model=SharedCollectionResponse)
-async def access_shared_collection(
+def access_shared_collection(
     share_token: str,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Access a collection via secure share token (no auth required)"""
-    
-    # Find the share
-    share = db.query(Share).filter(
-        Share.share_token == share_token,
-        Share.is_active == True,
-        Share.collection_id.isnot(None)
-    ).first()
-    
-    if not share:
-        raise HTTPException(status_code=404, detail="Invalid or expired share link")
-    
-    # Get the collection
-    collection = db.query(Collection).filter(Collection.id == share.collection_id).first()
-    
-    if not collection:
-        raise HTTPException(status_code=404, detail="Collection not found")
-    
-    # Get records in collection
-    records = db.query(Record).filter(Record.collection_id == share.collection_id).all()
-    
-    return {
-        "collection": {
-            "id": collection.id,
-            "name": collection.name,
-            "description": collection.description,
-            "created_at": collection.created_at
+    payload = share_cache.get(COLLECTION, share_token)
+    if payload is not None:
+        return payload.response(request)
+    
+    collection, records = resolve_collection_share(db, share_token)
+    
+    payload = share_cache.set(share_token, SharedPayload(
+        COLLECTION,
+        collection.collection_id,
+        {
+            "collection": {
+                "id": collection.collection_id,
+                "name": collection.name,
+                "description": collection.description,
+                "created_at": collection.collection_created_at
+            },
+            "records": [
+                {
+                    "id": record.record_id,
+                    "filename": record.filename,
+                    "content": record.content,
+                    "created_at": record.record_created_at
+                } for record in records
+            ]
         },
-        "records": [
-            {
-                "id": record.id,
-                "filename": record.filename,
-                "content": record.content,
-                "created_at": record.created_at
-            } for record in records
-        ]
-    }
+        expires_at=collection.expires_at
+    ))
+    return payload.response(request)
@@ -1,7 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Union
 from .. import models, schemas, oauth2, database, utils
+from ..utils.record_store import bulk_create_records
+from ..utils.loaders import collections_response, COLLECTION_VIEW_PATTERN
+from ..utils.user_cache import invalidate_user_cache
+from ..utils.refresh_tokens import get_refresh_token_store
+
+require_doctor = oauth2.require_role(
+    models.UserRole.DOCTOR, detail="Access denied. Doctor privileges required."
+)
 
 router = APIRouter(
     tags=["Doctor"],
@@ -59,7 +67,7 @@ def get_doctor_dashboard(
 async def register_doctor(
     resume: UploadFile = File(...),
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: models.User = Depends(oauth2.get_current_user_for_update)
 ):
     """Register as a doctor with resume verification"""
     if current_user.role == models.UserRole.DOCTOR:
@@ -72,8 +80,8 @@ async def register_doctor(
         # Read the resume file content
         resume_content = await resume.read()
         
-        # Create and use the ResumeVerifierAgent
-        resume_verification_agent = utils.ResumeVerifierAgent()
+        # Use the shared ResumeVerifierAgent
+        resume_verification_agent = utils.get_agent(utils.ResumeVerifierAgent)
         
         # Get verification result from the agent
         verification_result = await resume_verification_agent.verify_resume(resume_content)
@@ -84,7 +92,12 @@ async def register_doctor(
             current_user.role = models.UserRole.DOCTOR
             current_user.resume_verification_status = True
             current_user.resume_verification_confidence = verification_result.confidence
+            # Other workers drop their cached patient snapshot via the revocation
+            oauth2.revoke_tokens(current_user)
             db.commit()
+            # Sessions started as a patient end with the role change
+            get_refresh_token_store().revoke_user(current_user.id)
+            invalidate_user_cache(current_user.id)
             db.refresh(current_user)
             
             return {
@@ -99,6 +112,7 @@ async def register_doctor(
             current_user.resume_verification_status = False
             current_user.resume_verification_confidence = verification_result.confidence
             db.commit()
+            invalidate_user_cache(current_user.id)
             db.refresh(current_user)
             
             return {
@@ -123,15 +137,9 @@ async def register_doctor(
 @router.get("/patients", response_model=List[schemas.PatientInfo])
 def get_doctor_patients(
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: schemas.Principal = Depends(require_doctor)
 ):
     """Get all patients assigned to the doctor"""
-    if current_user.role != models.UserRole.DOCTOR:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Doctor privileges required."
-        )
-    
     patients = db.query(models.User).filter(
         models.User.doctor_id == current_user.id
     ).all()
@@ -143,7 +151,7 @@ def get_doctor_patients(
 def update_doctor_info(
     doctor_update: schemas.DoctorInfoUpdate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: models.User = Depends(oauth2.get_current_user_for_update)
 ):
     """Update doctor-specific information"""
     if current_user.role != models.UserRole.DOCTOR:
@@ -163,6 +171,7 @@ def update_doctor_info(
         current_user.years_of_experience = doctor_update.years_of_experience
     
     db.commit()
+    invalidate_user_cache(current_user.id)
     db.refresh(current_user)
     return current_user
 
@@ -170,15 +179,9 @@ def update_doctor_info(
 def get_patient_records(
     patient_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: schemas.Principal = Depends(require_doctor)
 ):
     """Get all records for a specific patient (doctor only)"""
-    if current_user.role != models.UserRole.DOCTOR:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Doctor privileges required."
-        )
-    
     # Verify the patient is assigned to this doctor
     patient = db.query(models.User).filter(
         models.User.id == patient_id,
@@ -202,15 +205,9 @@ def get_patient_records(
 def create_collection_for_patient(
     collection_data: schemas.DoctorCollectionCreate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: schemas.Principal = Depends(require_doctor)
 ):
     """Create a collection for a patient (doctor only)"""
-    if current_user.role != models.UserRole.DOCTOR:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Doctor privileges required."
-        )
-    
     # Verify the patient is assigned to this doctor
     patient = db.query(models.User).filter(
         models.User.id == collection_data.patient_id,
@@ -287,26 +284,21 @@ def create_record_for_patient(
         collection_id=record_data.collection_id
     )
     
-    db.add(new_record)
+    bulk_create_records(db, [new_record])
     db.commit()
-    db.refresh(new_record)
+    new_record.creator = current_user
     
     return new_record
 
 
-@router.get("/patient/{patient_id}/collections", response_model=List[schemas.CollectionResponse])
+@router.get("/patient/{patient_id}/collections", response_model=Union[List[schemas.CollectionResponse], List[schemas.CollectionListItem]])
 def get_patient_collections(
     patient_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: schemas.Principal = Depends(require_doctor),
+    view: str = Query("full", pattern=COLLECTION_VIEW_PATTERN, description="`summary` returns record counts instead of records")
 ):
     """Get all collections for a specific patient (doctor only)"""
-    if current_user.role != models.UserRole.DOCTOR:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Doctor privileges required."
-        )
-    
     # Verify the patient is assigned to this doctor
     patient = db.query(models.User).filter(
         models.User.id == patient_id,
@@ -319,8 +311,8 @@ def get_patient_collections(
             detail="Patient not found or not assigned to you"
         )
     
-    collections = db.query(models.Collection).filter(
+    query = db.query(models.Collection).filter(
         models.Collection.user_id == patient_id
-    ).all()
+    )
     
-    return collections
+    return collections_response(db, query, view)
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Union
 from .. import models, schemas, oauth2, database
 from ..utils.family_auth import can_access_user_records
+from ..utils.loaders import collections_response, COLLECTION_VIEW_PATTERN
+from ..utils.user_cache import invalidate_user_cache
 
 router = APIRouter(
     prefix="/family",
@@ -15,7 +17,7 @@ router = APIRouter(
 def create_family(
     family: schemas.FamilyCreate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: models.User = Depends(oauth2.get_current_user_for_update)
 ):
     """
     Create a new family and set the current user as the family admin.
@@ -38,6 +40,7 @@ def create_family(
     current_user.family_id = new_family.id
     current_user.is_family_admin = True
     db.commit()
+    invalidate_user_cache(current_user.id)
     db.refresh(current_user)
     
     return new_family
@@ -120,6 +123,7 @@ def add_family_member(
     user_to_add.family_id = current_user.family_id
     user_to_add.is_family_admin = False
     db.commit()
+    invalidate_user_cache(user_to_add.id)
     
     return {"message": f"Successfully added {user_to_add.first_name} {user_to_add.last_name} to the family"}
 
@@ -167,6 +171,7 @@ def remove_family_member(
     user_to_remove.family_id = None
     user_to_remove.is_family_admin = False
     db.commit()
+    invalidate_user_cache(user_to_remove.id)
     
     return {"message": f"Successfully removed {user_to_remove.first_name} {user_to_remove.last_name} from the family"}
 
@@ -174,7 +179,7 @@ def remove_family_member(
 @router.post("/leave", response_model=schemas.MessageResponse)
 def leave_family(
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: models.User = Depends(oauth2.get_current_user_for_update)
 ):
     """
     Leave the current family.
@@ -209,11 +214,13 @@ def leave_family(
             db.delete(family)
         
         db.commit()
+        invalidate_user_cache(current_user.id)
         return {"message": "Successfully left the family. The family has been deleted."}
     
     # Regular member can leave
     current_user.family_id = None
     db.commit()
+    invalidate_user_cache(current_user.id)
     
     return {"message": "Successfully left the family"}
 
@@ -222,7 +229,7 @@ def leave_family(
 def transfer_admin_role(
     request: schemas.TransferFamilyAdminRequest,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: models.User = Depends(oauth2.get_current_user_for_update)
 ):
     """
     Transfer family admin role to another family member (current admin only).
@@ -260,6 +267,7 @@ def transfer_admin_role(
     current_user.is_family_admin = False
     new_admin.is_family_admin = True
     db.commit()
+    invalidate_user_cache(current_user.id, new_admin.id)
     
     return {"message": f"Successfully transferred admin role to {new_admin.first_name} {new_admin.last_name}"}
 
@@ -284,6 +292,7 @@ def delete_family(
     
     # Remove all members from the family
     members = db.query(models.User).filter(models.User.family_id == family_id).all()
+    member_ids = [member.id for member in members]
     for member in members:
         member.family_id = None
         member.is_family_admin = False
@@ -294,6 +303,7 @@ def delete_family(
         db.delete(family)
     
     db.commit()
+    invalidate_user_cache(*member_ids)
     
     return {"message": "Family has been deleted and all members have been removed"}
 
@@ -339,11 +349,12 @@ def get_family_member_records(
     return records
 
 
-@router.get("/members/{member_id}/collections", response_model=List[schemas.CollectionResponse])
+@router.get("/members/{member_id}/collections", response_model=Union[List[schemas.CollectionResponse], List[schemas.CollectionListItem]])
 def get_family_member_collections(
     member_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: models.User = Depends(oauth2.get_current_user),
+    view: str = Query("full", pattern=COLLECTION_VIEW_PATTERN, description="`summary` returns record counts instead of records")
 ):
     """
     Get all collections for a specific family member.
@@ -373,9 +384,9 @@ def get_family_member_collections(
             )
     
     # Get all collections for the member
-    collections = db.query(models.Collection).filter(
+    query = db.query(models.Collection).filter(
         models.Collection.user_id == member_id
-    ).order_by(models.Collection.created_at.desc()).all()
+    ).order_by(models.Collection.created_at.desc())
     
-    return collections
+    return collections_response(db, query, view)
 
@@ -13,15 +13,9 @@ router = APIRouter(
 def create_hospital(
     hospital: schemas.HospitalCreate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: schemas.Principal = Depends(oauth2.require_role(models.UserRole.ADMIN, detail="Only admins can create hospitals"))
 ):
     """Create a new hospital (Admin only)"""
-    if current_user.role != models.UserRole.ADMIN:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can create hospitals"
-        )
-    
     new_hospital = models.Hospital(**hospital.model_dump())
     db.add(new_hospital)
     db.commit()
@@ -33,7 +27,7 @@ def create_hospital(
 @router.get("/", response_model=List[schemas.HospitalResponse])
 def get_all_hospitals(
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: schemas.Principal = Depends(oauth2.get_current_principal)
 ):
     """Get all hospitals"""
     hospitals = db.query(models.Hospital).all()
@@ -44,7 +38,7 @@ def get_all_hospitals(
 def get_hospital(
     hospital_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: schemas.Principal = Depends(oauth2.get_current_principal)
 ):
     """Get a specific hospital by ID"""
     hospital = db.query(models.Hospital).filter(models.Hospital.id == hospital_id).first()
@@ -63,15 +57,9 @@ def update_hospital(
     hospital_id: int,
     hospital_update: schemas.HospitalUpdate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: schemas.Principal = Depends(oauth2.require_role(models.UserRole.ADMIN, detail="Only admins can update hospitals"))
 ):
     """Update a hospital (Admin only)"""
-    if current_user.role != models.UserRole.ADMIN:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can update hospitals"
-        )
-    
     hospital = db.query(models.Hospital).filter(models.Hospital.id == hospital_id).first()
     
     if not hospital:
@@ -95,15 +83,9 @@ def update_hospital(
 def delete_hospital(
     hospital_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: schemas.Principal = Depends(oauth2.require_role(models.UserRole.ADMIN, detail="Only admins can delete hospitals"))
 ):
     """Delete a hospital (Admin only)"""
-    if current_user.role != models.UserRole.ADMIN:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can delete hospitals"
-        )
-    
     hospital = db.query(models.Hospital).filter(models.Hospital.id == hospital_id).first()
     
     if not hospital:
@@ -121,15 +103,9 @@ def add_doctor_to_hospital(
     hospital_id: int,
     request: schemas.AddDoctorToHospitalRequest,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: schemas.Principal = Depends(oauth2.require_role(models.UserRole.ADMIN, detail="Only admins can add doctors to hospitals"))
 ):
     """Add a doctor to a hospital (Admin only)"""
-    if current_user.role != models.UserRole.ADMIN:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can add doctors to hospitals"
-        )
-    
     # Get hospital
     hospital = db.query(models.Hospital).filter(models.Hospital.id == hospital_id).first()
     if not hospital:
@@ -169,15 +145,9 @@ def remove_doctor_from_hospital(
     hospital_id: int,
     doctor_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: schemas.Principal = Depends(oauth2.require_role(models.UserRole.ADMIN, detail="Only admins can remove doctors from hospitals"))
 ):
     """Remove a doctor from a hospital (Admin only)"""
-    if current_user.role != models.UserRole.ADMIN:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can remove doctors from hospitals"
-        )
-    
     # Get hospital
     hospital = db.query(models.Hospital).filter(models.Hospital.id == hospital_id).first()
     if not hospital:
@@ -216,7 +186,7 @@ def remove_doctor_from_hospital(
 def get_hospital_doctors(
     hospital_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: schemas.Principal = Depends(oauth2.get_current_principal)
 ):
     """Get all doctors affiliated with a hospital"""
     hospital = db.query(models.Hospital).filter(models.Hospital.id == hospital_id).first()
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from typing import List, Optional
 from sqlalchemy.orm import Session
-from ..schemas import RecordResponse, OcrResponseGemini
+from ..schemas import RecordResponse, OcrResponseGemini, OcrJobStatus
 from ..models import Record
 from ..database import get_db
 from ..oauth2 import get_current_user
-from ..utils import MarkupAgent, merge_texts, OcrAgent
-import asyncio
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-import multiprocessing
+from ..utils import MarkupAgent, merge_texts, OcrAgent, OCR_DEFAULT_ENGINE
+from ..utils.ocr_pipeline import run_ocr
+from ..utils.record_store import bulk_create_records
+from ..utils.ocr_jobs import OcrJob, JobQueueFull, get_job_backend
+from ..utils.uploads import ingest_uploads, close_uploads, OCR_CONTENT_TYPES
+from ..utils.rate_limit import charge
+from functools import partial
 
 router = APIRouter(
     prefix='/ocr',
@@ -22,62 +27,83 @@ def testing():
 
 @router.post("/images-to-text", response_model=List[dict])
 async def image_to_text(
+    request: Request,
     files: List[UploadFile] = File(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
-    collection_id: Optional[str] = None
+    collection_id: Optional[str] = None,
+    async_mode: bool = False,
+    engine: str = Query(OCR_DEFAULT_ENGINE, pattern="^(auto|gemini|tesseract)$"),
+    pdf_mode: str = Query("merge", pattern="^(merge|pages)$")
 ):
-    try:
-        # Validate and read all files
-        image_bytes = []
-        file_info = []
-        for file in files:
-            if file.content_type and not (file.content_type.startswith('image/') or file.content_type == 'application/octet-stream'):
-                raise HTTPException(status_code=400, detail=f"File {file.filename} is not an image")
-            content = await file.read()
-            if not content:
-                raise HTTPException(status_code=400, detail=f"File {file.filename} is empty")
-            image_bytes.append(content)
-            file_info.append({
-                'filename': file.filename,
-                'file_size': len(content),
-                'file_type': file.content_type
-            })
+    """
+    Extract text from uploaded images and PDFs and save them as records.
+
+    With `async_mode=true` the upload is queued and a job is returned
+    immediately (HTTP 202); poll `/ocr/jobs/{job_id}` for progress.
 
-        ocr_agent = OcrAgent()
-        gemini_results = await ocr_agent.generate_text_from_images(image_bytes)
+    `engine` selects the OCR engine: `gemini` (remote model), `tesseract`
+    (local, fastest for clean printed documents) or `auto` (remote, falling
+    back to Tesseract if the model fails or times out, and for any image the
+    model could not read).
 
-        response = []
-        records_to_add = []
-        for i, info in enumerate(file_info):
-            gemini = gemini_results[i] if i < len(gemini_results) else None
-            markup = gemini.content if gemini else ''
-            confidence = gemini.confidence if gemini else 0.0
-            record = Record(
-                filename=info['filename'],
-                content=markup,
-                file_size=info['file_size'],
-                file_type=info['file_type'],
-                user_id=current_user.id,
-                created_by_id=current_user.id,
-                collection_id=collection_id
+    PDF pages with a text layer are read directly; only scanned pages are
+    OCR'd. `pdf_mode=merge` saves each PDF as one record, `pdf_mode=pages`
+    saves one record per page.
+    """
+    # The rate limiter took one unit on arrival; each further file costs one more
+    charge(request, len(files) - 1)
+    uploads = await ingest_uploads(files, allowed_prefixes=OCR_CONTENT_TYPES)
+    queued = False
+    try:
+        # Hand the pipeline zero-copy buffers over the spooled uploads
+        image_bytes = [upload.buffer() for upload in uploads]
+        file_info = [upload.info() for upload in uploads]
+
+        if async_mode:
+            job = OcrJob(
+                current_user.id, image_bytes, file_info, collection_id,
+                cleanup=partial(close_uploads, uploads), engine=engine, pdf_mode=pdf_mode
+            )
+            try:
+                get_job_backend().submit(job)
+            except JobQueueFull:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="OCR queue is full, please retry later",
+                    headers={"Retry-After": "30"}
+                )
+            queued = True
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content=jsonable_encoder(OcrJobStatus(**job.to_dict()))
             )
-            records_to_add.append(record)
-            response.append({
-                'filename': info['filename'],
-                'content': markup,
-                'file_size': info['file_size'],
-                'file_type': info['file_type'],
-                'user_id': current_user.id,
-                'collection_id': collection_id,
-                'confidence': confidence
-            })
-        db.add_all(records_to_add)
+
+        records_to_add, response = await run_ocr(
+            image_bytes, file_info, current_user.id, collection_id,
+            engine=engine, pdf_mode=pdf_mode
+        )
+        bulk_create_records(db, [record for record in records_to_add if record is not None])
         db.commit()
-        for record in records_to_add:
-            db.refresh(record)
         return response
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         print(f"Error processing images: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Image-to-text processing failed: {str(e)}")
+    finally:
+        if not queued:
+            close_uploads(uploads)
+
+
+@router.get("/jobs/{job_id}", response_model=OcrJobStatus)
+def get_ocr_job(
+    job_id: str,
+    current_user = Depends(get_current_user)
+):
+    """Get the progress and per-file results of a background OCR job"""
+    job = get_job_backend().get(job_id)
+    if not job or job["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="OCR job not found")
+    return job
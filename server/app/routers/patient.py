@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from .. import models, schemas, oauth2, database
+from ..utils.user_cache import invalidate_user_cache
 
 router = APIRouter(
     prefix="/patient",
@@ -13,7 +14,7 @@ router = APIRouter(
 def assign_doctor(
     doctor_request: schemas.AssignDoctorRequest,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: models.User = Depends(oauth2.get_current_user_for_update)
 ):
     """Assign a doctor to the current patient"""
     # Check if user is a patient
@@ -39,6 +40,7 @@ def assign_doctor(
         # Assign the doctor to the patient
         current_user.doctor_id = doctor.id
         db.commit()
+        invalidate_user_cache(current_user.id)
         db.refresh(current_user)
         
         return {
@@ -89,7 +91,7 @@ def get_my_doctor(
 @router.delete("/remove-doctor", response_model=schemas.MessageResponse)
 def remove_doctor(
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: models.User = Depends(oauth2.get_current_user_for_update)
 ):
     """Remove the assigned doctor from the current patient"""
     # Check if user is a patient
@@ -108,6 +110,7 @@ def remove_doctor(
         
         current_user.doctor_id = None
         db.commit()
+        invalidate_user_cache(current_user.id)
         
         return {"message": "Doctor successfully removed from your account"}
     
@@ -1,12 +1,12 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
 from sqlalchemy.orm import Session
-from ..utils import make_qr
+from typing import Optional
+from ..utils.shares import get_or_create_share
+from ..utils.qr_render import qr_renderer, qr_response, QR_FORMAT_PATTERN, QR_ERROR_CORRECTION_PATTERN
 from ..schemas import LinkInput
-from ..models import Collection, Record, Share
+from ..models import Collection, Record
 from ..database import get_db
 from ..oauth2 import get_current_user
-import io
 import os
 
 router = APIRouter(
@@ -16,7 +16,12 @@ router = APIRouter(
 
 
 @router.post("/get-qr")
-async def get_qr(link: LinkInput):
+async def get_qr(
+    link: LinkInput,
+    format: str = Query("png", pattern=QR_FORMAT_PATTERN, description="`svg` is much smaller than `png`"),
+    box_size: int = Query(10, ge=1, le=40),
+    error_correction: str = Query("L", pattern=QR_ERROR_CORRECTION_PATTERN),
+):
     """
     Generates a QR code for the provided link.
     """
@@ -24,11 +29,8 @@ async def get_qr(link: LinkInput):
         raise HTTPException(status_code=400, detail="Link is required")
 
     try:
-        img = make_qr(link.link)
-        img_bytes = io.BytesIO()
-        img.save(img_bytes, format='PNG')
-        img_bytes.seek(0)  # Reset pointer to beginning
-        return StreamingResponse(img_bytes, media_type='image/png', headers={"Content-Disposition": "attachment; filename=qr_code.png"})
+        data = await qr_renderer.render(link.link, format, box_size, error_correction)
+        return qr_response(data, format, "qr_code")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating QR code: {str(e)}")
 
@@ -36,6 +38,10 @@ async def get_qr(link: LinkInput):
 @router.post("/collection/{collection_id}")
 async def create_collection_qr(
     collection_id: str,
+    format: str = Query("png", pattern=QR_FORMAT_PATTERN, description="`svg` is much smaller than `png`"),
+    box_size: int = Query(10, ge=1, le=40),
+    error_correction: str = Query("L", pattern=QR_ERROR_CORRECTION_PATTERN),
+    expires_in_days: Optional[int] = Query(None, ge=1, le=365, description="Expire the share link after this many days"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -50,30 +56,21 @@ async def create_collection_qr(
     if not collection:
         raise HTTPException(status_code=404, detail="Collection not found")
     
-    # Create a share record
-    share = Share(
+    # Reuse the user's active share of this collection with the same expiry, or create one
+    share = get_or_create_share(
+        db,
+        created_by=current_user.id,
         collection_id=collection_id,
-        created_by=current_user.id
+        expires_in_days=expires_in_days
     )
-    db.add(share)
-    db.commit()
-    db.refresh(share)
     
     # Use frontend URL for QR code
     frontend_base_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
     share_url = f"{frontend_base_url}/collections/share?token={share.share_token}"
     
     try:
-        img = make_qr(share_url)
-        img_bytes = io.BytesIO()
-        img.save(img_bytes, format='PNG')
-        img_bytes.seek(0)
-        
-        return StreamingResponse(
-            img_bytes, 
-            media_type='image/png',
-            headers={"Content-Disposition": f"attachment; filename=collection_{collection.name}_qr.png"}
-        )
+        data = await qr_renderer.render(share_url, format, box_size, error_correction)
+        return qr_response(data, format, f"collection_{collection.name}_qr")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating QR code: {str(e)}")
 
@@ -81,6 +78,10 @@ async def create_collection_qr(
 @router.post("/record/{record_id}")
 async def create_record_qr(
     record_id: str,
+    format: str = Query("png", pattern=QR_FORMAT_PATTERN, description="`svg` is much smaller than `png`"),
+    box_size: int = Query(10, ge=1, le=40),
+    error_correction: str = Query("L", pattern=QR_ERROR_CORRECTION_PATTERN),
+    expires_in_days: Optional[int] = Query(None, ge=1, le=365, description="Expire the share link after this many days"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -95,29 +96,20 @@ async def create_record_qr(
     if not record:
         raise HTTPException(status_code=404, detail="Record not found")
     
-    # Create a share record
-    share = Share(
+    # Reuse the user's active share of this record with the same expiry, or create one
+    share = get_or_create_share(
+        db,
+        created_by=current_user.id,
         record_id=record_id,
-        created_by=current_user.id
+        expires_in_days=expires_in_days
     )
-    db.add(share)
-    db.commit()
-    db.refresh(share)
     
     # Use frontend URL for QR code
     frontend_base_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
     share_url = f"{frontend_base_url}/records/share?token={share.share_token}"
     
     try:
-        img = make_qr(share_url)
-        img_bytes = io.BytesIO()
-        img.save(img_bytes, format='PNG')
-        img_bytes.seek(0)
-        
-        return StreamingResponse(
-            img_bytes, 
-            media_type='image/png',
-            headers={"Content-Disposition": f"attachment; filename=record_{record.filename}_qr.png"}
-        )
+        data = await qr_renderer.render(share_url, format, box_size, error_correction)
+        return qr_response(data, format, f"record_{record.filename}_qr")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating QR code: {str(e)}")
\ No newline at end of file
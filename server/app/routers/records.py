@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from typing import List, Optional, Union
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session, joinedload, defer
 from .. import schemas, models, database, oauth2, utils
-from fastapi.responses import StreamingResponse
-import io
-from ..utils import markdown_to_pdf_bytes, MarkupAgent
-from ..utils.family_auth import get_accessible_user_ids, can_access_user_records, can_modify_user_record
+from ..utils import MarkupAgent
+from ..utils.shares import resolve_record_share
+from ..utils.share_cache import share_cache, SharedPayload, RECORD, invalidate_shared_record
+from ..utils.pdf_cache import pdf_response
+from ..utils.family_auth import get_access_scope, can_access_user_records, can_modify_user_record
+from ..utils.record_store import bulk_create_records
+from ..models.record import record_content_hash
+from ..utils.pagination import keyset_page, listing_etag, NEXT_CURSOR_HEADER
 from datetime import datetime
 
 
@@ -14,25 +19,54 @@ router = APIRouter(
     tags=['records']
 )
 
-@router.get("/", response_model=List[schemas.RecordResponse])
+# Listing item schemas by projection; the listing builds its own response
+# (ETag, 304), so it serializes through these instead of response_model
+RECORD_LIST_ADAPTERS = {
+    "full": TypeAdapter(List[schemas.RecordResponse]),
+    "summary": TypeAdapter(List[schemas.RecordListItem]),
+}
+
+
+@router.get("/", response_model=List[Union[schemas.RecordResponse, schemas.RecordListItem]])
 def get_user_records(
+    request: Request,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    current_user: models.User = Depends(oauth2.get_current_user),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; omit to get every record"),
+    cursor: Optional[str] = Query(None, description="Value of the X-Next-Cursor header from the previous page"),
+    fields: str = Query("full", pattern="^(full|summary)$", description="`summary` leaves out the record content")
 ):
     """
-    Get all records accessible to the current user.
+    Get records accessible to the current user, newest first.
     - Regular users: see only their own records
     - Family admins: see all family members' records
     - Doctors: see their patients' records
     - Admins: see all records
+
+    Pass `limit` to page through the results; when more records exist the
+    response carries an `X-Next-Cursor` header to send back as `cursor`.
+    Responses have an ETag, so clients can revalidate with `If-None-Match`.
     """
-    accessible_user_ids = get_accessible_user_ids(current_user, db)
+    scope = get_access_scope(current_user)
     
-    records = db.query(models.Record).filter(
-        models.Record.user_id.in_(accessible_user_ids)
-    ).all()
-    
-    return records
+    query = db.query(models.Record).options(
+        joinedload(models.Record.creator)
+    ).filter(
+        scope.filter(models.Record.user_id)
+    )
+    if fields == "summary":
+        query = query.options(defer(models.Record.content))
+    records, next_cursor = keyset_page(query, models.Record, limit, cursor)
+    
+    headers = {"ETag": listing_etag(records, fields, limit, cursor), "Cache-Control": "private, no-cache"}
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    adapter = RECORD_LIST_ADAPTERS[fields]
+    body = adapter.dump_json(adapter.validate_python(records, from_attributes=True), by_alias=True)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.get("/{record_id}", response_model=schemas.RecordResponse)
@@ -104,6 +138,8 @@ def update_record(
         
     db.commit()
     
+    invalidate_shared_record(record.id, record.collection_id)
+    
     return {"message": "Record updated successfully"}
 
 @router.patch("/{record_id}/content", response_model=schemas.MessageResponse)
@@ -128,6 +164,8 @@ def update_record_content(
     record.content = content
     db.commit()
     
+    invalidate_shared_record(record.id, record.collection_id)
+    
     return {"message": "Record content updated successfully"}
 
 @router.delete("/{record_id}", response_model=schemas.MessageResponse)
@@ -159,14 +197,17 @@ def delete_record(
             detail="Not authorized to delete this record"
         )
     
+    collection_id = record.collection_id
     db.delete(record)
     db.commit()
+    invalidate_shared_record(record_id, collection_id)
     
     return {"message": "Record deleted successfully"}
 
 @router.get("/{record_id}/pdf")
 def get_record_pdf(
     record_id: str,
+    request: Request,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(oauth2.get_current_user)
 ):
@@ -193,101 +234,70 @@ def get_record_pdf(
             detail="Not authorized to access this record"
         )
     
-    pdf_bytes = markdown_to_pdf_bytes(record.content)
-    return StreamingResponse(io.BytesIO(pdf_bytes), media_type="application/pdf", headers={
-        "Content-Disposition": f"attachment; filename=record_{record_id}.pdf"
-    })
+    return pdf_response(request, record.content, f"record_{record_id}.pdf")
+
+def _resolve_shared_record(db: Session, share_token: str) -> SharedPayload:
+    """Load a record share (from the share cache when possible)"""
+    payload = share_cache.get(RECORD, share_token)
+    if payload is not None:
+        return payload
+    
+    record = resolve_record_share(db, share_token)
+    
+    return share_cache.set(share_token, SharedPayload(
+        RECORD,
+        record.id,
+        schemas.SharedRecordResponse(
+            id=record.id,
+            filename=record.filename,
+            content=record.content,
+            file_size=record.file_size,
+            file_type=record.file_type,
+            created_at=record.created_at
+        ),
+        expires_at=record.expires_at,
+        content=record.content,
+        filename=f"{record.filename or f'shared_record_{share_token[:8]}'}.pdf"
+    ))
 
 @router.get("/share/{share_token}", response_model=schemas.SharedRecordResponse)
-async def access_shared_record(
+def access_shared_record(
     share_token: str,
+    request: Request,
     db: Session = Depends(database.get_db)
 ):
     """Access a record via secure share token (no auth required)"""
-    
-    # Find the share
-    share = db.query(models.Share).filter(
-        models.Share.share_token == share_token,
-        models.Share.is_active == True,
-        models.Share.record_id.isnot(None)
-    ).first()
-    
-    if not share:
-        raise HTTPException(status_code=404, detail="Invalid or expired share link")
-    
-    # Get the record
-    record = db.query(models.Record).filter(models.Record.id == share.record_id).first()
-    
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    
-    return {
-        "id": record.id,
-        "filename": record.filename,
-        "content": record.content,
-        "file_size": record.file_size,
-        "file_type": record.file_type,
-        "created_at": record.created_at
-    }
+    return _resolve_shared_record(db, share_token).response(request)
 
 @router.get("/share/{share_token}/pdf")
-async def get_shared_record_pdf(
+def get_shared_record_pdf(
     share_token: str,
+    request: Request,
     db: Session = Depends(database.get_db)
 ):
     """Get a PDF file generated from a shared record's content (no auth required)"""
+    payload = _resolve_shared_record(db, share_token)
     
-    # Find the share
-    share = db.query(models.Share).filter(
-        models.Share.share_token == share_token,
-        models.Share.is_active == True,
-        models.Share.record_id.isnot(None)
-    ).first()
-    
-    if not share:
-        raise HTTPException(status_code=404, detail="Invalid or expired share link")
-    
-    # Get the record
-    record = db.query(models.Record).filter(models.Record.id == share.record_id).first()
-    
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    
-    # Generate PDF from markdown content
-    pdf_bytes = markdown_to_pdf_bytes(record.content)
-    return StreamingResponse(io.BytesIO(pdf_bytes), media_type="application/pdf", headers={
-        "Content-Disposition": f"attachment; filename={record.filename or f'shared_record_{share_token[:8]}'}.pdf"
-    })
+    # Generate PDF from markdown content (cached by content hash)
+    return pdf_response(request, payload.content, payload.filename)
 
 @router.post("/share/{share_token}/save", response_model=schemas.RecordResponse)
-async def save_shared_record(
+def save_shared_record(
     share_token: str,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(oauth2.get_current_user)
 ):
     """Save a shared record to the current user's account (creates a copy)"""
+    original_record = resolve_record_share(db, share_token)
     
-    # Find the share
-    share = db.query(models.Share).filter(
-        models.Share.share_token == share_token,
-        models.Share.is_active == True,
-        models.Share.record_id.isnot(None)
-    ).first()
-    
-    if not share:
-        raise HTTPException(status_code=404, detail="Invalid or expired share link")
-    
-    # Get the original record
-    original_record = db.query(models.Record).filter(models.Record.id == share.record_id).first()
-    
-    if not original_record:
-        raise HTTPException(status_code=404, detail="Record not found")
-    
-    # Check if user already has a copy of this record
-    existing_copy = db.query(models.Record).filter(
+    # Check if user already has a copy of this record (the user_id/content_hash
+    # index narrows the rows; the filename is only compared on those)
+    content_hash = original_record.content_hash or record_content_hash(original_record.content)
+    existing_copy = db.query(models.Record.id).filter(
         models.Record.user_id == current_user.id,
+        models.Record.content_hash == content_hash,
         models.Record.filename == f"Copy of {original_record.filename}",
-        models.Record.content == original_record.content
+        models.Record.id != original_record.id
     ).first()
     
     if existing_copy:
@@ -341,9 +351,9 @@ def create_manual_record(
             collection_id=record_data.collection_id
         )
         
-        db.add(new_record)
+        bulk_create_records(db, [new_record])
         db.commit()
-        db.refresh(new_record)
+        new_record.creator = current_user
         
         return new_record
     
@@ -7,6 +7,7 @@ This package contains all Pydantic schema definitions.
 from .auth import (
     Token,
     TokenData,
+    Principal,
     UserLogin,
     TOTPSetup,
     TOTPVerify,
@@ -31,6 +32,7 @@ from .record import (
     RecordUpdate,
     RecordOut,
     RecordResponse,
+    RecordListItem,
     RecordSummaryResponse,
     ManualRecordCreate,
     ManualRecordUpdate,
@@ -44,6 +46,7 @@ from .collection import (
     CollectionCreate,
     CollectionUpdate,
     CollectionResponse,
+    CollectionListItem,
     CollectionSummaryResponse,
     CollectionSummaryContent,
     DoctorCollectionCreate,
@@ -87,6 +90,8 @@ from .ocr import (
     MarkupResponse,
     FormattingRequest,
     OcrResponseGemini,
+    OcrJobFileResult,
+    OcrJobStatus,
 )
 
 # Share schemas
@@ -117,6 +122,7 @@ __all__ = [
     # Auth
     "Token",
     "TokenData",
+    "Principal",
     "UserLogin",
     "TOTPSetup",
     "TOTPVerify",
@@ -135,6 +141,7 @@ __all__ = [
     "RecordUpdate",
     "RecordOut",
     "RecordResponse",
+    "RecordListItem",
     "RecordSummaryResponse",
     "ManualRecordCreate",
     "ManualRecordUpdate",
@@ -145,6 +152,7 @@ __all__ = [
     "CollectionCreate",
     "CollectionUpdate",
     "CollectionResponse",
+    "CollectionListItem",
     "CollectionSummaryResponse",
     "CollectionSummaryContent",
     "DoctorCollectionCreate",
@@ -176,6 +184,8 @@ __all__ = [
     "MarkupResponse",
     "FormattingRequest",
     "OcrResponseGemini",
+    "OcrJobFileResult",
+    "OcrJobStatus",
     # Share
     "SharedCollectionResponse",
     "SharedRecordResponse",
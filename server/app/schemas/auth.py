@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from ..models import UserRole
 
 
 class Token(BaseModel):
@@ -11,7 +12,22 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     id: int | None = None
     token_type: str | None = None
-    role: str 
+    role: str | None = None
+    version: int | None = None
+    family_id: int | None = None
+    is_family_admin: bool | None = None
+    jti: str | None = None
+    session_id: str | None = None
+
+
+class Principal(BaseModel):
+    """The authenticated user as described by verified token claims"""
+    id: int
+    role: UserRole
+    family_id: int | None = None
+    is_family_admin: bool = False
+    version: int | None = None
+    from_token: bool = False  # Built from claims alone, not the stored user
 
 
 class UserLogin(BaseModel):
@@ -32,6 +32,20 @@ class CollectionResponse(CollectionBase):
         from_attributes = True
 
 
+class CollectionListItem(CollectionBase):
+    """Collection without its records, for listings (`view=summary`)"""
+    id: str
+    user_id: int
+    created_by_id: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+    creator: Optional[CreatorInfo] = None
+    record_count: int = 0
+    
+    class Config:
+        from_attributes = True
+
+
 class CollectionSummaryResponse(BaseModel):
     collection: CollectionResponse
     summaries: List[SummaryRecordResponse]
@@ -1,4 +1,5 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -19,3 +20,30 @@ class OcrResponseGemini(BaseModel):
     """Response schema for OCR processing"""
     content: str 
     confidence: float
+
+
+class OcrJobFileResult(BaseModel):
+    """Outcome of a single uploaded file within an OCR job"""
+    filename: Optional[str] = None
+    file_size: Optional[int] = None
+    file_type: Optional[str] = None
+    page: Optional[int] = None
+    record_id: Optional[str] = None
+    confidence: Optional[float] = None
+    error: Optional[str] = None
+
+
+class OcrJobStatus(BaseModel):
+    """Progress and results of a background OCR job"""
+    job_id: str
+    status: str
+    total_files: int
+    processed_files: int
+    total_images: int = 0  # Images and scanned PDF pages sent to OCR
+    processed_images: int = 0
+    collection_id: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    results: List[OcrJobFileResult] = []
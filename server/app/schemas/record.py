@@ -49,6 +49,23 @@ class RecordResponse(RecordBase):
         from_attributes = True
 
 
+class RecordListItem(BaseModel):
+    """Record without its content, for listings (`fields=summary`)"""
+    id: str
+    filename: str
+    file_size: Optional[int] = None
+    file_type: Optional[str] = None
+    user_id: int
+    created_by_id: Optional[int] = None
+    collection_id: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    creator: Optional[CreatorInfo] = None
+    
+    class Config:
+        from_attributes = True
+
+
 class RecordSummaryResponse(RecordResponse):
     original_record_id: Optional[str] = None
     original_filename: Optional[str] = None
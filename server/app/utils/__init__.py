@@ -1,10 +1,14 @@
-from typing import List
+from typing import Callable, List, Optional
 from passlib.context import CryptContext
 from pydantic_ai.models.gemini import GeminiModel
 from pydantic_ai import BinaryContent
 from pydantic_ai.agent import Agent
 from pydantic_ai.providers.google_gla import GoogleGLAProvider
 import os
+import asyncio
+import hashlib
+import threading
+import httpx
 import qrcode
 import io
 from dotenv import load_dotenv
@@ -15,6 +19,7 @@ from weasyprint import HTML, CSS
 import pytesseract
 from pypdf import PdfReader
 from app import schemas
+from app.utils.cpu_pool import run_in_cpu_pool
 
 load_dotenv()
 
@@ -23,12 +28,40 @@ if os.environ.get("DYNO"):  # Check if running on Heroku
     pytesseract.pytesseract.tesseract_cmd = "/app/.apt/usr/bin/tesseract"
     os.environ["TESSDATA_PREFIX"] = "/app/.apt/usr/share/tesseract-ocr/5/tessdata"
 
+# Batched OCR: images per model call, concurrent calls, and retries per chunk
+OCR_BATCH_SIZE = int(os.environ.get("OCR_BATCH_SIZE", 1))
+OCR_MAX_CONCURRENCY = int(os.environ.get("OCR_MAX_CONCURRENCY", 4))
+OCR_BATCH_RETRIES = int(os.environ.get("OCR_BATCH_RETRIES", 2))
+OCR_RETRY_BACKOFF_SECONDS = float(os.environ.get("OCR_RETRY_BACKOFF_SECONDS", 1.0))
+
+# Shared HTTP client for model calls (pooled, keep-alive)
+GEMINI_MODEL_NAME = os.environ.get("GEMINI_MODEL_NAME", "gemini-2.0-flash")
+AGENT_HTTP_MAX_CONNECTIONS = int(os.environ.get("AGENT_HTTP_MAX_CONNECTIONS", 20))
+AGENT_HTTP_MAX_KEEPALIVE = int(os.environ.get("AGENT_HTTP_MAX_KEEPALIVE", 10))
+AGENT_HTTP_TIMEOUT_SECONDS = float(os.environ.get("AGENT_HTTP_TIMEOUT_SECONDS", 120))
+
+# Local OCR: default engine and how long "auto" waits for the remote model
+OCR_ENGINES = ("auto", "gemini", "tesseract")
+OCR_DEFAULT_ENGINE = os.environ.get("OCR_DEFAULT_ENGINE", "auto")
+if OCR_DEFAULT_ENGINE not in OCR_ENGINES:
+    raise ValueError(f"OCR_DEFAULT_ENGINE must be one of {', '.join(OCR_ENGINES)}, got {OCR_DEFAULT_ENGINE!r}")
+OCR_REMOTE_TIMEOUT_SECONDS = float(os.environ.get("OCR_REMOTE_TIMEOUT_SECONDS", 60))
+
 if __name__ == "__main__":
     from schemas import MarkupResponse, OcrResponseGemini
 else:
     from app.schemas import MarkupResponse, OcrResponseGemini
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Raising the cost factor upgrades existing hashes on the next login: hashes
+# below min_rounds are flagged by needs_update/verify_and_update
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS
+)
 
 
 def hash(password: str):
@@ -40,34 +73,61 @@ def verify(plain_password, hashed_password):
 
 
 
-def make_qr(link: str):
+QR_ERROR_CORRECTION_LEVELS = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+
+
+def make_qr(link: str, box_size: int = 10, error_correction: str = "L", image_factory=None):
+    """
+    Builds a QR code image for a link.
+
+    :param link: The payload to encode.
+    :param box_size: Pixels per module (raster images only).
+    :param error_correction: One of L, M, Q or H.
+    :param image_factory: A qrcode image class (e.g. an SVG one); PIL by default.
+    :return: The qrcode image.
+    """
     qr = qrcode.QRCode(
         version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
+        error_correction=QR_ERROR_CORRECTION_LEVELS[error_correction],
+        box_size=box_size,
         border=4,
     )
     qr.add_data(link)
     qr.make(fit=True)
+    if image_factory is not None:
+        return qr.make_image(image_factory=image_factory)
     img = qr.make_image(fill_color="black", back_color="white")
     return img
 
 
-def markdown_to_pdf_bytes(markdown_text: str) -> bytes:
+PDF_STYLESHEET = """
+    body {
+        font-family: Arial, sans-serif;
+    }
+"""
+# Part of the rendered-PDF cache key: editing the stylesheet invalidates cached PDFs
+PDF_STYLESHEET_VERSION = hashlib.sha256(PDF_STYLESHEET.encode("utf-8")).hexdigest()[:12]
+
+
+def markdown_to_pdf_bytes(markdown_text: str, stylesheet: Optional[CSS] = None, font_config=None) -> bytes:
     """
     Converts Markdown text to PDF bytes.
 
     :param markdown_text: The Markdown content as a string.
+    :param stylesheet: A parsed PDF_STYLESHEET to reuse across calls.
+    :param font_config: The WeasyPrint FontConfiguration the stylesheet was parsed with.
     :return: PDF file as bytes.
     """
     html_content = markdown.markdown(markdown_text, extensions=["extra", "smarty"])
-    css = """
-        body {
-            font-family: Arial, sans-serif;
-        }
-    """
+    if stylesheet is None:
+        stylesheet = CSS(string=PDF_STYLESHEET, font_config=font_config)
     pdf_io = io.BytesIO()
-    HTML(string=html_content).write_pdf(pdf_io, stylesheets=[CSS(string=css)])
+    HTML(string=html_content).write_pdf(pdf_io, stylesheets=[stylesheet], font_config=font_config)
     return pdf_io.getvalue()
 
 
@@ -85,17 +145,149 @@ def merge_texts(texts: List[str], separator: str = "\n\n---\n\n") -> str:
     return separator.join(texts)
 
 
-class MarkupAgent:
-    def __init__(self):
-        self.model = GeminiModel(
-            "gemini-2.0-flash",
+def process_single_image_tesseract(
+    image_bytes: bytes,
+    filename: Optional[str] = None,
+    file_size: Optional[int] = None,
+    content_type: Optional[str] = None,
+) -> dict:
+    """
+    Extracts text from a single image with the local Tesseract engine.
+
+    Runs synchronously and is CPU-bound; call it through the CPU pool
+    (`run_in_cpu_pool`) from async code.
+
+    :param image_bytes: Encoded image bytes.
+    :param filename: Original filename, echoed back in the result.
+    :param file_size: File size in bytes, echoed back in the result.
+    :param content_type: MIME type, echoed back in the result.
+    :return: A dict with `extracted_text`, `confidence` (0-1) and `error` (None on success).
+    """
+    result = {
+        "filename": filename,
+        "file_size": file_size,
+        "file_type": content_type,
+        "extracted_text": "",
+        "confidence": 0.0,
+        "error": None,
+    }
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+        data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    except Exception as e:
+        result["error"] = str(e)
+        return result
+
+    # Rebuild the text line by line, with a blank line between paragraphs
+    paragraphs = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        word = word.strip()
+        if not word:
+            continue
+        paragraph = paragraphs.setdefault((data["block_num"][i], data["par_num"][i]), {})
+        paragraph.setdefault(data["line_num"][i], []).append(word)
+        confidence = float(data["conf"][i])
+        if confidence >= 0:
+            confidences.append(confidence)
+
+    result["extracted_text"] = "\n\n".join(
+        "\n".join(" ".join(words) for words in lines.values())
+        for lines in paragraphs.values()
+    )
+    if confidences:
+        result["confidence"] = round(sum(confidences) / len(confidences) / 100, 2)
+    return result
+
+
+_http_client: Optional[httpx.AsyncClient] = None
+_gemini_model: Optional[GeminiModel] = None
+_agents = {}
+_agents_lock = threading.Lock()
+agent_registry_stats = {"hits": 0, "misses": 0}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide HTTP client used for model calls.
+
+    Connections are pooled and kept alive, so repeated requests to the model
+    API reuse TLS sessions instead of handshaking every time.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(AGENT_HTTP_TIMEOUT_SECONDS, connect=10),
+            limits=httpx.Limits(
+                max_connections=AGENT_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=AGENT_HTTP_MAX_KEEPALIVE,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Closes the shared HTTP client (called on application shutdown)."""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
+
+def get_gemini_model() -> GeminiModel:
+    """Returns the process-wide Gemini model backed by the shared HTTP client."""
+    global _gemini_model
+    if _gemini_model is None:
+        _gemini_model = GeminiModel(
+            GEMINI_MODEL_NAME,
             provider=GoogleGLAProvider(
                 api_key=str(os.getenv("GEMINI_API_KEY")),
+                http_client=get_http_client(),
             ),
         )
+    return _gemini_model
+
+
+def get_agent(agent_cls):
+    """
+    Returns the process-wide instance of an agent class, creating it on first use.
+
+    Agents hold no per-request state, so a single instance (model, provider and
+    system prompt) is shared by all requests in the worker.
+
+    :param agent_cls: One of MarkupAgent, ResumeVerifierAgent, OcrAgent or TesseractOcrEngine.
+    :return: The shared instance of `agent_cls`.
+    """
+    with _agents_lock:
+        agent = _agents.get(agent_cls)
+        if agent is not None:
+            agent_registry_stats["hits"] += 1
+            return agent
+        agent_registry_stats["misses"] += 1
+        agent = agent_cls()
+        _agents[agent_cls] = agent
+        return agent
+
+
+class MarkupAgent:
+    def __init__(self):
+        self.model = get_gemini_model()
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
+        self.agent = Agent(
+            self.model,
+            result_type=List[MarkupResponse],
+            system_prompt=(
+                "You are a formatter. You will receive input containing multiple text excerpts that were separated using a specific separator. Format each text as well-structured Markdown, using headings, bullet points, and code blocks where appropriate. Organize the information for maximum readability. IMPORTANT: Do NOT change any content, do NOT add any new content, and do NOT delete any existing content. Preserve all original information exactly as provided - only format it using Markdown syntax."
+                "\n\nYou MUST return a list of objects. Each object MUST have a 'markup' field containing the formatted text."
+                "\n\nCRITICAL REQUIREMENT: You MUST return EXACTLY the same number of objects as input texts, in the same order."
+                "\n\nExample format for 3 input texts:"
+                "\n[{'markup': 'formatted text 1'}, {'markup': 'formatted text 2'}, {'markup': 'formatted text 3'}]"
+            ),
+        )
 
     async def generate_markup(
         self,
@@ -110,20 +302,8 @@ class MarkupAgent:
         :return: A list of MarkupResponse objects, each containing formatted text.
         """
 
-        agent = Agent(
-            self.model,
-            result_type=List[MarkupResponse],
-            system_prompt=(
-                "You are a formatter. You will receive input containing multiple text excerpts that were separated using a specific separator. Format each text as well-structured Markdown, using headings, bullet points, and code blocks where appropriate. Organize the information for maximum readability. IMPORTANT: Do NOT change any content, do NOT add any new content, and do NOT delete any existing content. Preserve all original information exactly as provided - only format it using Markdown syntax."
-                "\n\nYou MUST return a list of objects. Each object MUST have a 'markup' field containing the formatted text."
-                "\n\nCRITICAL REQUIREMENT: You MUST return EXACTLY the same number of objects as input texts, in the same order."
-                "\n\nExample format for 3 input texts:"
-                "\n[{'markup': 'formatted text 1'}, {'markup': 'formatted text 2'}, {'markup': 'formatted text 3'}]"
-            ),
-        )
-
         try:
-            response = await agent.run(merged_text)
+            response = await self.agent.run(merged_text)
             return response.output
 
         except Exception as e:
@@ -132,15 +312,23 @@ class MarkupAgent:
 
 class ResumeVerifierAgent:
     def __init__(self):
-        self.model = GeminiModel(
-            "gemini-2.0-flash",
-            provider=GoogleGLAProvider(
-                api_key=str(os.getenv("GEMINI_API_KEY")),
-            ),
-        )
+        self.model = get_gemini_model()
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
+        self.agent = Agent(
+            self.model,
+            result_type=schemas.ResumeVerifierResponse,
+            system_prompt=(
+                "You are a resume checker who is tasked with verifying the resume of doctors. "
+                "You must return True in the veridication_status field if the resume appears to be from a medical doctor, "
+                "or False if it does not appear to be from a medical doctor. "
+                "Look for medical degrees (MD, MBBS, DO), medical specializations, hospital experience, "
+                "clinical rotations, medical licenses, and other indicators of medical training. "
+                "You must also return a confidence score (0-100) indicating how confident you are in your assessment. "
+                "In the message field, provide a brief explanation of your decision."
+            ),
+        )
 
     async def verify_resume(self, resume) -> schemas.ResumeVerifierResponse:
         try:
@@ -160,7 +348,8 @@ class ResumeVerifierAgent:
                     # If PDF reading fails, try OCR
                     pdf_file.seek(0)  # Reset file pointer
 
-                    result = process_single_image_tesseract( #type: ignore
+                    result = await run_in_cpu_pool(
+                        process_single_image_tesseract,
                         resume, "resume.jpg", len(resume), "application/octet-stream"
                     )
                     resume_content = result.get("extracted_text", "")
@@ -186,22 +375,8 @@ class ResumeVerifierAgent:
                 message="Could not extract text from the resume",
             )
 
-        agent = Agent(
-            self.model,
-            result_type=schemas.ResumeVerifierResponse,
-            system_prompt=(
-                "You are a resume checker who is tasked with verifying the resume of doctors. "
-                "You must return True in the veridication_status field if the resume appears to be from a medical doctor, "
-                "or False if it does not appear to be from a medical doctor. "
-                "Look for medical degrees (MD, MBBS, DO), medical specializations, hospital experience, "
-                "clinical rotations, medical licenses, and other indicators of medical training. "
-                "You must also return a confidence score (0-100) indicating how confident you are in your assessment. "
-                "In the message field, provide a brief explanation of your decision."
-            ),
-        )
-
         try:
-            response = await agent.run(
+            response = await self.agent.run(
                 f"Verify if the following resume belongs to a medical doctor:\n\n{resume_content}"
             )
             return response.output
@@ -218,18 +393,11 @@ class ResumeVerifierAgent:
 
 class OcrAgent:
     def __init__(self):
-        self.model = GeminiModel(
-            "gemini-2.0-flash",
-            provider=GoogleGLAProvider(
-                api_key=str(os.getenv("GEMINI_API_KEY")),
-            ),
-        )
+        self.model = get_gemini_model()
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
-
-    async def generate_text_from_images(self, images: List[bytes]):
-        agent = Agent(
+        self.agent = Agent(
             model=self.model,
             output_type=List[OcrResponseGemini],
             headers=self.headers,
@@ -279,10 +447,15 @@ class OcrAgent:
             )
         )
 
+    async def generate_text_from_images(
+        self, images: List[bytes], media_types: Optional[List[str]] = None
+    ):
+        media_types = media_types or ['image/png'] * len(images)
         binaryimages = [
-            BinaryContent(data=image, media_type='image/png') for image in images
+            BinaryContent(data=image, media_type=media_type)
+            for image, media_type in zip(images, media_types)
         ]
-        result = await agent.run(
+        result = await self.agent.run(
             [
                 'Extract text from each image and format it into VALID MARKDOWN. '
                 'SPECIAL ATTENTION: If the image contains handwritten text or random layout, '
@@ -293,4 +466,124 @@ class OcrAgent:
                 *binaryimages
             ]
         )
-        return result.output
\ No newline at end of file
+        return result.output
+
+    async def generate_text_from_images_batched(
+        self,
+        images: List[bytes],
+        media_types: Optional[List[str]] = None,
+        batch_size: int = OCR_BATCH_SIZE,
+        max_concurrency: int = OCR_MAX_CONCURRENCY,
+        max_retries: int = OCR_BATCH_RETRIES,
+        on_progress: Optional[Callable[[int], None]] = None,
+    ) -> List[Optional[OcrResponseGemini]]:
+        """
+        Splits the images into chunks and runs the chunks concurrently.
+
+        At most `max_concurrency` model calls are in flight at once. Chunks that
+        fail are retried (only those chunks) up to `max_retries` times.
+
+        :param images: Raw image bytes, in upload order.
+        :param media_types: Media type of each image (defaults to image/png).
+        :param batch_size: Number of images sent in a single model call.
+        :param max_concurrency: Maximum number of concurrent model calls.
+        :param max_retries: Number of extra attempts for a failed chunk.
+        :param on_progress: Called with the number of images in each finished chunk.
+        :return: One result per input image, in the same order. Images whose chunk
+            still failed after all retries get None.
+        :raises Exception: The last chunk error, if every chunk failed.
+        :raises asyncio.CancelledError: If a chunk was cancelled (never retried).
+        """
+        batch_size = max(1, batch_size)
+        media_types = media_types or ['image/png'] * len(images)
+        chunks = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+        chunk_types = [media_types[i:i + batch_size] for i in range(0, len(images), batch_size)]
+        chunk_results: List[Optional[List[Optional[OcrResponseGemini]]]] = [None] * len(chunks)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run_chunk(index: int):
+            async with semaphore:
+                output = await self.generate_text_from_images(chunks[index], chunk_types[index])
+            # Keep positions aligned even if the model returns too few/many items
+            output = list(output[:len(chunks[index])])
+            output += [None] * (len(chunks[index]) - len(output))
+            chunk_results[index] = output
+            if on_progress:
+                on_progress(len(chunks[index]))
+
+        pending = list(range(len(chunks)))
+        last_error = None
+        for attempt in range(max_retries + 1):
+            if attempt:
+                await asyncio.sleep(OCR_RETRY_BACKOFF_SECONDS * attempt)
+            outcomes = await asyncio.gather(
+                *(run_chunk(i) for i in pending), return_exceptions=True
+            )
+            failed = []
+            for index, outcome in zip(pending, outcomes):
+                if isinstance(outcome, asyncio.CancelledError):
+                    raise outcome
+                if isinstance(outcome, BaseException):
+                    last_error = outcome
+                    failed.append(index)
+            pending = failed
+            if not pending:
+                break
+            print(f"OCR attempt {attempt + 1}: {len(pending)} of {len(chunks)} chunks failed: {last_error}")
+
+        if chunks and len(pending) == len(chunks):
+            raise last_error
+
+        results: List[Optional[OcrResponseGemini]] = []
+        for index, chunk in enumerate(chunks):
+            results.extend(chunk_results[index] or [None] * len(chunk))
+        return results
+
+
+class TesseractOcrEngine:
+    """
+    Local OCR engine with the same interface as OcrAgent.
+
+    Each image is processed by Tesseract in the CPU pool, so clean printed
+    documents can be read without a network round-trip. Output is plain text
+    split into paragraphs rather than structured Markdown.
+    """
+
+    async def generate_text_from_images(
+        self,
+        images: List[bytes],
+        media_types: Optional[List[str]] = None,
+        on_progress: Optional[Callable[[int], None]] = None,
+    ) -> List[Optional[OcrResponseGemini]]:
+        async def recognize(image) -> dict:
+            result = await run_in_cpu_pool(process_single_image_tesseract, bytes(image))
+            if on_progress:
+                on_progress(1)
+            return result
+
+        results = await asyncio.gather(*(recognize(image) for image in images))
+        responses = []
+        for result in results:
+            if result["error"]:
+                print(f"Tesseract OCR error: {result['error']}")
+                responses.append(None)
+            else:
+                responses.append(OcrResponseGemini(
+                    content=result["extracted_text"],
+                    confidence=result["confidence"],
+                ))
+        return responses
+
+    async def generate_text_from_images_batched(
+        self,
+        images: List[bytes],
+        media_types: Optional[List[str]] = None,
+        on_progress: Optional[Callable[[int], None]] = None,
+        **kwargs,
+    ) -> List[Optional[OcrResponseGemini]]:
+        """
+        Same contract as OcrAgent.generate_text_from_images_batched. Every
+        image is already processed independently, so batching options are
+        ignored and progress is reported per image.
+        """
+        return await self.generate_text_from_images(images, media_types, on_progress=on_progress)
@@ -0,0 +1,61 @@
+"""
+Shared pools for CPU-bound work (image preprocessing, local OCR).
+
+Running these in worker processes keeps the event loop responsive and lets a
+single uvicorn worker use more than one core. Native code that releases the
+GIL for its heavy lifting (OpenCV) can instead run in the thread pool, where
+it reads upload buffers (memoryviews, memory maps) in place rather than
+receiving a pickled copy.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+CPU_POOL_WORKERS = int(os.environ.get("CPU_POOL_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_thread_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_cpu_pool() -> ProcessPoolExecutor:
+    """Returns the process-wide pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=CPU_POOL_WORKERS)
+    return _pool
+
+
+async def run_in_cpu_pool(func, *args):
+    """
+    Runs a picklable function in the CPU pool without blocking the event loop.
+
+    Arguments are pickled to the worker, so pass bytes rather than
+    memoryviews or memory maps.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_pool(), func, *args)
+
+
+async def run_in_cpu_threads(func, *args):
+    """
+    Runs a function that releases the GIL in the CPU thread pool.
+
+    Arguments are passed by reference, so buffers are not copied.
+    """
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=CPU_POOL_WORKERS, thread_name_prefix="cpu")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_thread_pool, func, *args)
+
+
+def shutdown_cpu_pool() -> None:
+    global _pool, _thread_pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False, cancel_futures=True)
+        _thread_pool = None
@@ -8,8 +8,15 @@ These functions determine what users and records a user can access based on:
 """
 
 from app.models import User, UserRole
+from sqlalchemy import or_, select, true
 from sqlalchemy.orm import Session
-from typing import List
+from cachetools import TTLCache
+from typing import Optional
+import os
+import threading
+
+ACCESS_SCOPE_CACHE_MAX_ENTRIES = int(os.environ.get("ACCESS_SCOPE_CACHE_MAX_ENTRIES", 10000))
+ACCESS_SCOPE_CACHE_TTL_SECONDS = int(os.environ.get("ACCESS_SCOPE_CACHE_TTL_SECONDS", 30))
 
 
 def is_family_admin(user: User, family_id: int) -> bool:
@@ -68,47 +75,89 @@ def can_access_user_records(current_user: User, target_user: User) -> bool:
     return False
 
 
-def get_accessible_user_ids(current_user: User, db: Session) -> List[int]:
+class AccessScope:
     """
-    Get list of user IDs whose records the current user can access.
-    This is useful for efficiently querying records and collections.
-    
-    Access includes:
-    - Own records (always)
-    - Family members' records (if family admin)
-    - Patients' records (if doctor)
-    - All records (if admin)
-    
-    Args:
-        current_user: The user requesting access
-        db: Database session
-        
-    Returns:
-        List of user IDs that current user can access
+    The set of users whose records a user can access, expressed as SQL.
+
+    Instead of loading every accessible user ID into Python and sending it
+    back in an IN (...) list, the scope becomes a filter on the owner column:
+    subqueries on family membership and ``doctor_id``, or no filter at all
+    for admins. The database resolves the membership when the query runs.
     """
-    accessible_ids = [current_user.id]  # Can always access own records
-    
-    # Admin can access all users
-    if current_user.role == UserRole.ADMIN:
-        all_users = db.query(User.id).all()
-        return [user.id for user in all_users]
-    
-    # Family admin can access all family members
-    if current_user.is_family_admin and current_user.family_id:
-        family_members = db.query(User.id).filter(
-            User.family_id == current_user.family_id
-        ).all()
-        accessible_ids.extend([member.id for member in family_members])
-    
-    # Doctor can access their patients
-    if current_user.role == UserRole.DOCTOR:
-        patients = db.query(User.id).filter(
-            User.doctor_id == current_user.id
-        ).all()
-        accessible_ids.extend([patient.id for patient in patients])
-    
-    # Remove duplicates and return
-    return list(set(accessible_ids))
+
+    def __init__(
+        self,
+        user_id: int,
+        unrestricted: bool = False,
+        family_id: Optional[int] = None,
+        is_doctor: bool = False
+    ):
+        self.user_id = user_id
+        self.unrestricted = unrestricted
+        self.family_id = family_id
+        self.is_doctor = is_doctor
+
+    @classmethod
+    def for_user(cls, user: User) -> "AccessScope":
+        return cls(
+            user_id=user.id,
+            unrestricted=user.role == UserRole.ADMIN,
+            family_id=user.family_id if user.is_family_admin else None,
+            is_doctor=user.role == UserRole.DOCTOR
+        )
+
+    def filter(self, owner_column):
+        """
+        Build the criterion restricting ``owner_column`` (a user ID column) to this scope.
+
+        Args:
+            owner_column: e.g. ``Record.user_id`` or ``Collection.user_id``
+
+        Returns:
+            A SQL expression to pass to ``Query.filter``
+        """
+        if self.unrestricted:
+            return true()
+        clauses = [owner_column == self.user_id]
+        if self.family_id is not None:
+            clauses.append(owner_column.in_(
+                select(User.id).where(User.family_id == self.family_id)
+            ))
+        if self.is_doctor:
+            clauses.append(owner_column.in_(
+                select(User.id).where(User.doctor_id == self.user_id)
+            ))
+        return or_(*clauses)
+
+
+_scope_cache = TTLCache(maxsize=ACCESS_SCOPE_CACHE_MAX_ENTRIES, ttl=ACCESS_SCOPE_CACHE_TTL_SECONDS)
+_scope_lock = threading.Lock()
+
+
+def get_access_scope(current_user: User) -> AccessScope:
+    """
+    Get the (cached) access scope of a user.
+
+    The scope only depends on the user's own role and family admin status;
+    family members and patients are resolved by subqueries at query time,
+    so adding a member or assigning a patient takes effect immediately.
+    Changes to the user themselves must call ``invalidate_access_scope``
+    (``invalidate_user_cache`` does this).
+    """
+    with _scope_lock:
+        scope = _scope_cache.get(current_user.id)
+    if scope is None:
+        scope = AccessScope.for_user(current_user)
+        with _scope_lock:
+            _scope_cache[current_user.id] = scope
+    return scope
+
+
+def invalidate_access_scope(*user_ids: int) -> None:
+    """Drop the cached access scopes of the given users."""
+    with _scope_lock:
+        for user_id in user_ids:
+            _scope_cache.pop(user_id, None)
 
 
 def can_modify_user_record(current_user: User, target_user: User) -> bool:
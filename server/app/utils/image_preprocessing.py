@@ -0,0 +1,91 @@
+"""
+Image normalization applied before OCR.
+
+Phone cameras produce 12 MP photos that are far larger than the OCR model
+needs. Each image is downscaled to a target DPI for a standard page,
+optionally converted to grayscale and deskewed, and re-encoded as JPEG. That
+shrinks the upload to the model and the tokens spent per page.
+
+``normalize_image`` is CPU-bound and runs in the shared CPU thread pool
+(see ``app.utils.cpu_pool``), not the process pool: it is made of OpenCV
+calls, each of which releases the GIL, and in a thread it reads the upload
+buffer without the copy that pickling it to a worker process would make.
+"""
+
+import os
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+OCR_PREPROCESS = os.environ.get("OCR_PREPROCESS", "true").lower() == "true"
+OCR_TARGET_DPI = int(os.environ.get("OCR_TARGET_DPI", 200))
+OCR_PAGE_LONG_EDGE_INCHES = float(os.environ.get("OCR_PAGE_LONG_EDGE_INCHES", 11.69))  # A4
+OCR_GRAYSCALE = os.environ.get("OCR_GRAYSCALE", "true").lower() == "true"
+OCR_DESKEW = os.environ.get("OCR_DESKEW", "true").lower() == "true"
+OCR_JPEG_QUALITY = int(os.environ.get("OCR_JPEG_QUALITY", 85))
+
+# Skew corrections outside this range are either noise or a layout we should not rotate
+MIN_DESKEW_DEGREES = 0.5
+MAX_DESKEW_DEGREES = 15.0
+
+
+def _deskew(image: np.ndarray) -> np.ndarray:
+    """Rotate a page so its text lines are horizontal."""
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    thresh = cv2.threshold(
+        cv2.bitwise_not(gray), 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
+    )[1]
+    coords = cv2.findNonZero(thresh)
+    if coords is None:
+        return image
+
+    angle = cv2.minAreaRect(coords)[-1]
+    if angle > 45:
+        angle -= 90
+    if not MIN_DESKEW_DEGREES <= abs(angle) <= MAX_DESKEW_DEGREES:
+        return image
+
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(
+        image, matrix, (width, height),
+        flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE
+    )
+
+
+def normalize_image(data) -> Tuple[bytes, Optional[str]]:
+    """
+    Downscale, grayscale, deskew and recompress an image for OCR.
+
+    Args:
+        data: Encoded image (bytes, memoryview or memory map; any format
+            OpenCV can decode)
+
+    Returns:
+        Tuple of (image bytes, media type). If the image cannot be decoded,
+        or re-encoding would not make it smaller, the original bytes are
+        returned with a media type of None.
+    """
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return data, None
+
+    height, width = image.shape[:2]
+    max_edge = int(OCR_TARGET_DPI * OCR_PAGE_LONG_EDGE_INCHES)
+    scale = max_edge / max(height, width)
+    if scale < 1:
+        image = cv2.resize(
+            image, (int(width * scale), int(height * scale)),
+            interpolation=cv2.INTER_AREA
+        )
+
+    if OCR_GRAYSCALE:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if OCR_DESKEW:
+        image = _deskew(image)
+
+    ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, OCR_JPEG_QUALITY])
+    if not ok or len(encoded) >= len(data):
+        return data, None
+    return encoded.tobytes(), 'image/jpeg'
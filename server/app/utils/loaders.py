@@ -0,0 +1,72 @@
+"""
+Eager-loading plans for collection listings.
+
+``CollectionResponse`` embeds every record and each record embeds its
+creator, so serializing plain query results lazy-loads one query per
+collection and one per record. The listing endpoints load through here
+instead, which costs a fixed number of queries however many collections
+are returned:
+
+- ``full``: collections with their creator (joined), then all their records
+  with their creators in one ``selectin`` query
+- ``summary``: collections with their creator plus one grouped count query;
+  no record rows (or their content) are read
+"""
+
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app.models import Collection, Record
+from app.schemas import CollectionListItem, CollectionResponse
+
+COLLECTION_VIEW_PATTERN = "^(full|summary)$"
+
+
+def collection_load_options(view: str = "full") -> list:
+    """Return the loader options for a collection listing view."""
+    options = [joinedload(Collection.creator)]
+    if view == "full":
+        options.append(selectinload(Collection.records).joinedload(Record.creator))
+    return options
+
+
+def count_collection_records(db: Session, collection_ids: List[str]) -> dict:
+    """Count records per collection with a single grouped query."""
+    if not collection_ids:
+        return {}
+    rows = db.query(Record.collection_id, func.count(Record.id)).filter(
+        Record.collection_id.in_(collection_ids)
+    ).group_by(Record.collection_id).all()
+    return dict(rows)
+
+
+def collections_response(db: Session, query, view: str = "full") -> JSONResponse:
+    """
+    Load and serialize a collection listing with the plan for ``view``.
+
+    Args:
+        db: Database session
+        query: Query over Collection (filters, ordering and paging applied)
+        view: "full" (CollectionResponse with records) or "summary"
+            (CollectionListItem with a record count)
+
+    Every item is validated into its schema here, so endpoints returning
+    this declare ``Union[List[CollectionResponse], List[CollectionListItem]]``
+    as their response model.
+    """
+    collections = query.options(*collection_load_options(view)).all()
+    if view == "full":
+        items = [CollectionResponse.model_validate(collection) for collection in collections]
+    else:
+        counts = count_collection_records(db, [collection.id for collection in collections])
+        items = [
+            CollectionListItem.model_validate(collection).model_copy(
+                update={"record_count": counts.get(collection.id, 0)}
+            )
+            for collection in collections
+        ]
+    return JSONResponse(content=jsonable_encoder(items))
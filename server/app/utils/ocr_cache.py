@@ -0,0 +1,106 @@
+"""
+Content-addressed cache of OCR results.
+
+Results are keyed by the SHA-256 of the uploaded image bytes, so re-uploading
+the same scan (e.g. from the web client and then from the mobile app) skips
+the model call entirely.
+
+Two tiers:
+- An in-memory LRU bounded by entry count and TTL (always on)
+- An optional SQLite file shared by all workers on the host
+  (enabled by setting OCR_CACHE_DB_PATH)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Optional
+
+from cachetools import TTLCache
+
+from app.schemas import OcrResponseGemini
+
+OCR_CACHE_MAX_ENTRIES = int(os.environ.get("OCR_CACHE_MAX_ENTRIES", 1024))
+OCR_CACHE_TTL_SECONDS = int(os.environ.get("OCR_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+OCR_CACHE_DB_PATH = os.environ.get("OCR_CACHE_DB_PATH")
+
+
+def image_digest(data: bytes) -> str:
+    """Return the cache key for an image's raw bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class OcrResultCache:
+    """Two-tier (memory, optional SQLite) cache of OCR results by image digest."""
+
+    def __init__(
+        self,
+        max_entries: int = OCR_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = OCR_CACHE_TTL_SECONDS,
+        db_path: Optional[str] = OCR_CACHE_DB_PATH,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._memory = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+        if db_path:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS ocr_results ("
+                    "digest TEXT PRIMARY KEY, content TEXT NOT NULL, "
+                    "confidence REAL NOT NULL, created_at REAL NOT NULL)"
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def get(self, digest: str) -> Optional[OcrResponseGemini]:
+        with self._lock:
+            result = self._memory.get(digest)
+        if result is None and self.db_path:
+            result = self._get_from_disk(digest)
+            if result is not None:
+                with self._lock:
+                    self._memory[digest] = result
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def set(self, digest: str, result: OcrResponseGemini) -> None:
+        with self._lock:
+            self._memory[digest] = result
+        if self.db_path:
+            try:
+                with closing(self._connect()) as conn, conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO ocr_results VALUES (?, ?, ?, ?)",
+                        (digest, result.content, result.confidence, time.time()),
+                    )
+            except sqlite3.Error as e:
+                print(f"OCR cache write failed: {str(e)}")
+
+    def _get_from_disk(self, digest: str) -> Optional[OcrResponseGemini]:
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute(
+                    "SELECT content, confidence FROM ocr_results "
+                    "WHERE digest = ? AND created_at > ?",
+                    (digest, time.time() - self.ttl_seconds),
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"OCR cache read failed: {str(e)}")
+            return None
+        if row is None:
+            return None
+        return OcrResponseGemini(content=row[0], confidence=row[1])
+
+
+ocr_result_cache = OcrResultCache()
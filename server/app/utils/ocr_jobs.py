@@ -0,0 +1,365 @@
+"""
+Background OCR jobs for HealthScan.
+
+Uploads submitted in async mode are queued here instead of holding the HTTP
+request open. A bounded pool of in-process workers runs the OCR pipeline and
+writes the resulting records; clients poll the job for progress.
+
+The uploaded bytes stay in the worker that accepted the upload, but job
+state (status, per-image progress, results) lives in the ocr_jobs table, so
+a poll answered by any uvicorn worker sees it. Finished jobs are deleted
+after OCR_JOB_RETENTION_SECONDS; jobs orphaned by a worker that exited
+mid-run are deleted after OCR_JOB_STALE_SECONDS.
+
+The queue is behind ``OcrJobBackend`` so a different backend (for example a
+local queue service shared between uvicorn workers) can be plugged in with
+``set_job_backend``.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy import or_
+
+from app.database import SessionLocal
+from app.models import OcrJobState, Record
+from app.utils import OCR_DEFAULT_ENGINE
+from app.utils.ocr_pipeline import run_ocr
+from app.utils.record_store import bulk_create_records
+
+OCR_JOB_WORKERS = int(os.environ.get("OCR_JOB_WORKERS", 2))
+OCR_JOB_QUEUE_SIZE = int(os.environ.get("OCR_JOB_QUEUE_SIZE", 100))
+OCR_JOB_RETENTION_SECONDS = int(os.environ.get("OCR_JOB_RETENTION_SECONDS", 3600))
+OCR_JOB_STALE_SECONDS = int(os.environ.get("OCR_JOB_STALE_SECONDS", 24 * 3600))
+OCR_JOB_PROGRESS_INTERVAL_SECONDS = float(os.environ.get("OCR_JOB_PROGRESS_INTERVAL_SECONDS", 1))
+
+
+class JobQueueFull(Exception):
+    """Raised when the job backend cannot accept more work."""
+
+
+class OcrJob:
+    """A queued OCR request and its progress."""
+
+    def __init__(
+        self,
+        user_id: int,
+        images: List,
+        file_info: List[dict],
+        collection_id: Optional[str] = None,
+        cleanup: Optional[Callable[[], None]] = None,
+        engine: str = OCR_DEFAULT_ENGINE,
+        pdf_mode: str = "merge",
+    ):
+        self.id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.collection_id = collection_id
+        self.images = images
+        self.file_info = file_info
+        self.cleanup = cleanup
+        self.engine = engine
+        self.pdf_mode = pdf_mode
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.results: List[dict] = []
+        self.processed_files = 0
+        self.total_images = 0
+        self.processed_images = 0
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total_files": len(self.file_info),
+            "processed_files": self.processed_files,
+            "total_images": self.total_images,
+            "processed_images": self.processed_images,
+            "collection_id": self.collection_id,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "results": self.results,
+        }
+
+
+def _update_job_state(job_id: str, values: dict) -> None:
+    """Write job columns to the ocr_jobs table."""
+    db = SessionLocal()
+    try:
+        db.query(OcrJobState).filter(OcrJobState.id == job_id).update(values, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _save_records(records: List[Record]) -> None:
+    """Insert a job's records in a dedicated session."""
+    db = SessionLocal()
+    try:
+        bulk_create_records(db, records)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class _ProgressWriter:
+    """
+    Persists a running job's progress.
+
+    Only the latest progress is kept, and a single task writes it at most
+    once per OCR_JOB_PROGRESS_INTERVAL_SECONDS, so a job holds at most one
+    database connection for progress and writes land in order.
+    """
+
+    def __init__(self, job_id: str, interval: float = OCR_JOB_PROGRESS_INTERVAL_SECONDS):
+        self.job_id = job_id
+        self.interval = interval
+        self._latest: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = asyncio.Event()
+
+    def update(self, values: dict) -> None:
+        """Replace the pending progress, starting the writer if it is idle."""
+        self._latest = values
+        if self._task is None and not self._closed.is_set():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        try:
+            while self._latest is not None and not self._closed.is_set():
+                values, self._latest = self._latest, None
+                await asyncio.to_thread(_update_job_state, self.job_id, values)
+                try:
+                    await asyncio.wait_for(self._closed.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+        except Exception as e:
+            print(f"Could not save progress of OCR job {self.job_id}: {str(e)}")
+        finally:
+            self._task = None
+
+    async def close(self) -> None:
+        """Wait for an in-flight write and drop pending progress (the final state supersedes it)."""
+        self._closed.set()
+        if self._task is not None:
+            await self._task
+
+
+async def process_job(job: OcrJob) -> None:
+    """
+    Run OCR for a job and persist its records in a dedicated session.
+
+    Failures are recorded on the job rather than raised, so a bad upload
+    never takes down the worker processing it.
+    """
+    job.status = "running"
+    job.started_at = datetime.utcnow()
+    await asyncio.to_thread(_update_job_state, job.id, {"status": job.status, "started_at": job.started_at})
+    progress = _ProgressWriter(job.id, OCR_JOB_PROGRESS_INTERVAL_SECONDS)
+    try:
+        def on_progress(done: int, total: int) -> None:
+            job.total_images = total
+            job.processed_images = done
+            # A PDF may be many images; estimate files from the share of images done
+            job.processed_files = len(job.file_info) * done // total if total else 0
+            progress.update({
+                "total_images": total,
+                "processed_images": done,
+                "processed_files": job.processed_files,
+            })
+
+        records, response = await run_ocr(
+            job.images, job.file_info, job.user_id, job.collection_id,
+            on_progress=on_progress, engine=job.engine, pdf_mode=job.pdf_mode
+        )
+        await asyncio.to_thread(_save_records, [record for record in records if record is not None])
+        job.results = [
+            {
+                "filename": entry["filename"],
+                "file_size": entry["file_size"],
+                "file_type": entry["file_type"],
+                "page": entry.get("page"),
+                "record_id": record.id if record is not None else None,
+                "confidence": entry["confidence"],
+                "error": entry.get("error"),
+            }
+            for record, entry in zip(records, response)
+        ]
+        job.processed_files = len(job.file_info)
+        job.processed_images = job.total_images
+        job.status = "completed"
+    except Exception as e:
+        print(f"Error processing OCR job {job.id}: {str(e)}")
+        job.results = [
+            {
+                "filename": info["filename"],
+                "file_size": info["file_size"],
+                "file_type": info["file_type"],
+                "error": str(e),
+            }
+            for info in job.file_info
+        ]
+        job.error = str(e)
+        job.status = "failed"
+    finally:
+        await progress.close()
+        job.images = []  # Release upload bytes as soon as the job is done
+        if job.cleanup:
+            job.cleanup()
+        job.finished_at = datetime.utcnow()
+        try:
+            await asyncio.to_thread(_update_job_state, job.id, {
+                "status": job.status,
+                "processed_files": job.processed_files,
+                "total_images": job.total_images,
+                "processed_images": job.processed_images,
+                "error": job.error,
+                "results": json.dumps(job.results),
+                "finished_at": job.finished_at,
+            })
+        except Exception as e:
+            print(f"Could not save OCR job {job.id}: {str(e)}")
+
+
+class OcrJobBackend:
+    """Interface for OCR job queue backends."""
+
+    def submit(self, job: OcrJob) -> None:
+        """Queue a job for processing. Raises JobQueueFull when saturated."""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Return a job's state by ID, or None if it is unknown or expired.
+
+        The dict has the ``OcrJobStatus`` fields plus ``user_id``.
+        """
+        raise NotImplementedError
+
+
+class InProcessJobBackend(OcrJobBackend):
+    """
+    Bounded asyncio worker pool living in the current uvicorn worker.
+
+    Workers are started lazily on the first submission so the queue is bound
+    to the running event loop. Job state is kept in the ocr_jobs table, so
+    ``get`` works from every worker; finished jobs are kept for
+    ``retention_seconds`` so clients can collect their results.
+    """
+
+    def __init__(
+        self,
+        workers: int = OCR_JOB_WORKERS,
+        queue_size: int = OCR_JOB_QUEUE_SIZE,
+        retention_seconds: int = OCR_JOB_RETENTION_SECONDS,
+        stale_seconds: int = OCR_JOB_STALE_SECONDS,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retention_seconds = retention_seconds
+        self.stale_seconds = stale_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _ensure_started(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await process_job(job)
+                await asyncio.to_thread(self._prune)
+            except Exception as e:
+                print(f"OCR job cleanup failed: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _prune(self) -> None:
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            db.query(OcrJobState).filter(or_(
+                OcrJobState.finished_at < now - timedelta(seconds=self.retention_seconds),
+                OcrJobState.created_at < now - timedelta(seconds=self.stale_seconds),
+            )).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def submit(self, job: OcrJob) -> None:
+        self._ensure_started()
+        # Nothing else runs on the event loop between this check and put_nowait
+        if self._queue.full():
+            raise JobQueueFull("OCR job queue is full")
+        db = SessionLocal()
+        try:
+            db.add(OcrJobState(
+                id=job.id,
+                user_id=job.user_id,
+                collection_id=job.collection_id,
+                status=job.status,
+                total_files=len(job.file_info),
+                created_at=job.created_at,
+            ))
+            db.commit()
+        finally:
+            db.close()
+        self._queue.put_nowait(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        db = SessionLocal()
+        try:
+            state = db.get(OcrJobState, job_id)
+        finally:
+            db.close()
+        if state is None:
+            return None
+        return {
+            "job_id": state.id,
+            "user_id": state.user_id,
+            "status": state.status,
+            "total_files": state.total_files,
+            "processed_files": state.processed_files,
+            "total_images": state.total_images,
+            "processed_images": state.processed_images,
+            "collection_id": state.collection_id,
+            "created_at": state.created_at,
+            "started_at": state.started_at,
+            "finished_at": state.finished_at,
+            "error": state.error,
+            "results": json.loads(state.results) if state.results else [],
+        }
+
+
+_backend: OcrJobBackend = InProcessJobBackend()
+
+
+def get_job_backend() -> OcrJobBackend:
+    return _backend
+
+
+def set_job_backend(backend: OcrJobBackend) -> None:
+    """Replace the job backend (e.g. with a shared local queue service)."""
+    global _backend
+    _backend = backend
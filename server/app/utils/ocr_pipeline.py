@@ -0,0 +1,317 @@
+"""
+OCR pipeline shared by the synchronous upload endpoint and the background
+OCR job workers.
+
+It turns a batch of uploaded images and PDFs into unsaved ``Record`` rows
+plus the per-file response payload returned to the client.
+"""
+
+import asyncio
+from typing import Callable, List, Optional, Tuple
+
+from app.models import Record
+from app.schemas import OcrResponseGemini
+from app.utils import (
+    OCR_DEFAULT_ENGINE,
+    OCR_ENGINES,
+    OCR_REMOTE_TIMEOUT_SECONDS,
+    OcrAgent,
+    TesseractOcrEngine,
+    get_agent,
+    merge_texts,
+)
+from app.utils.cpu_pool import run_in_cpu_threads
+from app.utils.image_preprocessing import OCR_PREPROCESS, normalize_image
+from app.utils.ocr_cache import image_digest, ocr_result_cache
+from app.utils.pdf_ingest import ingest_pdf, is_pdf
+
+
+def _source_media_type(content_type: Optional[str]) -> str:
+    if content_type and content_type.startswith('image/'):
+        return content_type
+    return 'image/png'
+
+
+async def prepare_images(images: List, content_types: List[Optional[str]]) -> Tuple[List, List[str]]:
+    """
+    Normalize images for OCR (see ``normalize_image``).
+
+    This runs in the CPU thread pool rather than the process pool. Every
+    step of ``normalize_image`` is an OpenCV call that releases the GIL, so
+    threads normalize images in parallel on separate cores; the GIL is only
+    held briefly between calls. A process pool would also pickle a copy of
+    every upload to its worker, where threads read the upload buffers
+    (memoryviews, memory maps) in place.
+
+    Images that cannot be normalized are passed through unchanged with the
+    media type they were uploaded with.
+
+    Returns:
+        Tuple of (image bytes, media types), in input order
+    """
+    media_types = [_source_media_type(content_type) for content_type in content_types]
+    if not OCR_PREPROCESS or not images:
+        return list(images), media_types
+
+    outcomes = await asyncio.gather(
+        *(run_in_cpu_threads(normalize_image, image) for image in images),
+        return_exceptions=True
+    )
+    prepared = []
+    for i, outcome in enumerate(outcomes):
+        if isinstance(outcome, Exception):
+            print(f"Image preprocessing failed, sending original: {str(outcome)}")
+            prepared.append(images[i])
+            continue
+        data, media_type = outcome
+        prepared.append(data if media_type else images[i])
+        if media_type:
+            media_types[i] = media_type
+    return prepared, media_types
+
+
+async def recognize(
+    images: List,
+    media_types: List[str],
+    engine: str = OCR_DEFAULT_ENGINE,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> Tuple[list, List[bool]]:
+    """
+    Run the selected OCR engine over prepared images.
+
+    Engines:
+        gemini: the remote model only
+        tesseract: the local Tesseract engine only
+        auto: the remote model, falling back to Tesseract if it fails or
+            does not answer within OCR_REMOTE_TIMEOUT_SECONDS; images whose
+            chunk still failed after the remote retries are re-read with
+            Tesseract individually
+
+    Returns:
+        Tuple of (one result or None per image, whether each result came
+        from the remote model and may be cached)
+    """
+    tesseract = get_agent(TesseractOcrEngine)
+    if engine == "tesseract":
+        results = await tesseract.generate_text_from_images_batched(
+            images, media_types, on_progress=on_progress
+        )
+        return results, [False] * len(results)
+
+    remote = get_agent(OcrAgent).generate_text_from_images_batched(
+        images, media_types, on_progress=on_progress
+    )
+    if engine == "gemini":
+        results = await remote
+        return results, [result is not None for result in results]
+
+    try:
+        results = await asyncio.wait_for(remote, OCR_REMOTE_TIMEOUT_SECONDS)
+    except Exception as e:
+        reason = "timed out" if isinstance(e, asyncio.TimeoutError) else f"failed: {str(e)}"
+        print(f"Remote OCR {reason}; falling back to Tesseract")
+        results = await tesseract.generate_text_from_images_batched(
+            images, media_types, on_progress=on_progress
+        )
+        return results, [False] * len(results)
+
+    remote_ok = [result is not None for result in results]
+    failed = [i for i, result in enumerate(results) if result is None]
+    if failed:
+        print(f"Remote OCR failed for {len(failed)} of {len(images)} images; retrying them with Tesseract")
+        # Failed chunks reported no progress; run_ocr caps any double count
+        fallback = await tesseract.generate_text_from_images_batched(
+            [images[i] for i in failed], [media_types[i] for i in failed], on_progress=on_progress
+        )
+        for i, result in zip(failed, fallback):
+            results[i] = result
+    return results, remote_ok
+
+
+async def ocr_images(
+    images: List,
+    content_types: List[Optional[str]],
+    engine: str = OCR_DEFAULT_ENGINE,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> List[Optional[OcrResponseGemini]]:
+    """
+    OCR a list of images, using the result cache where possible.
+
+    Images already seen (same bytes) are served from the OCR result cache;
+    the rest are normalized (``prepare_images``) and sent to the selected
+    engine (``recognize``).
+
+    Returns:
+        One result per image, in order; None where extraction failed
+    """
+    digests = [image_digest(data) for data in images]
+    cached = {}
+    for digest in set(digests):
+        result = ocr_result_cache.get(digest)
+        if result is not None:
+            cached[digest] = result
+
+    # Only send each uncached image once, even if it was uploaded twice
+    missing = list(dict.fromkeys(d for d in digests if d not in cached))
+    hit_count = sum(1 for d in digests if d in cached)
+    if on_progress and hit_count:
+        on_progress(hit_count)
+    if missing:
+        first_index = {}
+        for i, digest in enumerate(digests):
+            first_index.setdefault(digest, i)
+        prepared, media_types = await prepare_images(
+            [images[first_index[d]] for d in missing],
+            [content_types[first_index[d]] for d in missing]
+        )
+        fresh, cacheable = await recognize(prepared, media_types, engine, on_progress)
+        for digest, result, remote in zip(missing, fresh, cacheable):
+            if result is not None:
+                # Local results are lower quality; don't serve them to later uploads
+                if remote:
+                    ocr_result_cache.set(digest, result)
+                cached[digest] = result
+    return [cached.get(digest) for digest in digests]
+
+
+def _merge_pages(pages: List[dict], results: List[Optional[OcrResponseGemini]]) -> Optional[OcrResponseGemini]:
+    """Stitch page results into one document, keeping a marker for failed pages."""
+    if all(result is None for result in results):
+        return None
+    texts = [
+        result.content if result is not None
+        else f"*[Page {page['page']}: text could not be extracted]*"
+        for page, result in zip(pages, results)
+    ]
+    confidences = [result.confidence for result in results if result is not None]
+    return OcrResponseGemini(
+        content=merge_texts(texts),
+        confidence=round(sum(confidences) / len(results), 2)
+    )
+
+
+async def run_ocr(
+    image_bytes: List[bytes],
+    file_info: List[dict],
+    user_id: int,
+    collection_id: Optional[str] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    engine: str = OCR_DEFAULT_ENGINE,
+    pdf_mode: str = "merge",
+) -> Tuple[List[Optional[Record]], List[dict]]:
+    """
+    Run OCR over the uploaded files and build the records to persist.
+
+    Images are OCR'd as-is (see ``ocr_images``). PDFs are split into pages:
+    pages with a text layer are used directly, and only image-only pages are
+    OCR'd, together with the other images in the upload. A PDF becomes one
+    record (``pdf_mode="merge"``) or one record per page
+    (``pdf_mode="pages"``).
+
+    A file or page whose text could not be extracted gets no record and an
+    ``error`` entry instead.
+
+    Args:
+        image_bytes: Raw bytes of each uploaded file
+        file_info: Filename, size and content type of each upload (same order)
+        user_id: Owner and creator of the resulting records
+        collection_id: Optional collection the records are added to
+        on_progress: Called with (images finished, images to OCR) as each
+            image or scanned page is recognized
+        engine: One of OCR_ENGINES
+        pdf_mode: "merge" or "pages"
+
+    Returns:
+        Tuple of (unsaved records or None, response entries), aligned with
+        each other; one pair per file, or per page in "pages" mode
+    """
+    pdf_indexes = [
+        i for i, (data, info) in enumerate(zip(image_bytes, file_info))
+        if is_pdf(info['file_type'], data)
+    ]
+    pdf_outcomes = await asyncio.gather(
+        *(ingest_pdf(image_bytes[i]) for i in pdf_indexes), return_exceptions=True
+    )
+    pdf_pages = dict(zip(pdf_indexes, pdf_outcomes))
+
+    # Everything that needs OCR goes through one fan-out: images and scanned pages
+    ocr_inputs = []
+    ocr_types = []
+    image_slot = {}
+    for i, info in enumerate(file_info):
+        if i not in pdf_pages:
+            image_slot[i] = len(ocr_inputs)
+            ocr_inputs.append(image_bytes[i])
+            ocr_types.append(info['file_type'])
+        elif not isinstance(pdf_pages[i], Exception):
+            for page in pdf_pages[i]:
+                if page['image'] is not None:
+                    page['slot'] = len(ocr_inputs)
+                    ocr_inputs.append(page['image'])
+                    ocr_types.append(page['media_type'])
+
+    progress = None
+    if on_progress:
+        done = 0
+
+        def progress(count: int) -> None:
+            nonlocal done
+            # A fallback engine may re-process images, so never overshoot
+            done = min(done + count, len(ocr_inputs))
+            on_progress(done, len(ocr_inputs))
+
+        on_progress(0, len(ocr_inputs))
+    ocr_results = await ocr_images(ocr_inputs, ocr_types, engine, progress) if ocr_inputs else []
+
+    records = []
+    response = []
+
+    def add(entry: dict, result: Optional[OcrResponseGemini], error: str = "Text extraction failed"):
+        if result is None:
+            records.append(None)
+            response.append({**entry, 'content': '', 'confidence': 0.0, 'error': error})
+            return
+        records.append(Record(
+            filename=entry['filename'],
+            content=result.content,
+            file_size=entry['file_size'],
+            file_type=entry['file_type'],
+            user_id=user_id,
+            created_by_id=user_id,
+            collection_id=collection_id
+        ))
+        response.append({**entry, 'content': result.content, 'confidence': result.confidence})
+
+    for i, info in enumerate(file_info):
+        entry = {
+            'filename': info['filename'],
+            'file_size': info['file_size'],
+            'file_type': info['file_type'],
+            'user_id': user_id,
+            'collection_id': collection_id,
+        }
+        if i not in pdf_pages:
+            add(entry, ocr_results[image_slot[i]])
+            continue
+
+        pages = pdf_pages[i]
+        if isinstance(pages, Exception):
+            add(entry, None, error=f"Could not read PDF: {str(pages)}")
+            continue
+        page_results = [
+            OcrResponseGemini(content=page['text'], confidence=1.0) if page['text'] is not None
+            else ocr_results[page['slot']] if 'slot' in page
+            else None
+            for page in pages
+        ]
+        if pdf_mode != "pages":
+            add(entry, _merge_pages(pages, page_results))
+            continue
+        for page, result in zip(pages, page_results):
+            add({
+                **entry,
+                'filename': f"{info['filename']} (page {page['page']})",
+                'file_size': len(result.content.encode('utf-8')) if result else None,
+                'page': page['page'],
+            }, result)
+    return records, response
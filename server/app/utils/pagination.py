@@ -0,0 +1,99 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Listings are ordered newest first on ``(created_at, id)``. The cursor is the
+position of the last row of a page, so fetching the next page is an index
+range scan instead of an OFFSET that re-reads every earlier row.
+"""
+
+import base64
+import hashlib
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id) -> str:
+    """Encode the position of a row as an opaque cursor string."""
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Decode a cursor produced by ``encode_cursor``.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), row_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def keyset_page(query, model, limit: Optional[int], cursor: Optional[str] = None):
+    """
+    Apply newest-first keyset pagination to a query.
+
+    Args:
+        query: Query over ``model``
+        model: Mapped class with ``created_at`` and ``id`` columns
+        limit: Page size, or None for no limit
+        cursor: Cursor of the previous page's last row
+
+    Returns:
+        Tuple of (rows, cursor of the next page or None)
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < row_id)
+        ))
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    if limit is None:
+        return query.all(), None
+
+    # One extra row tells us whether another page exists
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def listing_etag(rows: Iterable, *variant) -> str:
+    """
+    Build a weak ETag for a listing from its rows' IDs, update times and creators.
+
+    The creator embedded in each item is another user's row, so changing it
+    (or their name or role) does not touch the listed row's ``updated_at``;
+    it is hashed separately.
+
+    Args:
+        rows: Rows with ``id`` and ``updated_at``, and optionally
+            ``created_by_id`` and a loaded ``creator``
+        variant: Anything else that changes the representation (projection, cursor)
+    """
+    digest = hashlib.sha1(repr(variant).encode("utf-8"))
+    for row in rows:
+        creator = getattr(row, "creator", None)
+        creator_key = (
+            f"{creator.id},{creator.first_name},{creator.last_name},{creator.role}"
+            if creator is not None else ""
+        )
+        digest.update((
+            f"{row.id}:{row.updated_at.isoformat() if row.updated_at else ''}"
+            f":{getattr(row, 'created_by_id', None)}:{creator_key};"
+        ).encode("utf-8"))
+    return f'W/"{digest.hexdigest()}"'
@@ -0,0 +1,94 @@
+"""
+Password hashing service.
+
+bcrypt costs a few hundred milliseconds of CPU per call. Hashing and
+verification run in a small dedicated thread pool (bcrypt releases the GIL),
+so a login spike is limited to PASSWORD_HASH_WORKERS cores instead of
+occupying every request thread. At most PASSWORD_HASH_MAX_PENDING operations
+may be queued or running; beyond that callers get HTTP 503 with Retry-After
+instead of waiting in an ever-growing queue.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.utils import pwd_context
+
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 32))
+PASSWORD_HASH_RETRY_AFTER_SECONDS = int(os.environ.get("PASSWORD_HASH_RETRY_AFTER_SECONDS", 2))
+
+
+class PasswordHasher:
+    """Bounded thread pool for bcrypt with latency metrics."""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.stats = {
+            "hash": {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0},
+            "verify": {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0},
+            "rehashed": 0,
+            "rejected": 0,
+        }
+
+    def _record(self, operation: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.stats[operation]
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def _run(self, operation: str, func, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER_SECONDS)}
+            )
+        try:
+            started = time.perf_counter()
+            result = self._pool.submit(func, *args).result()
+            self._record(operation, time.perf_counter() - started)
+            return result
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the current cost factor."""
+        return self._run("hash", pwd_context.hash, password)
+
+    def verify(self, password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """
+        Check a password against its stored hash.
+
+        Returns:
+            Tuple of (whether it matches, a replacement hash when the stored
+            one uses an outdated cost factor or scheme, else None)
+        """
+        if not hashed_password:
+            return False, None
+        valid, new_hash = self._run("verify", pwd_context.verify_and_update, password, hashed_password)
+        if new_hash:
+            with self._lock:
+                self.stats["rehashed"] += 1
+        return valid, new_hash
+
+    def metrics(self) -> dict:
+        with self._lock:
+            metrics = {key: dict(value) if isinstance(value, dict) else value for key, value in self.stats.items()}
+        for operation in ("hash", "verify"):
+            entry = metrics[operation]
+            entry["avg_seconds"] = round(entry["total_seconds"] / entry["count"], 4) if entry["count"] else 0.0
+        return metrics
+
+
+password_hasher = PasswordHasher()
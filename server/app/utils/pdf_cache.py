@@ -0,0 +1,185 @@
+"""
+Cache of rendered record PDFs.
+
+Rendering Markdown through WeasyPrint is one of the most expensive things
+the server does, and the same record is often downloaded many times. PDFs
+are cached under the SHA-256 of the record content plus the stylesheet
+version, so an edited record (or stylesheet) simply gets a new key and a
+stale PDF can never be served. The key doubles as the response ETag.
+
+Identical content renders to the same PDF whichever record it belongs to,
+so an entry is never dropped when a record changes; unused entries simply
+age out of the LRU tiers.
+
+Two tiers:
+- An in-memory LRU bounded by total bytes (PDF_CACHE_MAX_BYTES)
+- A directory on local disk shared by the workers on the host
+  (PDF_CACHE_DIR; set PDF_CACHE_DISK_MAX_FILES=0 to disable)
+
+The disk tier is indexed in memory so writes do not list the directory.
+The index is rebuilt from the directory every PDF_CACHE_DISK_RESCAN_SECONDS
+to account for files written or removed by the other workers.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from cachetools import LRUCache
+from fastapi import Request, Response, status
+
+from app.utils import PDF_STYLESHEET_VERSION
+from app.utils.pdf_render import pdf_renderer
+
+PDF_CACHE_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+PDF_CACHE_DIR = os.environ.get("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "healthscan-pdf-cache"))
+PDF_CACHE_DISK_MAX_FILES = int(os.environ.get("PDF_CACHE_DISK_MAX_FILES", 2000))
+PDF_CACHE_DISK_RESCAN_SECONDS = int(os.environ.get("PDF_CACHE_DISK_RESCAN_SECONDS", 300))
+
+
+def pdf_cache_key(content: str) -> str:
+    """Return the cache key (and ETag value) for a record's content."""
+    digest = hashlib.sha256(PDF_STYLESHEET_VERSION.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update((content or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PdfCache:
+    """Two-tier (memory, disk) cache of rendered PDFs by content key."""
+
+    def __init__(
+        self,
+        max_bytes: int = PDF_CACHE_MAX_BYTES,
+        directory: Optional[str] = PDF_CACHE_DIR,
+        disk_max_files: int = PDF_CACHE_DISK_MAX_FILES,
+        disk_rescan_seconds: int = PDF_CACHE_DISK_RESCAN_SECONDS,
+    ):
+        self._memory = LRUCache(maxsize=max_bytes, getsizeof=len)
+        self._lock = threading.Lock()
+        self.directory = directory if disk_max_files > 0 else None
+        self.disk_max_files = disk_max_files
+        self.disk_rescan_seconds = disk_rescan_seconds
+        # Disk entries, least recently used first
+        self._disk_keys: "OrderedDict[str, None]" = OrderedDict()
+        self._disk_lock = threading.Lock()
+        self._disk_scanned_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._scan_disk()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _scan_disk(self) -> None:
+        """Rebuild the disk index from the directory, oldest file first."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".pdf"):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, entry.name[:-len(".pdf")]))
+            except OSError:
+                pass  # Removed by another worker meanwhile
+        entries.sort()
+        self._disk_keys = OrderedDict((key, None) for _, key in entries)
+        self._disk_scanned_at = time.monotonic()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            pdf = self._memory.get(key)
+        if pdf is None and self.directory:
+            try:
+                with open(self._path(key), "rb") as f:
+                    pdf = f.read()
+            except OSError:
+                pdf = None
+            if pdf is not None:
+                self._remember(key, pdf)
+                with self._disk_lock:
+                    if key in self._disk_keys:
+                        self._disk_keys.move_to_end(key)
+        with self._lock:
+            if pdf is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return pdf
+
+    def _remember(self, key: str, pdf: bytes) -> None:
+        with self._lock:
+            try:
+                self._memory[key] = pdf
+            except ValueError:
+                pass  # Larger than the whole memory tier; disk only
+
+    def set(self, key: str, pdf: bytes) -> None:
+        self._remember(key, pdf)
+        if not self.directory:
+            return
+        try:
+            # Write then rename, so other workers never read a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(pdf)
+            os.replace(tmp_path, self._path(key))
+            self._track_disk(key)
+        except OSError as e:
+            print(f"PDF cache write failed: {str(e)}")
+
+    def _track_disk(self, key: str) -> None:
+        """Record a written file and evict the least recently used beyond the limit."""
+        with self._disk_lock:
+            if time.monotonic() - self._disk_scanned_at >= self.disk_rescan_seconds:
+                self._scan_disk()
+            self._disk_keys[key] = None
+            self._disk_keys.move_to_end(key)
+            evicted = []
+            while len(self._disk_keys) > self.disk_max_files:
+                evicted.append(self._disk_keys.popitem(last=False)[0])
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass  # Already removed by another worker
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "memory_bytes": self._memory.currsize}
+
+
+pdf_cache = PdfCache()
+
+
+def render_record_pdf(content: str) -> bytes:
+    """Return the PDF for ``content``, rendering it only on a cache miss."""
+    key = pdf_cache_key(content)
+    pdf = pdf_cache.get(key)
+    if pdf is None:
+        pdf = pdf_renderer.render(content)
+        pdf_cache.set(key, pdf)
+    return pdf
+
+
+def pdf_response(request: Request, content: str, filename: str, cache_control: str = "private, no-cache") -> Response:
+    """
+    Serve the PDF of ``content`` with an ETag.
+
+    Returns 304 without rendering or reading the cache when the client
+    already has this version (If-None-Match).
+    """
+    etag = f'"{pdf_cache_key(content)}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Content-Disposition": f"attachment; filename={filename}",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=render_record_pdf(content), media_type="application/pdf", headers=headers)
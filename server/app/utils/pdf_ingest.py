@@ -0,0 +1,111 @@
+"""
+PDF ingestion for the OCR pipeline.
+
+Lab reports usually arrive as multi-page PDFs. Pages with an embedded text
+layer are read directly with pypdf and skip OCR entirely. Only image-only
+pages (scans) are handed to the OCR engines, as the page's embedded scan
+image.
+
+Page extraction is CPU-bound, so it is split into page ranges that run in
+parallel in the shared CPU pool.
+"""
+
+import asyncio
+import io
+import mimetypes
+import os
+from typing import List, Optional
+
+from pypdf import PdfReader
+
+from app.utils.cpu_pool import CPU_POOL_WORKERS, run_in_cpu_pool
+
+PDF_CONTENT_TYPE = "application/pdf"
+# Pages with less extracted text than this are treated as scans
+PDF_MIN_TEXT_CHARS = int(os.environ.get("PDF_MIN_TEXT_CHARS", 20))
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", 100))
+
+
+def is_pdf(content_type: Optional[str], data) -> bool:
+    """Detect a PDF by content type or, for generic uploads, by its magic bytes."""
+    if content_type == PDF_CONTENT_TYPE:
+        return True
+    return bytes(data[:5]) == b"%PDF-"
+
+
+def count_pdf_pages(data: bytes) -> int:
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+
+def extract_pdf_pages(data: bytes, start: int, stop: int) -> List[dict]:
+    """
+    Extract pages ``start``..``stop - 1`` of a PDF.
+
+    Args:
+        data: The PDF file bytes
+        start: First page index (0-based)
+        stop: Page index to stop before
+
+    Returns:
+        One dict per page with ``page`` (1-based), ``text`` (the embedded
+        text, or None for image-only pages), ``image`` and ``media_type``
+        (the page's largest embedded image, for image-only pages)
+    """
+    reader = PdfReader(io.BytesIO(data))
+    pages = []
+    for index in range(start, stop):
+        page = reader.pages[index]
+        entry = {"page": index + 1, "text": None, "image": None, "media_type": None}
+        try:
+            text = (page.extract_text() or "").strip()
+        except Exception as e:
+            print(f"PDF text extraction failed on page {index + 1}: {str(e)}")
+            text = ""
+        if len(text) >= PDF_MIN_TEXT_CHARS:
+            entry["text"] = text
+            pages.append(entry)
+            continue
+
+        # A scanned page is normally one full-page image; take the largest
+        try:
+            images = list(page.images)
+        except Exception as e:
+            print(f"PDF image extraction failed on page {index + 1}: {str(e)}")
+            images = []
+        if images:
+            scan = max(images, key=lambda image: len(image.data))
+            entry["image"] = scan.data
+            entry["media_type"] = mimetypes.guess_type(scan.name)[0] or "image/png"
+        elif text:
+            entry["text"] = text
+        pages.append(entry)
+    return pages
+
+
+async def ingest_pdf(data) -> List[dict]:
+    """
+    Split a PDF into pages, extracting page ranges in parallel.
+
+    Returns:
+        The pages in order (see ``extract_pdf_pages``)
+
+    Raises:
+        ValueError: If the PDF has no pages or more than PDF_MAX_PAGES
+    """
+    data = bytes(data)
+    page_count = await run_in_cpu_pool(count_pdf_pages, data)
+    if page_count == 0:
+        raise ValueError("PDF has no pages")
+    if page_count > PDF_MAX_PAGES:
+        raise ValueError(f"PDF has {page_count} pages; the limit is {PDF_MAX_PAGES}")
+
+    # One contiguous range per pool worker, so the PDF is parsed once per range
+    range_size = -(-page_count // max(1, CPU_POOL_WORKERS))
+    ranges = [
+        (start, min(start + range_size, page_count))
+        for start in range(0, page_count, range_size)
+    ]
+    chunks = await asyncio.gather(*(
+        run_in_cpu_pool(extract_pdf_pages, data, start, stop) for start, stop in ranges
+    ))
+    return [page for chunk in chunks for page in chunk]
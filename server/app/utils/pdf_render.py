@@ -0,0 +1,200 @@
+"""
+PDF rendering service.
+
+WeasyPrint is CPU-bound and holds the GIL, so rendering in a request thread
+stalls every other request on the worker. Renders run in a dedicated pool of
+PDF_RENDER_WORKERS processes instead. Each process parses the stylesheet and
+loads fonts once, in its initializer, and renders a small document to warm
+WeasyPrint up, so requests never pay that start-up cost.
+
+Workers are started with the "spawn" method: forking a uvicorn worker
+would copy its event loop, threads and open connections into the child.
+
+At most PDF_RENDER_MAX_PENDING renders may be queued or running; beyond
+that callers get HTTP 503 with Retry-After. A render that takes longer than
+PDF_RENDER_TIMEOUT_SECONDS gets HTTP 504, and the pool it ran on is
+recycled. A running render cannot be cancelled, so otherwise its worker
+would stay busy and its slot taken. Other renders in flight on the
+recycled pool fail with 503.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+PDF_RENDER_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+PDF_RENDER_MAX_PENDING = int(os.environ.get("PDF_RENDER_MAX_PENDING", PDF_RENDER_WORKERS * 4))
+PDF_RENDER_TIMEOUT_SECONDS = float(os.environ.get("PDF_RENDER_TIMEOUT_SECONDS", 30))
+PDF_RENDER_RETRY_AFTER_SECONDS = int(os.environ.get("PDF_RENDER_RETRY_AFTER_SECONDS", 5))
+
+# Per-process state of the render workers
+_worker_stylesheet = None
+_worker_font_config = None
+
+
+def _init_worker() -> None:
+    """Parse the stylesheet, load fonts and warm WeasyPrint up in a new worker."""
+    global _worker_stylesheet, _worker_font_config
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+    from app.utils import PDF_STYLESHEET, markdown_to_pdf_bytes
+
+    _worker_font_config = FontConfiguration()
+    _worker_stylesheet = CSS(string=PDF_STYLESHEET, font_config=_worker_font_config)
+    markdown_to_pdf_bytes("# Warm-up\n\nText", _worker_stylesheet, _worker_font_config)
+
+
+def _render(markdown_text: str) -> bytes:
+    from app.utils import markdown_to_pdf_bytes
+
+    return markdown_to_pdf_bytes(markdown_text, _worker_stylesheet, _worker_font_config)
+
+
+def _warm() -> None:
+    """No-op task, submitted to make the pool start its worker processes."""
+
+
+class PdfRenderer:
+    """Bounded process pool for Markdown to PDF rendering, with metrics."""
+
+    def __init__(
+        self,
+        workers: int = PDF_RENDER_WORKERS,
+        max_pending: int = PDF_RENDER_MAX_PENDING,
+        timeout_seconds: float = PDF_RENDER_TIMEOUT_SECONDS,
+    ):
+        self.workers = workers
+        self.timeout_seconds = timeout_seconds
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.stats = {
+            "count": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0,
+            "rejected": 0,
+            "timed_out": 0,
+            "failed": 0,
+        }
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker
+                )
+            return self._pool
+
+    def start(self) -> None:
+        """Start (and warm) every worker process ahead of the first request."""
+        pool = self._get_pool()
+        for _ in range(self.workers):
+            pool.submit(_warm)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _recycle(self, pool: ProcessPoolExecutor, terminate: bool = False) -> None:
+        """Stop using ``pool`` (killing its workers if ``terminate``) and start a fresh one."""
+        with self._lock:
+            if self._pool is not pool:
+                return  # Already replaced by another thread
+            self._pool = None
+        if terminate:
+            # ProcessPoolExecutor has no public way to do this before Python 3.14
+            for process in list((pool._processes or {}).values()):
+                process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        self.start()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def render(self, markdown_text: str) -> bytes:
+        """
+        Render Markdown to PDF bytes in the pool.
+
+        Blocks the calling thread (call from sync endpoints, which FastAPI
+        runs in its threadpool, or through ``asyncio.to_thread``).
+
+        Raises:
+            HTTPException: 503 when the queue is full or a worker crashed,
+                504 when the render times out
+        """
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="PDF generation is busy, please retry shortly",
+                headers={"Retry-After": str(PDF_RENDER_RETRY_AFTER_SECONDS)}
+            )
+
+        started = time.perf_counter()
+        pool = self._get_pool()
+        try:
+            future = pool.submit(_render, markdown_text or "")
+        except BrokenProcessPool:
+            self._slots.release()
+            self._recycle(pool)
+            raise self._unavailable()
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            pdf = future.result(timeout=self.timeout_seconds)
+        except TimeoutError:
+            if not future.cancel():
+                # Still running: free the worker (and, through the pool's
+                # failure of its futures, the slot)
+                self._recycle(pool, terminate=True)
+            self._count("timed_out")
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="PDF generation timed out"
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory, or a recycled pool)
+            self._recycle(pool)
+            raise self._unavailable()
+        except Exception as e:
+            self._count("failed")
+            print(f"PDF rendering failed: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to generate PDF"
+            )
+
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self.stats["count"] += 1
+            self.stats["total_seconds"] += seconds
+            self.stats["max_seconds"] = max(self.stats["max_seconds"], seconds)
+        return pdf
+
+    def _unavailable(self) -> HTTPException:
+        self._count("failed")
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="PDF generation is unavailable, please retry shortly",
+            headers={"Retry-After": str(PDF_RENDER_RETRY_AFTER_SECONDS)}
+        )
+
+    def metrics(self) -> dict:
+        with self._lock:
+            metrics = dict(self.stats)
+        metrics["avg_seconds"] = round(metrics["total_seconds"] / metrics["count"], 4) if metrics["count"] else 0.0
+        return metrics
+
+
+pdf_renderer = PdfRenderer()
@@ -0,0 +1,104 @@
+"""
+QR code rendering service.
+
+QR images are a pure function of their payload and options, and the same
+share link is fetched repeatedly, so encoded PNG and SVG bytes are memoized
+in an LRU bounded by total bytes (QR_CACHE_MAX_BYTES), keyed by payload,
+format, box size and error-correction level.
+
+Misses are encoded in a small thread pool (QR_RENDER_WORKERS) so PIL's PNG
+encoding does not run on the event loop. SVG output skips raster encoding
+entirely and is a fraction of the size of the PNG.
+
+Do not render secrets through this service (e.g. TOTP provisioning URIs):
+they would be kept in the cache.
+"""
+
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+from cachetools import LRUCache
+from fastapi import Response
+from qrcode.image.svg import SvgPathFillImage
+
+from app.utils import make_qr
+
+QR_CACHE_MAX_BYTES = int(os.environ.get("QR_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+QR_RENDER_WORKERS = int(os.environ.get("QR_RENDER_WORKERS", 2))
+
+QR_FORMAT_PATTERN = "^(png|svg)$"
+QR_ERROR_CORRECTION_PATTERN = "^[LMQH]$"
+
+QR_MEDIA_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+
+def encode_qr(payload: str, fmt: str, box_size: int, error_correction: str) -> bytes:
+    """Encode a QR code as PNG or SVG bytes."""
+    buffer = io.BytesIO()
+    if fmt == "svg":
+        make_qr(payload, box_size, error_correction, image_factory=SvgPathFillImage).save(buffer)
+    else:
+        make_qr(payload, box_size, error_correction).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class QrRenderer:
+    """Memoizing QR encoder backed by a thread pool."""
+
+    def __init__(self, max_bytes: int = QR_CACHE_MAX_BYTES, workers: int = QR_RENDER_WORKERS):
+        self._cache = LRUCache(maxsize=max_bytes, getsizeof=len)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qr")
+
+    async def render(
+        self,
+        payload: str,
+        fmt: str = "png",
+        box_size: int = 10,
+        error_correction: str = "L",
+    ) -> bytes:
+        """
+        Return the encoded QR code for ``payload``.
+
+        Args:
+            payload: Text to encode (typically a share URL)
+            fmt: "png" or "svg"
+            box_size: Pixels per module (PNG only, but part of the key)
+            error_correction: L, M, Q or H
+
+        Returns:
+            Image bytes
+        """
+        key: Tuple[str, str, int, str] = (payload, fmt, box_size, error_correction)
+        with self._lock:
+            data = self._cache.get(key)
+        if data is not None:
+            return data
+
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(self._pool, encode_qr, payload, fmt, box_size, error_correction)
+        with self._lock:
+            try:
+                self._cache[key] = data
+            except ValueError:
+                pass  # Larger than the whole cache
+        return data
+
+
+qr_renderer = QrRenderer()
+
+
+def qr_response(data: bytes, fmt: str, filename: str) -> Response:
+    """Build the download response for an encoded QR code (``filename`` without extension)."""
+    return Response(
+        content=data,
+        media_type=QR_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}.{fmt}"}
+    )
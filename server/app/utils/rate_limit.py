@@ -0,0 +1,209 @@
+"""
+Token-bucket rate limiting for expensive endpoints.
+
+OCR uploads, doctor resume verification, PDF export and QR generation burn
+CPU or paid model calls. Each is matched by a ``RateLimitRule`` with its own
+bucket per caller: the user ID from the bearer token when there is one
+(decoded without a database lookup), otherwise the client IP.
+
+A request takes one unit from its bucket when it arrives. Handlers whose
+cost depends on the payload take the rest with ``charge`` (an OCR upload of
+10 images costs 10 units). Buckets live in a ``RateLimitBackend``: in memory
+by default, or a shared store plugged in with ``set_rate_limit_backend`` so
+every uvicorn worker draws from the same buckets.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import jwt
+from cachetools import LRUCache
+from fastapi import HTTPException, Request, status
+
+from app.oauth2 import ALGORITHM, SECRET_KEY
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_MAX_BUCKETS = int(os.environ.get("RATE_LIMIT_MAX_BUCKETS", 100000))
+# Proxies in front of the app that append to X-Forwarded-For (the Heroku
+# router is one). The client address is the hop this many from the end;
+# anything before it was supplied by the client. 0 ignores the header.
+RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get("RATE_LIMIT_TRUSTED_PROXIES", 1))
+
+
+class RateLimitRule:
+    """
+    A bucket definition for the requests matching ``method`` and ``path``.
+
+    Args:
+        name: Bucket namespace (rules with the same name share buckets)
+        method: HTTP method
+        path: Regular expression matched against the full request path
+        capacity: Burst size, in units
+        per_seconds: Time for an empty bucket to refill completely
+    """
+
+    def __init__(self, name: str, method: str, path: str, capacity: int, per_seconds: float):
+        self.name = name
+        self.method = method
+        self.pattern = re.compile(path)
+        self.capacity = capacity
+        self.refill_rate = capacity / per_seconds
+
+    def matches(self, method: str, path: str) -> bool:
+        return method == self.method and self.pattern.match(path) is not None
+
+
+def _limit(name: str, default: str) -> Tuple[int, float]:
+    """Read a "capacity/seconds" limit from RATE_LIMIT_<NAME>."""
+    capacity, seconds = os.environ.get(f"RATE_LIMIT_{name.upper()}", default).split("/")
+    return int(capacity), float(seconds)
+
+
+DEFAULT_RULES: List[RateLimitRule] = [
+    RateLimitRule("ocr", "POST", r"^/ocr/images-to-text/?$", *_limit("ocr", "30/60")),
+    RateLimitRule("doctor_register", "POST", r"^/doctor/register/?$", *_limit("doctor_register", "5/3600")),
+    RateLimitRule("pdf", "GET", r"^/records/[^/]+/pdf/?$", *_limit("pdf", "20/60")),
+    RateLimitRule("pdf", "GET", r"^/records/share/[^/]+/pdf/?$", *_limit("pdf", "20/60")),
+    RateLimitRule("qr", "POST", r"^/qr/", *_limit("qr", "30/60")),
+]
+
+
+class RateLimitBackend:
+    """Interface for token-bucket stores."""
+
+    def consume(self, key: str, cost: float, capacity: int, refill_rate: float) -> Tuple[bool, float]:
+        """
+        Take ``cost`` units from the bucket ``key``.
+
+        Returns:
+            Tuple of (whether the units were available, seconds until they
+            would be); nothing is taken when the request is refused
+        """
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Buckets kept in this process, least recently used evicted first."""
+
+    def __init__(self, max_buckets: int = RATE_LIMIT_MAX_BUCKETS):
+        self._buckets = LRUCache(maxsize=max_buckets)
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, cost: float, capacity: int, refill_rate: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+        return False, (min(cost, capacity) - tokens) / refill_rate
+
+
+_backend: RateLimitBackend = MemoryRateLimitBackend()
+
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    return _backend
+
+
+def set_rate_limit_backend(backend: RateLimitBackend) -> None:
+    """Replace the bucket store (e.g. with one shared by all workers)."""
+    global _backend
+    _backend = backend
+
+
+def client_key(headers: dict, client: Optional[tuple], trusted_proxies: int = RATE_LIMIT_TRUSTED_PROXIES) -> str:
+    """Identify the caller: user ID from a valid bearer token, else client IP."""
+    authorization = headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            payload = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM])
+            if payload.get("user_id") is not None:
+                return f"user:{payload['user_id']}"
+        except jwt.InvalidTokenError:
+            pass
+    # Only the hops appended by our own proxies can be trusted; earlier ones
+    # are whatever the client sent
+    forwarded = [hop.strip() for hop in headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    if trusted_proxies > 0 and len(forwarded) >= trusted_proxies:
+        return f"ip:{forwarded[-trusted_proxies]}"
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+def _retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+def charge(request: Request, units: float) -> None:
+    """
+    Take additional units for the current request from its bucket.
+
+    Call from handlers whose cost grows with the payload. Does nothing when
+    the route has no rate limit.
+
+    Raises:
+        HTTPException: 413 when the request costs more than the bucket can
+            ever hold, 429 with Retry-After when the bucket cannot cover it
+    """
+    limit = request.scope.get("state", {}).get("rate_limit")
+    if limit is None or units <= 0:
+        return
+    rule, key = limit
+    # One unit was taken on arrival
+    if units + 1 > rule.capacity:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request too large for the rate limit (at most {rule.capacity} units per request)"
+        )
+    allowed, wait = get_rate_limit_backend().consume(key, units, rule.capacity, rule.refill_rate)
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded, please retry later",
+            headers={"Retry-After": _retry_after(wait)}
+        )
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying ``rules`` before requests reach the routers."""
+
+    def __init__(self, app, rules: Optional[List[RateLimitRule]] = None):
+        self.app = app
+        self.rules = DEFAULT_RULES if rules is None else rules
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        rule = next((r for r in self.rules if r.matches(scope["method"], scope["path"])), None)
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        key = f"{rule.name}:{client_key(headers, scope.get('client'))}"
+        allowed, wait = get_rate_limit_backend().consume(key, 1, rule.capacity, rule.refill_rate)
+        if not allowed:
+            body = json.dumps({"detail": "Rate limit exceeded, please retry later"}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": status.HTTP_429_TOO_MANY_REQUESTS,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"retry-after", _retry_after(wait).encode("latin-1")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        scope.setdefault("state", {})["rate_limit"] = (rule, key)
+        await self.app(scope, receive, send)
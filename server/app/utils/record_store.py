@@ -0,0 +1,105 @@
+"""
+Bulk persistence for records.
+
+Records created by OCR uploads and by the manual/doctor create endpoints are
+written with one executemany INSERT: a single statement executed with every
+row's parameters, which the driver batches, instead of a flush per ORM
+object. IDs and timestamps are assigned client-side, so nothing has to be
+read back afterwards: there is no per-row refresh, and the Record objects
+stay usable after the commit.
+
+``Record.content_hash`` is set by the model whenever content is assigned.
+Rows written before the column existed are filled in by
+``backfill_content_hashes`` at startup.
+"""
+
+import os
+import uuid
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Record
+from app.models.record import record_content_hash
+from app.utils.share_cache import invalidate_shared_collection
+
+CONTENT_HASH_BACKFILL_BATCH_SIZE = int(os.environ.get("CONTENT_HASH_BACKFILL_BATCH_SIZE", 200))
+
+_RECORD_COLUMNS = [column.key for column in Record.__table__.columns]
+
+
+def bulk_create_records(db: Session, records: List[Record]) -> List[Record]:
+    """
+    Insert new records with one executemany INSERT.
+
+    The records are not added to the session. They get their ``id``,
+    ``created_at`` and ``updated_at`` here and keep their values after the
+    caller commits, so they can be serialized without reloading.
+
+    Args:
+        db: Database session (the caller commits)
+        records: Unsaved Record objects
+
+    Returns:
+        The same records, with IDs and timestamps filled in
+    """
+    if not records:
+        return records
+
+    now = datetime.utcnow()
+    for record in records:
+        if record.id is None:
+            record.id = str(uuid.uuid4())
+        record.created_at = record.created_at or now
+        record.updated_at = record.updated_at or now
+
+    db.execute(
+        insert(Record),
+        [{key: getattr(record, key) for key in _RECORD_COLUMNS} for record in records]
+    )
+    # Cached share views of the target collections are now stale
+    invalidate_shared_collection(*{record.collection_id for record in records})
+    return records
+
+
+def backfill_content_hashes(batch_size: int = CONTENT_HASH_BACKFILL_BATCH_SIZE) -> int:
+    """
+    Fill in ``content_hash`` for records that predate it, in batches.
+
+    Each batch is written with one executemany UPDATE. ``updated_at`` is
+    left alone: the records did not change.
+
+    Returns:
+        Number of records updated
+    """
+    table = Record.__table__
+    statement = update(table).where(table.c.id == bindparam("record_id")).values(
+        content_hash=bindparam("hash"),
+        updated_at=table.c.updated_at
+    )
+    updated = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.query(Record.id, Record.content).filter(
+                Record.content_hash.is_(None)
+            ).limit(batch_size).all()
+            if rows:
+                db.execute(statement, [
+                    {"record_id": row.id, "hash": record_content_hash(row.content)} for row in rows
+                ])
+            db.commit()
+            updated += len(rows)
+            if len(rows) < batch_size:
+                break
+    except Exception as e:
+        db.rollback()
+        print(f"Content hash backfill failed: {str(e)}")
+    finally:
+        db.close()
+    if updated:
+        print(f"Backfilled content hashes for {updated} records")
+    return updated
@@ -0,0 +1,227 @@
+"""
+Refresh-token rotation store.
+
+Every refresh token carries a token ID (``jti``) and a session ID shared by
+all tokens descended from the same login. ``/refresh`` consumes the
+presented token and issues a new pair in the same session. Presenting a
+token that was already consumed means it leaked (the legitimate client
+already moved on), so the whole session is revoked.
+
+Lookups are by primary key (SQL) or dict key (memory). Expired entries are
+purged in batches by ``purge_refresh_tokens_periodically``.
+
+Two backends:
+- ``SqlRefreshTokenStore`` (default): shared by every uvicorn worker
+- ``MemoryRefreshTokenStore``: single process only, for development and tests
+
+Select with REFRESH_TOKEN_STORE=sql|memory, or plug in another with
+``set_refresh_token_store``.
+"""
+
+import asyncio
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from app.database import SessionLocal
+from app.models import RefreshToken
+
+REFRESH_TOKEN_STORE = os.environ.get("REFRESH_TOKEN_STORE", "sql")
+REFRESH_TOKEN_PURGE_BATCH_SIZE = int(os.environ.get("REFRESH_TOKEN_PURGE_BATCH_SIZE", 500))
+REFRESH_TOKEN_PURGE_INTERVAL_SECONDS = int(os.environ.get("REFRESH_TOKEN_PURGE_INTERVAL_SECONDS", 3600))
+
+# Outcomes of RefreshTokenStore.consume
+ROTATED = "rotated"
+UNKNOWN = "unknown"
+REUSED = "reused"
+
+
+class RefreshTokenStore:
+    """Interface for refresh-token stores."""
+
+    def add(self, jti: str, session_id: str, user_id: int, expires_at: datetime) -> None:
+        """Record a newly issued refresh token."""
+        raise NotImplementedError
+
+    def consume(self, jti: str, user_id: int) -> str:
+        """
+        Mark a token as exchanged.
+
+        Returns:
+            ROTATED if the token was valid and unused; UNKNOWN if it does not
+            exist or has expired; REUSED if it was already used or revoked,
+            in which case its whole session has been revoked
+        """
+        raise NotImplementedError
+
+    def revoke_session(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def revoke_user(self, user_id: int) -> None:
+        """Revoke every session of a user (e.g. on logout everywhere)."""
+        raise NotImplementedError
+
+    def purge_expired(self, batch_size: int = REFRESH_TOKEN_PURGE_BATCH_SIZE) -> int:
+        """Delete expired tokens in batches; returns how many were removed."""
+        raise NotImplementedError
+
+
+class MemoryRefreshTokenStore(RefreshTokenStore):
+    """Process-local store indexed by jti, session and user."""
+
+    def __init__(self):
+        self._tokens: Dict[str, dict] = {}
+        self._sessions: Dict[str, Set[str]] = {}
+        self._users: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, jti: str, session_id: str, user_id: int, expires_at: datetime) -> None:
+        with self._lock:
+            self._tokens[jti] = {
+                "session_id": session_id,
+                "user_id": user_id,
+                "expires_at": expires_at,
+                "used": False,
+                "revoked": False,
+            }
+            self._sessions.setdefault(session_id, set()).add(jti)
+            self._users.setdefault(user_id, set()).add(jti)
+
+    def consume(self, jti: str, user_id: int) -> str:
+        with self._lock:
+            token = self._tokens.get(jti)
+            if token is None or token["user_id"] != user_id or token["expires_at"] <= datetime.utcnow():
+                return UNKNOWN
+            if token["used"] or token["revoked"]:
+                self._revoke(self._sessions.get(token["session_id"], ()))
+                return REUSED
+            token["used"] = True
+            return ROTATED
+
+    def _revoke(self, jtis) -> None:
+        for jti in jtis:
+            self._tokens[jti]["revoked"] = True
+
+    def revoke_session(self, session_id: str) -> None:
+        with self._lock:
+            self._revoke(self._sessions.get(session_id, ()))
+
+    def revoke_user(self, user_id: int) -> None:
+        with self._lock:
+            self._revoke(self._users.get(user_id, ()))
+
+    def purge_expired(self, batch_size: int = REFRESH_TOKEN_PURGE_BATCH_SIZE) -> int:
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [jti for jti, token in self._tokens.items() if token["expires_at"] <= now]
+            for jti in expired:
+                token = self._tokens.pop(jti)
+                for index, key in ((self._sessions, token["session_id"]), (self._users, token["user_id"])):
+                    members = index.get(key)
+                    if members is not None:
+                        members.discard(jti)
+                        if not members:
+                            del index[key]
+        return len(expired)
+
+
+class SqlRefreshTokenStore(RefreshTokenStore):
+    """Store backed by the refresh_tokens table; each call uses its own session."""
+
+    def add(self, jti: str, session_id: str, user_id: int, expires_at: datetime) -> None:
+        db = SessionLocal()
+        try:
+            db.add(RefreshToken(jti=jti, session_id=session_id, user_id=user_id, expires_at=expires_at))
+            db.commit()
+        finally:
+            db.close()
+
+    def consume(self, jti: str, user_id: int) -> str:
+        db = SessionLocal()
+        try:
+            # Conditional update, so two concurrent refreshes cannot both win
+            rotated = db.query(RefreshToken).filter(
+                RefreshToken.jti == jti,
+                RefreshToken.user_id == user_id,
+                RefreshToken.used == False,
+                RefreshToken.revoked == False,
+                RefreshToken.expires_at > datetime.utcnow()
+            ).update({RefreshToken.used: True}, synchronize_session=False)
+            if rotated:
+                db.commit()
+                return ROTATED
+
+            token = db.query(RefreshToken).filter(RefreshToken.jti == jti).first()
+            if token is None or token.user_id != user_id or token.expires_at <= datetime.utcnow():
+                return UNKNOWN
+            db.query(RefreshToken).filter(
+                RefreshToken.session_id == token.session_id
+            ).update({RefreshToken.revoked: True}, synchronize_session=False)
+            db.commit()
+            return REUSED
+        finally:
+            db.close()
+
+    def revoke_session(self, session_id: str) -> None:
+        self._revoke(RefreshToken.session_id == session_id)
+
+    def revoke_user(self, user_id: int) -> None:
+        self._revoke(RefreshToken.user_id == user_id)
+
+    def _revoke(self, criterion) -> None:
+        db = SessionLocal()
+        try:
+            db.query(RefreshToken).filter(criterion).update(
+                {RefreshToken.revoked: True}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def purge_expired(self, batch_size: int = REFRESH_TOKEN_PURGE_BATCH_SIZE) -> int:
+        purged = 0
+        db = SessionLocal()
+        try:
+            while True:
+                jtis = [row.jti for row in db.query(RefreshToken.jti).filter(
+                    RefreshToken.expires_at <= datetime.utcnow()
+                ).limit(batch_size).all()]
+                if not jtis:
+                    break
+                db.query(RefreshToken).filter(
+                    RefreshToken.jti.in_(jtis)
+                ).delete(synchronize_session=False)
+                db.commit()
+                purged += len(jtis)
+                if len(jtis) < batch_size:
+                    break
+        finally:
+            db.close()
+        return purged
+
+
+_store: RefreshTokenStore = (
+    MemoryRefreshTokenStore() if REFRESH_TOKEN_STORE == "memory" else SqlRefreshTokenStore()
+)
+
+
+def get_refresh_token_store() -> RefreshTokenStore:
+    return _store
+
+
+def set_refresh_token_store(store: RefreshTokenStore) -> None:
+    global _store
+    _store = store
+
+
+async def purge_refresh_tokens_periodically() -> None:
+    """Purge expired refresh tokens every REFRESH_TOKEN_PURGE_INTERVAL_SECONDS."""
+    while True:
+        try:
+            purged = await asyncio.to_thread(get_refresh_token_store().purge_expired)
+            if purged:
+                print(f"Purged {purged} expired refresh tokens")
+        except Exception as e:
+            print(f"Refresh token purge failed: {str(e)}")
+        await asyncio.sleep(REFRESH_TOKEN_PURGE_INTERVAL_SECONDS)
@@ -0,0 +1,133 @@
+"""
+Response cache for the public share-link endpoints.
+
+Scanned QR codes produce bursts of identical unauthenticated requests for
+the same token. The resolved share (serialized JSON, plus the record content
+the PDF is rendered from) is cached per token for SHARE_CACHE_TTL_SECONDS,
+so a burst costs one set of queries. The rendered PDF itself comes from
+``pdf_cache``.
+
+Entries are indexed by the record or collection they expose. Endpoints that
+change a record or collection call ``invalidate_shared_record`` or
+``invalidate_shared_collection`` after committing; other workers see the
+change when their entry expires. An entry never outlives its share's
+``expires_at``.
+
+Responses carry an ETag with ``Cache-Control: private, no-cache``: a client
+that scans again revalidates and gets a 304, but neither it nor a shared
+cache reuses the response without asking, so a deactivated share or a
+deleted record stops being served at once.
+"""
+
+import hashlib
+import os
+import threading
+from datetime import datetime
+from typing import Optional, Set, Tuple
+
+from cachetools import TTLCache
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+SHARE_CACHE_MAX_ENTRIES = int(os.environ.get("SHARE_CACHE_MAX_ENTRIES", 10000))
+SHARE_CACHE_TTL_SECONDS = int(os.environ.get("SHARE_CACHE_TTL_SECONDS", 30))
+
+RECORD = "record"
+COLLECTION = "collection"
+
+
+class SharedPayload:
+    """
+    A resolved share, ready to serve.
+
+    Args:
+        kind: RECORD or COLLECTION
+        target_id: ID of the shared record or collection
+        data: Response body (serialized once, here)
+        expires_at: Expiry of the share, if any
+        content: Markdown of a shared record, for its PDF
+        filename: Download filename of a shared record's PDF
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        target_id: str,
+        data,
+        expires_at: Optional[datetime] = None,
+        content: Optional[str] = None,
+        filename: Optional[str] = None,
+    ):
+        self.kind = kind
+        self.target_id = target_id
+        self.body = JSONResponse(content=jsonable_encoder(data)).body
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.expires_at = expires_at
+        self.content = content
+        self.filename = filename
+
+    def is_expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at <= datetime.utcnow()
+
+    def response(self, request: Request) -> Response:
+        """The JSON response, or 304 when the client already has this version."""
+        headers = {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+        if request.headers.get("if-none-match") == self.etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+class ShareResponseCache:
+    """TTL cache of SharedPayloads by (kind, token), indexed by shared object."""
+
+    def __init__(self, max_entries: int = SHARE_CACHE_MAX_ENTRIES, ttl: int = SHARE_CACHE_TTL_SECONDS):
+        self._entries = TTLCache(maxsize=max_entries, ttl=ttl)
+        # (kind, target_id) -> tokens; one target per entry, so this never
+        # holds more live keys than _entries
+        self._tokens = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, token: str) -> Optional[SharedPayload]:
+        with self._lock:
+            payload = self._entries.get((kind, token))
+            if payload is not None and payload.is_expired():
+                del self._entries[(kind, token)]
+                payload = None
+        return payload
+
+    def set(self, token: str, payload: SharedPayload) -> SharedPayload:
+        target = (payload.kind, payload.target_id)
+        with self._lock:
+            self._entries[(payload.kind, token)] = payload
+            tokens: Set[str] = self._tokens.get(target) or set()
+            tokens.add(token)
+            self._tokens[target] = tokens
+        return payload
+
+    def invalidate(self, *targets: Tuple[str, Optional[str]]) -> None:
+        """Drop the entries exposing any of the given (kind, target_id) pairs."""
+        with self._lock:
+            for kind, target_id in targets:
+                if target_id is None:
+                    continue
+                for token in self._tokens.pop((kind, target_id), ()):
+                    self._entries.pop((kind, token), None)
+
+    def invalidate_token(self, token: str) -> None:
+        """Drop a single share (e.g. when it is deactivated)."""
+        with self._lock:
+            for kind in (RECORD, COLLECTION):
+                self._entries.pop((kind, token), None)
+
+
+share_cache = ShareResponseCache()
+
+
+def invalidate_shared_record(record_id: str, *collection_ids: Optional[str]) -> None:
+    """Drop cached shares of a record and of the collections it is (or was) in."""
+    share_cache.invalidate((RECORD, record_id), *((COLLECTION, c) for c in collection_ids))
+
+
+def invalidate_shared_collection(*collection_ids: Optional[str]) -> None:
+    share_cache.invalidate(*((COLLECTION, c) for c in collection_ids))
@@ -0,0 +1,268 @@
+"""
+Share link management.
+
+Requesting a QR code for a record or collection reuses the creator's
+existing active share of it with the same expiry instead of inserting a new
+row each time, so the shares table only grows with what is actually shared.
+A share is never reused for a different lifetime, and reusing one never
+changes its expiry: a link already handed out keeps the lifetime it was
+created with. Expiries are rounded down to the hour so repeated requests for
+the same lifetime match. Shares are matched on ``Share.reuse_key``, which
+is unique, so concurrent requests end up with one share.
+
+``sweep_shares_periodically`` deactivates expired shares and deletes
+long-inactive ones in batches.
+
+The public share endpoints resolve a token together with what it exposes
+in a single joined query (``resolve_record_share``,
+``resolve_collection_share``), selecting only the columns they return.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, or_
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Collection, Record, Share
+from app.utils.share_cache import COLLECTION, RECORD, share_cache
+
+SHARE_DEFAULT_TTL_DAYS = os.environ.get("SHARE_DEFAULT_TTL_DAYS")  # Unset: shares never expire
+SHARE_RETENTION_DAYS = int(os.environ.get("SHARE_RETENTION_DAYS", 30))
+SHARE_SWEEP_BATCH_SIZE = int(os.environ.get("SHARE_SWEEP_BATCH_SIZE", 500))
+SHARE_SWEEP_INTERVAL_SECONDS = int(os.environ.get("SHARE_SWEEP_INTERVAL_SECONDS", 3600))
+
+
+def active_share_filter(now: Optional[datetime] = None):
+    """Criteria matching shares that can still be used."""
+    now = now or datetime.utcnow()
+    return (
+        Share.is_active == True,
+        or_(Share.expires_at.is_(None), Share.expires_at > now),
+    )
+
+
+def share_reuse_key(
+    created_by: int,
+    record_id: Optional[str],
+    collection_id: Optional[str],
+    expires_at: Optional[datetime],
+) -> str:
+    """Key identifying interchangeable active shares (see ``Share.reuse_key``)."""
+    target = f"record:{record_id}" if record_id is not None else f"collection:{collection_id}"
+    expiry = expires_at.strftime("%Y%m%d%H") if expires_at is not None else "never"
+    return f"{target}:{created_by}:{expiry}"
+
+
+def get_or_create_share(
+    db: Session,
+    created_by: int,
+    record_id: Optional[str] = None,
+    collection_id: Optional[str] = None,
+    expires_in_days: Optional[int] = None,
+) -> Share:
+    """
+    Return the creator's active share of a record or collection with the
+    requested expiry, creating it if needed.
+
+    Args:
+        db: Database session (committed here)
+        created_by: User ID of the sharer
+        record_id: Shared record, or None
+        collection_id: Shared collection, or None
+        expires_in_days: Lifetime of the link, rounded down to the hour;
+            SHARE_DEFAULT_TTL_DAYS when None
+
+    Returns:
+        The share
+    """
+    if expires_in_days is None and SHARE_DEFAULT_TTL_DAYS:
+        expires_in_days = int(SHARE_DEFAULT_TTL_DAYS)
+    expires_at = None
+    if expires_in_days:
+        expires_at = (datetime.utcnow() + timedelta(days=expires_in_days)).replace(
+            minute=0, second=0, microsecond=0
+        )
+    reuse_key = share_reuse_key(created_by, record_id, collection_id, expires_at)
+
+    share = db.query(Share).filter(Share.reuse_key == reuse_key).first()
+    if share is not None:
+        return share
+
+    share = Share(
+        record_id=record_id,
+        collection_id=collection_id,
+        created_by=created_by,
+        expires_at=expires_at,
+        reuse_key=reuse_key
+    )
+    db.add(share)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request inserted the same share first
+        db.rollback()
+        share = db.query(Share).filter(Share.reuse_key == reuse_key).first()
+        if share is None:
+            raise
+        return share
+    db.refresh(share)
+    return share
+
+
+def resolve_record_share(db: Session, share_token: str) -> Row:
+    """
+    Fetch an active record share and the shared record in one query.
+
+    Returns:
+        Row with the share's ``expires_at`` and the record's ``id``,
+        ``filename``, ``content``, ``content_hash`` (None until backfilled),
+        ``file_size``, ``file_type`` and ``created_at``
+
+    Raises:
+        HTTPException: 404 when the share is unknown, inactive or expired,
+            or its record no longer exists
+    """
+    row = db.query(
+        Share.expires_at,
+        Record.id,
+        Record.filename,
+        Record.content,
+        Record.content_hash,
+        Record.file_size,
+        Record.file_type,
+        Record.created_at,
+    ).select_from(Share).outerjoin(
+        Record, Record.id == Share.record_id
+    ).filter(
+        Share.share_token == share_token,
+        *active_share_filter(),
+        Share.record_id.isnot(None)
+    ).first()
+
+    if row is None:
+        raise HTTPException(status_code=404, detail="Invalid or expired share link")
+    if row.id is None:
+        raise HTTPException(status_code=404, detail="Record not found")
+    return row
+
+
+def resolve_collection_share(db: Session, share_token: str) -> Tuple[Row, List[Row]]:
+    """
+    Fetch an active collection share, the collection and its records in one query.
+
+    Returns:
+        Tuple of (row with the share's ``expires_at`` and the collection's
+        ``collection_id``, ``name``, ``description`` and
+        ``collection_created_at``; rows with each record's ``record_id``,
+        ``filename``, ``content`` and ``record_created_at``)
+
+    Raises:
+        HTTPException: 404 when the share is unknown, inactive or expired,
+            or its collection no longer exists
+    """
+    rows = db.query(
+        Share.expires_at,
+        Collection.id.label("collection_id"),
+        Collection.name,
+        Collection.description,
+        Collection.created_at.label("collection_created_at"),
+        Record.id.label("record_id"),
+        Record.filename,
+        Record.content,
+        Record.created_at.label("record_created_at"),
+    ).select_from(Share).outerjoin(
+        Collection, Collection.id == Share.collection_id
+    ).outerjoin(
+        Record, Record.collection_id == Collection.id
+    ).filter(
+        Share.share_token == share_token,
+        *active_share_filter(),
+        Share.collection_id.isnot(None)
+    ).all()
+
+    if not rows:
+        raise HTTPException(status_code=404, detail="Invalid or expired share link")
+    if rows[0].collection_id is None:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    return rows[0], [row for row in rows if row.record_id is not None]
+
+
+def owned_share_targets(db: Session, user_id: int) -> List[Tuple[str, str]]:
+    """
+    List the records and collections a user owns, as ``share_cache`` targets.
+
+    Collect them before deleting the user (their content goes with them),
+    then pass them to ``share_cache.invalidate`` after committing.
+    """
+    record_ids = db.query(Record.id).filter(Record.user_id == user_id).all()
+    collection_ids = db.query(Collection.id).filter(Collection.user_id == user_id).all()
+    return (
+        [(RECORD, row.id) for row in record_ids]
+        + [(COLLECTION, row.id) for row in collection_ids]
+    )
+
+
+def sweep_shares(batch_size: int = SHARE_SWEEP_BATCH_SIZE) -> dict:
+    """
+    Deactivate expired shares, then delete shares inactive for SHARE_RETENTION_DAYS.
+
+    Works in batches of ``batch_size`` rows, committing after each.
+
+    Returns:
+        Counts of deactivated and deleted shares
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=SHARE_RETENTION_DAYS)
+    counts = {"deactivated": 0, "deleted": 0}
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.query(Share.id, Share.share_token).filter(
+                Share.is_active == True,
+                Share.expires_at <= now
+            ).limit(batch_size).all()
+            ids = [row.id for row in rows]
+            if ids:
+                db.query(Share).filter(Share.id.in_(ids)).update(
+                    {Share.is_active: False, Share.reuse_key: None}, synchronize_session=False
+                )
+                db.commit()
+                for row in rows:
+                    share_cache.invalidate_token(row.share_token)
+                counts["deactivated"] += len(ids)
+            if len(ids) < batch_size:
+                break
+
+        while True:
+            ids = [row.id for row in db.query(Share.id).filter(
+                Share.is_active == False,
+                func.coalesce(Share.expires_at, Share.created_at) <= cutoff
+            ).limit(batch_size).all()]
+            if ids:
+                db.query(Share).filter(Share.id.in_(ids)).delete(synchronize_session=False)
+                db.commit()
+                counts["deleted"] += len(ids)
+            if len(ids) < batch_size:
+                break
+    finally:
+        db.close()
+    return counts
+
+
+async def sweep_shares_periodically() -> None:
+    """Run ``sweep_shares`` every SHARE_SWEEP_INTERVAL_SECONDS."""
+    while True:
+        try:
+            counts = await asyncio.to_thread(sweep_shares)
+            if counts["deactivated"] or counts["deleted"]:
+                print(f"Share sweep: {counts['deactivated']} deactivated, {counts['deleted']} deleted")
+        except Exception as e:
+            print(f"Share sweep failed: {str(e)}")
+        await asyncio.sleep(SHARE_SWEEP_INTERVAL_SECONDS)
@@ -0,0 +1,142 @@
+"""
+Minimum access-token version per user, shared by every worker.
+
+Access tokens carry the ``token_version`` of their user when they were
+issued (the ``ver`` claim). ``oauth2.revoke_tokens`` bumps the version and
+records the new minimum in the token_revocations table; a deleted user gets
+``DELETED_USER_VERSION``. Tokens below a user's minimum are rejected on
+every authentication path, including the claims-only path of
+``get_current_principal`` that never loads the user row.
+
+Each worker mirrors the table in memory. Revocations made by this worker
+apply as soon as their transaction commits; those made by other workers are
+picked up by ``sync_token_revocations_periodically`` within
+TOKEN_REVOCATION_SYNC_SECONDS, which also drops the affected users from the
+user cache. Rows are purged once every access token they could reject has
+expired.
+"""
+
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import TokenRevocation
+from app.utils.user_cache import invalidate_user_cache
+
+TOKEN_REVOCATION_SYNC_SECONDS = int(os.environ.get("TOKEN_REVOCATION_SYNC_SECONDS", 5))
+# Access tokens outlive a revocation by at most their own lifetime
+TOKEN_REVOCATION_RETENTION_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", 30)) + 5
+# Re-read rows this far back on every sync, for commits that land after a
+# row's revoked_at and for clock skew between hosts
+TOKEN_REVOCATION_SYNC_OVERLAP_SECONDS = 60
+
+DELETED_USER_VERSION = 2 ** 31 - 1
+
+_PENDING_KEY = "pending_token_revocations"
+
+# user_id -> (minimum version, revoked_at)
+_min_versions: Dict[int, Tuple[int, datetime]] = {}
+_lock = threading.Lock()
+_last_sync: Optional[datetime] = None
+
+
+def _apply(user_id: int, min_version: int, revoked_at: datetime) -> bool:
+    """Raise the local minimum for a user; returns whether it changed."""
+    with _lock:
+        current = _min_versions.get(user_id)
+        if current is not None and current[0] >= min_version:
+            return False
+        _min_versions[user_id] = (min_version, revoked_at)
+    return True
+
+
+def record_revocation(db: Session, user_id: int, min_version: int) -> None:
+    """
+    Reject this user's access tokens below ``min_version`` once ``db`` commits.
+
+    Args:
+        db: Session whose transaction makes the change (the caller commits)
+        user_id: The user
+        min_version: Lowest token version still accepted
+    """
+    now = datetime.utcnow()
+    row = db.get(TokenRevocation, user_id)
+    if row is None:
+        db.add(TokenRevocation(user_id=user_id, min_version=min_version, revoked_at=now))
+    else:
+        row.min_version = max(row.min_version, min_version)
+        row.revoked_at = now
+    db.info.setdefault(_PENDING_KEY, []).append((user_id, min_version, now))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_pending(session: Session) -> None:
+    for user_id, min_version, revoked_at in session.info.pop(_PENDING_KEY, ()):
+        _apply(user_id, min_version, revoked_at)
+        invalidate_user_cache(user_id)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_pending(session: Session, previous_transaction) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def is_token_revoked(user_id: int, token_version: Optional[int]) -> bool:
+    """Whether a token with ``token_version`` (None for legacy tokens) was revoked."""
+    with _lock:
+        current = _min_versions.get(user_id)
+    return current is not None and (token_version or 0) < current[0]
+
+
+def sync_token_revocations() -> int:
+    """
+    Load revocations recorded since the last sync (all of them on the first
+    call) and purge expired ones.
+
+    Returns:
+        Number of users whose minimum version went up
+    """
+    global _last_sync
+    now = datetime.utcnow()
+    cutoff = now - timedelta(minutes=TOKEN_REVOCATION_RETENTION_MINUTES)
+    changed = 0
+    db = SessionLocal()
+    try:
+        query = db.query(TokenRevocation.user_id, TokenRevocation.min_version, TokenRevocation.revoked_at)
+        if _last_sync is not None:
+            query = query.filter(
+                TokenRevocation.revoked_at >= _last_sync - timedelta(seconds=TOKEN_REVOCATION_SYNC_OVERLAP_SECONDS)
+            )
+        for row in query.all():
+            if _apply(row.user_id, row.min_version, row.revoked_at):
+                invalidate_user_cache(row.user_id)
+                changed += 1
+        _last_sync = now
+
+        db.query(TokenRevocation).filter(
+            TokenRevocation.revoked_at < cutoff
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+    with _lock:
+        for user_id in [u for u, (_, revoked_at) in _min_versions.items() if revoked_at < cutoff]:
+            del _min_versions[user_id]
+    return changed
+
+
+async def sync_token_revocations_periodically() -> None:
+    """Run ``sync_token_revocations`` every TOKEN_REVOCATION_SYNC_SECONDS."""
+    while True:
+        try:
+            await asyncio.to_thread(sync_token_revocations)
+        except Exception as e:
+            print(f"Token revocation sync failed: {str(e)}")
+        await asyncio.sleep(TOKEN_REVOCATION_SYNC_SECONDS)
@@ -0,0 +1,119 @@
+"""
+TOTP verification with attempt limiting and replay protection.
+
+- Failed attempts are counted per user. Once TOTP_MAX_ATTEMPTS failures
+  happen within TOTP_ATTEMPT_WINDOW_SECONDS, further attempts get HTTP 429
+  before the database is touched.
+- A code that was accepted cannot be used again for the same user and time
+  step, even though it stays valid for the rest of its window.
+- Decoded ``pyotp.TOTP`` objects are cached per secret.
+
+State is kept per process. With several uvicorn workers the attempt limit
+applies per worker.
+"""
+
+import hmac
+import os
+import threading
+import time
+from typing import Optional
+
+import pyotp
+from cachetools import LRUCache, TTLCache
+from fastapi import HTTPException, status
+
+TOTP_MAX_ATTEMPTS = int(os.environ.get("TOTP_MAX_ATTEMPTS", 5))
+TOTP_ATTEMPT_WINDOW_SECONDS = int(os.environ.get("TOTP_ATTEMPT_WINDOW_SECONDS", 300))
+TOTP_VALID_WINDOW = int(os.environ.get("TOTP_VALID_WINDOW", 0))  # Accepted time steps either side of now
+TOTP_CACHE_MAX_ENTRIES = int(os.environ.get("TOTP_CACHE_MAX_ENTRIES", 10000))
+
+TOTP_INTERVAL_SECONDS = 30
+TOTP_DIGITS = 6
+
+
+class TotpVerifier:
+    """Verifies TOTP codes with per-user attempt counters and a replay cache."""
+
+    def __init__(
+        self,
+        max_attempts: int = TOTP_MAX_ATTEMPTS,
+        attempt_window_seconds: int = TOTP_ATTEMPT_WINDOW_SECONDS,
+        valid_window: int = TOTP_VALID_WINDOW,
+        max_entries: int = TOTP_CACHE_MAX_ENTRIES,
+    ):
+        self.max_attempts = max_attempts
+        self.attempt_window_seconds = attempt_window_seconds
+        self.valid_window = valid_window
+        self._lock = threading.Lock()
+        self._totps = LRUCache(maxsize=max_entries)
+        self._failures = TTLCache(maxsize=max_entries, ttl=attempt_window_seconds)
+        # A code stays acceptable for (2 * valid_window + 1) steps
+        self._used = TTLCache(
+            maxsize=max_entries,
+            ttl=(2 * valid_window + 1) * TOTP_INTERVAL_SECONDS
+        )
+
+    def _totp(self, secret: str) -> pyotp.TOTP:
+        with self._lock:
+            totp = self._totps.get(secret)
+            if totp is None:
+                totp = pyotp.TOTP(secret, digits=TOTP_DIGITS, interval=TOTP_INTERVAL_SECONDS)
+                self._totps[secret] = totp
+        return totp
+
+    def check_rate_limit(self, user_id: int) -> None:
+        """
+        Reject a user who has used up their attempts.
+
+        Raises:
+            HTTPException: 429 with Retry-After
+        """
+        with self._lock:
+            failures = self._failures.get(user_id, 0)
+        if failures >= self.max_attempts:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many invalid TOTP codes, please try again later",
+                headers={"Retry-After": str(self.attempt_window_seconds)}
+            )
+
+    def record_failure(self, user_id: int) -> None:
+        with self._lock:
+            self._failures[user_id] = self._failures.get(user_id, 0) + 1
+
+    @staticmethod
+    def is_well_formed(code: Optional[str]) -> bool:
+        return bool(code) and len(code) == TOTP_DIGITS and code.isdigit()
+
+    def verify(self, user_id: int, secret: str, code: str) -> bool:
+        """
+        Check a code for a user, consuming it if it is valid.
+
+        Failures (wrong, malformed or replayed codes) count towards the
+        user's attempt limit; a success clears it.
+        """
+        if not self.is_well_formed(code) or not secret:
+            self.record_failure(user_id)
+            return False
+
+        totp = self._totp(secret)
+        now_step = int(time.time()) // TOTP_INTERVAL_SECONDS
+        for step in range(now_step - self.valid_window, now_step + self.valid_window + 1):
+            if not hmac.compare_digest(totp.generate_otp(step), code):
+                continue
+            with self._lock:
+                if (user_id, step) in self._used:
+                    break  # Replay of an accepted code
+                self._used[(user_id, step)] = True
+                self._failures.pop(user_id, None)
+            return True
+
+        self.record_failure(user_id)
+        return False
+
+    def verify_secret(self, secret: str, code: str) -> bool:
+        """Plain check of a code against a secret, without counters or replay tracking."""
+        return self.is_well_formed(code) and self._totp(secret).verify(code, valid_window=self.valid_window)
+
+
+totp_verifier = TotpVerifier()
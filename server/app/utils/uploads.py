@@ -0,0 +1,229 @@
+"""
+Streaming ingestion of multipart uploads.
+
+Starlette parses the whole multipart body before an endpoint runs, so the
+request size is capped earlier, by ``RequestSizeLimitMiddleware``: requests
+whose Content-Length is over the limit are refused before their body is
+read, and bodies without one are cut off once they exceed it.
+
+Endpoints then read each upload in fixed-size chunks, checking the per-file
+and per-request limits. Small files stay in memory; anything above the
+spool threshold goes to a temporary file that is memory-mapped when the OCR
+pipeline asks for its bytes, so large scans are never copied into the
+Python heap.
+"""
+
+import json
+import mmap
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_BYTES", 1024 * 1024))
+UPLOAD_MAX_FILE_BYTES = int(os.environ.get("UPLOAD_MAX_FILE_BYTES", 20 * 1024 * 1024))
+UPLOAD_MAX_REQUEST_BYTES = int(os.environ.get("UPLOAD_MAX_REQUEST_BYTES", 100 * 1024 * 1024))
+UPLOAD_SPOOL_THRESHOLD_BYTES = int(os.environ.get("UPLOAD_SPOOL_THRESHOLD_BYTES", 2 * 1024 * 1024))
+# Room for multipart boundaries, part headers and form fields on top of the files
+UPLOAD_MULTIPART_OVERHEAD_BYTES = int(os.environ.get("UPLOAD_MULTIPART_OVERHEAD_BYTES", 1024 * 1024))
+
+IMAGE_CONTENT_TYPES = ("image/",)
+OCR_CONTENT_TYPES = ("image/", "application/pdf")
+GENERIC_CONTENT_TYPE = "application/octet-stream"
+
+
+class SpooledUpload:
+    """An uploaded file held in memory or in a temporary file on disk."""
+
+    def __init__(self, filename: Optional[str], content_type: Optional[str]):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0
+        self._memory: Optional[bytearray] = bytearray()
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+
+    @property
+    def on_disk(self) -> bool:
+        return self._file is not None
+
+    def write(self, chunk: bytes, spool_threshold: int) -> None:
+        self.size += len(chunk)
+        if self._file is None and self.size > spool_threshold:
+            self._file = tempfile.TemporaryFile()
+            self._file.write(self._memory)
+            self._memory = None
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._memory += chunk
+
+    def buffer(self):
+        """
+        Return the upload's bytes without copying them.
+
+        In-memory uploads return a memoryview; spooled uploads return a
+        read-only memory map of the temporary file. Both support the buffer
+        protocol (hashing, base64 encoding, numpy.frombuffer).
+        """
+        if self._file is None:
+            return memoryview(self._memory)
+        if self._mmap is None:
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def info(self) -> dict:
+        return {
+            'filename': self.filename,
+            'file_size': self.size,
+            'file_type': self.content_type
+        }
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # Still referenced by a consumer; freed with it
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._memory = None
+
+
+def _content_type_allowed(content_type: Optional[str], allowed_prefixes: Tuple[str, ...]) -> bool:
+    if not content_type or content_type == GENERIC_CONTENT_TYPE:
+        return True
+    return any(content_type.startswith(prefix) for prefix in allowed_prefixes)
+
+
+async def ingest_uploads(
+    files: List[UploadFile],
+    allowed_prefixes: Tuple[str, ...] = IMAGE_CONTENT_TYPES,
+    max_file_bytes: int = UPLOAD_MAX_FILE_BYTES,
+    max_request_bytes: int = UPLOAD_MAX_REQUEST_BYTES,
+    spool_threshold: int = UPLOAD_SPOOL_THRESHOLD_BYTES,
+) -> List[SpooledUpload]:
+    """
+    Validate and read uploaded files chunk by chunk.
+
+    Args:
+        files: The uploaded files
+        allowed_prefixes: Accepted content-type prefixes (octet-stream is always accepted)
+        max_file_bytes: Maximum size of a single file
+        max_request_bytes: Maximum combined size of all files
+        spool_threshold: Files larger than this are spooled to a temporary file
+
+    Returns:
+        One SpooledUpload per file, in order. The caller must close them
+        (see ``close_uploads``).
+
+    Raises:
+        HTTPException: 400 for a disallowed type or empty file, 413 when a
+            size limit is exceeded
+    """
+    uploads: List[SpooledUpload] = []
+    total = 0
+    try:
+        for file in files:
+            if not _content_type_allowed(file.content_type, allowed_prefixes):
+                raise HTTPException(status_code=400, detail=f"File {file.filename} is not a supported file type")
+            # The multipart parser already knows the size; reject before reading
+            if file.size is not None and file.size > max_file_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"File {file.filename} exceeds the {max_file_bytes} byte limit"
+                )
+
+            upload = SpooledUpload(file.filename, file.content_type)
+            uploads.append(upload)
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if upload.size + len(chunk) > max_file_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File {file.filename} exceeds the {max_file_bytes} byte limit"
+                    )
+                if total > max_request_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Upload exceeds the {max_request_bytes} byte request limit"
+                    )
+                upload.write(chunk, spool_threshold)
+
+            if not upload.size:
+                raise HTTPException(status_code=400, detail=f"File {file.filename} is empty")
+    except Exception:
+        close_uploads(uploads)
+        raise
+    return uploads
+
+
+def close_uploads(uploads: List[SpooledUpload]) -> None:
+    """Release the memory and temporary files held by uploads."""
+    for upload in uploads:
+        upload.close()
+
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware capping request bodies at ``max_bytes``.
+
+    Runs before Starlette spools a multipart body, so an oversized upload
+    costs neither memory nor temporary disk space.
+    """
+
+    def __init__(self, app, max_bytes: int = UPLOAD_MAX_REQUEST_BYTES + UPLOAD_MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({"detail": f"Request body exceeds the {self.max_bytes} byte limit"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None:
+            try:
+                declared = int(content_length)
+            except ValueError:
+                declared = None
+            if declared is not None and declared > self.max_bytes:
+                await self._reject(send)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                # Chunked bodies, or a Content-Length that understated the body
+                if received > self.max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Request body exceeds the {self.max_bytes} byte limit"
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,85 @@
+"""
+Short-lived cache of authenticated users.
+
+``get_current_user`` runs on every authenticated request. Instead of
+selecting the user row each time, it keeps a snapshot of the row's columns
+keyed by user id and token version, and attaches a copy to the request's
+session without querying (``Session.merge(load=False)``).
+
+Snapshots expire after USER_CACHE_TTL_SECONDS. Endpoints that change a user
+call ``invalidate_user_cache`` after committing so this worker sees the change
+immediately; other workers see it when their snapshot expires. Changes that
+must reach every worker at once (role changes, deletion) go through
+``oauth2.revoke_tokens``/``revoke_deleted_user``: the version a snapshot was
+taken at no longer matches, and the revocation sync drops it.
+
+Snapshots are only for reading. Endpoints that modify the current user load
+it with ``oauth2.get_current_user_for_update`` instead, so a stale snapshot
+(or one of a user deleted meanwhile) is never flushed back.
+"""
+
+import os
+import threading
+from typing import Optional
+
+from cachetools import TTLCache
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.models import User
+from app.utils.family_auth import invalidate_access_scope
+
+USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", 10000))
+USER_CACHE_TTL_SECONDS = int(os.environ.get("USER_CACHE_TTL_SECONDS", 30))
+
+_COLUMNS = [column.key for column in User.__table__.columns]
+
+_cache = TTLCache(maxsize=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL_SECONDS)
+_lock = threading.Lock()
+
+
+def cache_user(user: User) -> None:
+    """Store a snapshot of a freshly loaded user."""
+    snapshot = {key: getattr(user, key) for key in _COLUMNS}
+    with _lock:
+        _cache[user.id] = snapshot
+
+
+def get_cached_snapshot(user_id: int, token_version: Optional[int]) -> Optional[dict]:
+    """
+    Return the cached column values of a user, or None on a miss.
+
+    Tokens without a version (issued before versions existed) match any
+    snapshot; versioned tokens only match a snapshot of the same version.
+    """
+    with _lock:
+        snapshot = _cache.get(user_id)
+    if snapshot is None:
+        return None
+    if token_version is not None and snapshot["token_version"] != token_version:
+        return None
+    return snapshot
+
+
+def get_cached_token_version(user_id: int) -> Optional[int]:
+    """Return the token version of the cached user, or None when not cached."""
+    with _lock:
+        snapshot = _cache.get(user_id)
+    return None if snapshot is None else snapshot["token_version"]
+
+
+def get_cached_user(db: Session, user_id: int, token_version: Optional[int]) -> Optional[User]:
+    """Return the cached user attached to ``db``, or None on a miss."""
+    snapshot = get_cached_snapshot(user_id, token_version)
+    if snapshot is None:
+        return None
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def invalidate_user_cache(*user_ids: int) -> None:
+    """Drop the cached snapshots (and derived access scopes) of the given users."""
+    with _lock:
+        for user_id in user_ids:
+            _cache.pop(user_id, None)
+    invalidate_access_scope(*user_ids)
@@ -0,0 +1,85 @@
+import itertools
+import os
+import tempfile
+
+# database.py and oauth2.py read these at import time, so set them before
+# anything from the app is imported
+_DB_DIR = tempfile.mkdtemp(prefix="healthscan-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("PDF_CACHE_DISK_MAX_FILES", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "5")
+
+import pytest
+
+from app import models
+from app.database import Base, SessionLocal, engine
+from app.utils import family_auth, token_revocations, user_cache
+
+
+def _clear_auth_caches():
+    # User ids restart with every schema, so per-user state must not carry over
+    user_cache._cache.clear()
+    family_auth._scope_cache.clear()
+    token_revocations._min_versions.clear()
+    token_revocations._last_sync = None
+
+
+@pytest.fixture
+def db():
+    """A session on a freshly created schema, dropped after the test."""
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        _clear_auth_caches()
+
+
+@pytest.fixture
+def make_user(db):
+    """Factory for committed users with unique usernames and emails."""
+    counter = itertools.count(1)
+
+    def make(**overrides) -> models.User:
+        n = next(counter)
+        values = {
+            "email": f"user{n}@example.com",
+            "username": f"user{n}",
+            "first_name": "Test",
+            "last_name": f"User{n}",
+            "phone_number": "5550000000",
+            "blood_group": "O+",
+        }
+        values.update(overrides)
+        user = models.User(**values)
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        return user
+
+    return make
+
+
+@pytest.fixture
+def make_record(db):
+    """Factory for committed records."""
+    def make(user: models.User, content: str = "Blood pressure 120/80", **overrides) -> models.Record:
+        values = {
+            "filename": "report.txt",
+            "content": content,
+            "file_type": "text/plain",
+            "user_id": user.id,
+            "created_by_id": user.id,
+        }
+        values.update(overrides)
+        record = models.Record(**values)
+        db.add(record)
+        db.commit()
+        db.refresh(record)
+        return record
+
+    return make
@@ -0,0 +1,79 @@
+from app import models
+from app.utils.family_auth import get_access_scope
+from app.utils.user_cache import invalidate_user_cache
+
+
+def _visible_owners(db, user):
+    scope = get_access_scope(user)
+    return sorted(row.user_id for row in db.query(models.Record.user_id).filter(scope.filter(models.Record.user_id)))
+
+
+def _family(db, name="Family"):
+    family = models.Family(name=name)
+    db.add(family)
+    db.commit()
+    return family
+
+
+def test_patient_sees_own_records(db, make_user, make_record):
+    me, other = make_user(), make_user()
+    make_record(me)
+    make_record(other)
+
+    assert _visible_owners(db, me) == [me.id]
+
+
+def test_family_admin_sees_members(db, make_user, make_record):
+    family = _family(db)
+    admin = make_user(family_id=family.id, is_family_admin=True)
+    member = make_user(family_id=family.id)
+    outsider = make_user()
+    for user in (admin, member, outsider):
+        make_record(user)
+
+    assert _visible_owners(db, admin) == sorted([admin.id, member.id])
+    assert _visible_owners(db, member) == [member.id]
+
+
+def test_doctor_sees_patients(db, make_user, make_record):
+    doctor = make_user(role=models.UserRole.DOCTOR)
+    patient = make_user(doctor_id=doctor.id)
+    stranger = make_user()
+    for user in (patient, stranger):
+        make_record(user)
+
+    assert _visible_owners(db, doctor) == [patient.id]
+
+
+def test_admin_sees_everything(db, make_user, make_record):
+    admin = make_user(role=models.UserRole.ADMIN)
+    users = [make_user(), make_user()]
+    for user in users:
+        make_record(user)
+
+    assert _visible_owners(db, admin) == sorted(user.id for user in users)
+
+
+def test_new_members_are_visible_without_invalidation(db, make_user, make_record):
+    family = _family(db)
+    admin = make_user(family_id=family.id, is_family_admin=True)
+    assert _visible_owners(db, admin) == []
+
+    newcomer = make_user(family_id=family.id)
+    make_record(newcomer)
+
+    assert _visible_owners(db, admin) == [newcomer.id]
+
+
+def test_scope_follows_role_changes_after_invalidation(db, make_user, make_record):
+    user = make_user()
+    make_record(make_user())
+    assert _visible_owners(db, user) == []
+
+    user.role = models.UserRole.ADMIN
+    db.commit()
+    assert _visible_owners(db, user) == []  # Still the cached scope
+
+    invalidate_user_cache(user.id)
+
+    assert len(_visible_owners(db, user)) == 1
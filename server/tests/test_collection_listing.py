@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from app import models
+from app.main import app
+from app.utils.loaders import collections_response
+
+
+@pytest.fixture
+def collection(db, make_user, make_record):
+    user = make_user()
+    collection = models.Collection(name="Labs", user_id=user.id, created_by_id=user.id)
+    db.add(collection)
+    db.commit()
+    for content in ("first", "second"):
+        make_record(user, content=content, collection_id=collection.id)
+    return collection
+
+
+def _listing(db, view):
+    response = collections_response(db, db.query(models.Collection), view)
+    return json.loads(response.body)
+
+
+def test_full_view_embeds_records(db, collection):
+    [item] = _listing(db, "full")
+
+    assert item["id"] == collection.id
+    assert sorted(record["content"] for record in item["records"]) == ["first", "second"]
+    assert "record_count" not in item
+
+
+def test_summary_view_counts_records(db, collection):
+    [item] = _listing(db, "summary")
+
+    assert item["record_count"] == 2
+    assert "records" not in item
+
+
+def test_empty_collection_counts_zero(db, make_user):
+    user = make_user()
+    db.add(models.Collection(name="Empty", user_id=user.id, created_by_id=user.id))
+    db.commit()
+
+    assert [item["record_count"] for item in _listing(db, "summary")] == [0]
+
+
+@pytest.mark.parametrize("path", [
+    "/collections/",
+    "/admin/collections",
+    "/doctor/patient/{patient_id}/collections",
+    "/family/members/{member_id}/collections",
+])
+def test_listings_document_both_views(path):
+    schema = app.openapi()["paths"][path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+
+    refs = {variant["items"]["$ref"].rsplit("/", 1)[-1] for variant in schema["anyOf"]}
+    assert refs == {"CollectionResponse", "CollectionListItem"}
@@ -0,0 +1,129 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from app import models
+from app.models.record import record_content_hash
+from app.routers import records
+from app.utils.record_store import backfill_content_hashes
+from app.utils.shares import get_or_create_share, resolve_record_share
+
+
+def test_hash_follows_content(make_user, make_record, db):
+    record = make_record(make_user(), content="first")
+    assert record.content_hash == record_content_hash("first")
+
+    record.content = "second"
+    db.commit()
+
+    assert record.content_hash == record_content_hash("second")
+
+
+def _clear_hashes(db):
+    db.execute(update(models.Record.__table__).values(content_hash=None))
+    db.commit()
+    db.expire_all()
+
+
+def test_backfill_fills_missing_hashes_in_batches(db, make_user, make_record):
+    user = make_user()
+    for i in range(5):
+        make_record(user, content=f"record {i}")
+    _clear_hashes(db)
+    updated_at = {record.id: record.updated_at for record in db.query(models.Record)}
+
+    assert backfill_content_hashes(batch_size=2) == 5
+
+    db.expire_all()
+    for record in db.query(models.Record):
+        assert record.content_hash == record_content_hash(record.content)
+        assert record.updated_at == updated_at[record.id]
+    assert backfill_content_hashes(batch_size=2) == 0
+
+
+def test_resolver_returns_the_stored_hash(db, make_user, make_record):
+    record = make_record(make_user(), content="shared")
+    share = get_or_create_share(db, created_by=record.user_id, record_id=record.id)
+
+    assert resolve_record_share(db, share.share_token).content_hash == record_content_hash("shared")
+
+
+@pytest.fixture
+def shared(db, make_user, make_record):
+    record = make_record(make_user(), content="Shared lab results")
+    share = get_or_create_share(db, created_by=record.user_id, record_id=record.id)
+    return record, share
+
+
+def test_saving_a_shared_record_twice_is_refused(db, make_user, shared):
+    record, share = shared
+    reader = make_user()
+
+    copy = records.save_shared_record(share.share_token, db, reader)
+    assert copy.user_id == reader.id
+    assert copy.content_hash == record.content_hash
+
+    with pytest.raises(HTTPException) as exc:
+        records.save_shared_record(share.share_token, db, reader)
+    assert exc.value.status_code == 400
+
+
+def test_renamed_copy_no_longer_counts(db, make_user, shared):
+    record, share = shared
+    reader = make_user()
+    copy = records.save_shared_record(share.share_token, db, reader)
+    copy.filename = "My lab results"
+    db.commit()
+
+    assert records.save_shared_record(share.share_token, db, reader).filename == f"Copy of {record.filename}"
+
+
+def test_owner_can_save_their_own_shared_record(db, shared):
+    record, share = shared
+    owner = db.get(models.User, record.user_id)
+
+    copy = records.save_shared_record(share.share_token, db, owner)
+
+    assert copy.id != record.id
+    with pytest.raises(HTTPException):
+        records.save_shared_record(share.share_token, db, owner)
+
+
+def test_unrelated_record_with_the_same_content_is_not_a_copy(db, make_user, make_record, shared):
+    record, share = shared
+    reader = make_user()
+    make_record(reader, content=record.content, filename="My own notes")
+
+    copy = records.save_shared_record(share.share_token, db, reader)
+
+    assert copy.user_id == reader.id
+
+
+def test_empty_records_are_not_copies_of_each_other(db, make_user, make_record):
+    owner, reader = make_user(), make_user()
+    shared_record = make_record(owner, content="")
+    make_record(reader, content="", filename="Blank")
+    share = get_or_create_share(db, created_by=owner.id, record_id=shared_record.id)
+
+    assert records.save_shared_record(share.share_token, db, reader).content == ""
+
+
+def test_dedup_works_before_the_backfill(db, make_user, shared):
+    record, share = shared
+    reader = make_user()
+    records.save_shared_record(share.share_token, db, reader)
+    _clear_hashes(db)
+    backfill_content_hashes()
+
+    with pytest.raises(HTTPException):
+        records.save_shared_record(share.share_token, db, reader)
+
+
+def test_different_content_is_not_a_duplicate(db, make_user, make_record, shared):
+    record, share = shared
+    reader = make_user()
+    make_record(reader, content="Something else", filename=f"Copy of {record.filename}")
+
+    copy = records.save_shared_record(share.share_token, db, reader)
+
+    assert copy.content == record.content
@@ -0,0 +1,66 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from app.utils import image_preprocessing
+from app.utils.image_preprocessing import normalize_image
+from app.utils.ocr_pipeline import prepare_images
+
+
+def _photo(width: int, height: int) -> bytes:
+    """A noisy color PNG, which compresses poorly, of the given size."""
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+@pytest.fixture(autouse=True)
+def small_pages(monkeypatch):
+    # 100 DPI on a 10 inch page: long edge capped at 1000 pixels
+    monkeypatch.setattr(image_preprocessing, "OCR_TARGET_DPI", 100)
+    monkeypatch.setattr(image_preprocessing, "OCR_PAGE_LONG_EDGE_INCHES", 10.0)
+    monkeypatch.setattr(image_preprocessing, "OCR_DESKEW", False)
+
+
+def test_large_image_is_downscaled_to_grayscale_jpeg():
+    data, media_type = normalize_image(_photo(2000, 1500))
+
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    assert media_type == "image/jpeg"
+    assert image.shape == (750, 1000)
+
+
+def test_reads_buffers_in_place():
+    data = bytearray(_photo(1200, 800))
+
+    _, media_type = normalize_image(memoryview(data))
+
+    assert media_type == "image/jpeg"
+
+
+def test_undecodable_input_is_returned_unchanged():
+    assert normalize_image(b"not an image") == (b"not an image", None)
+
+
+def test_prepare_images_keeps_order_and_falls_back_per_image():
+    photo = _photo(1600, 1200)
+    images = [b"not an image", memoryview(photo)]
+
+    prepared, media_types = asyncio.run(prepare_images(images, ["image/heic", "image/png"]))
+
+    assert prepared[0] == b"not an image"
+    assert media_types == ["image/heic", "image/jpeg"]
+    assert len(prepared[1]) < len(photo)
+
+
+def test_prepare_images_can_be_disabled(monkeypatch):
+    from app.utils import ocr_pipeline
+    monkeypatch.setattr(ocr_pipeline, "OCR_PREPROCESS", False)
+    photo = _photo(1600, 1200)
+
+    prepared, media_types = asyncio.run(prepare_images([photo], [None]))
+
+    assert prepared == [photo]
+    assert media_types == ["image/png"]
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from app.schemas import OcrResponseGemini
+from app.utils import OcrAgent
+
+
+class ScriptedAgent(OcrAgent):
+    """OcrAgent whose model call is replaced by ``respond(chunk, attempt)``."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_text_from_images(self, images, media_types=None):
+        self.calls.append(list(images))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0)
+            return await self.respond(list(images), self.calls.count(list(images)))
+        finally:
+            self.in_flight -= 1
+
+
+def _text(images):
+    return [OcrResponseGemini(content=image.decode(), confidence=0.9) for image in images]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    import app.utils
+    monkeypatch.setattr(app.utils, "OCR_RETRY_BACKOFF_SECONDS", 0)
+
+
+def _run(agent, images, **kwargs):
+    return asyncio.run(agent.generate_text_from_images_batched(images, **kwargs))
+
+
+IMAGES = [b"one", b"two", b"three", b"four", b"five"]
+
+
+def test_results_keep_upload_order():
+    async def respond(chunk, attempt):
+        await asyncio.sleep(0.001 * (5 - len(chunk[0])))
+        return _text(chunk)
+
+    agent = ScriptedAgent(respond)
+
+    results = _run(agent, IMAGES, batch_size=2, max_concurrency=3)
+
+    assert [result.content for result in results] == ["one", "two", "three", "four", "five"]
+    assert len(agent.calls) == 3
+
+
+def test_concurrency_is_bounded():
+    async def respond(chunk, attempt):
+        await asyncio.sleep(0.01)
+        return _text(chunk)
+
+    agent = ScriptedAgent(respond)
+
+    _run(agent, IMAGES, batch_size=1, max_concurrency=2)
+
+    assert agent.max_in_flight == 2
+
+
+def test_only_failed_chunks_are_retried():
+    async def respond(chunk, attempt):
+        if chunk == [b"three"] and attempt == 1:
+            raise RuntimeError("transient")
+        return _text(chunk)
+
+    agent = ScriptedAgent(respond)
+
+    results = _run(agent, IMAGES, batch_size=1, max_retries=1)
+
+    assert [result.content for result in results] == ["one", "two", "three", "four", "five"]
+    assert agent.calls.count([b"three"]) == 2
+    assert agent.calls.count([b"one"]) == 1
+
+
+def test_chunks_failing_every_attempt_become_none():
+    async def respond(chunk, attempt):
+        if chunk == [b"two"]:
+            raise RuntimeError("unreadable")
+        return _text(chunk)
+
+    results = _run(ScriptedAgent(respond), IMAGES, batch_size=1, max_retries=2)
+
+    assert [result and result.content for result in results] == ["one", None, "three", "four", "five"]
+
+
+def test_all_chunks_failing_raises_the_last_error():
+    async def respond(chunk, attempt):
+        raise RuntimeError("model down")
+
+    with pytest.raises(RuntimeError, match="model down"):
+        _run(ScriptedAgent(respond), IMAGES, batch_size=2, max_retries=1)
+
+
+def test_short_model_output_is_padded():
+    async def respond(chunk, attempt):
+        return _text(chunk[:1])
+
+    results = _run(ScriptedAgent(respond), IMAGES[:2], batch_size=2)
+
+    assert [result and result.content for result in results] == ["one", None]
+
+
+def test_cancelled_chunk_is_not_a_success_or_retried():
+    async def respond(chunk, attempt):
+        if chunk == [b"two"]:
+            raise asyncio.CancelledError()
+        return _text(chunk)
+
+    agent = ScriptedAgent(respond)
+
+    with pytest.raises(asyncio.CancelledError):
+        _run(agent, IMAGES, batch_size=1, max_retries=2)
+    assert agent.calls.count([b"two"]) == 1
+
+
+def test_progress_counts_each_finished_chunk():
+    async def respond(chunk, attempt):
+        return _text(chunk)
+
+    finished = []
+
+    _run(ScriptedAgent(respond), IMAGES, batch_size=2, on_progress=finished.append)
+
+    assert sorted(finished) == [1, 2, 2]
@@ -0,0 +1,159 @@
+import asyncio
+import json
+
+import pytest
+
+from app import models
+from app.utils import ocr_jobs
+from app.utils.ocr_jobs import InProcessJobBackend, OcrJob, process_job
+
+FILES = [
+    {"filename": "a.png", "file_size": 10, "file_type": "image/png"},
+    {"filename": "b.png", "file_size": 20, "file_type": "image/png"},
+]
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Record every state write while still performing it."""
+    calls = []
+    update = ocr_jobs._update_job_state
+
+    def recording_update(job_id, values):
+        calls.append(values)
+        update(job_id, values)
+
+    monkeypatch.setattr(ocr_jobs, "_update_job_state", recording_update)
+    return calls
+
+
+def _fake_ocr(progress_ticks: int):
+    async def run_ocr(images, file_info, user_id, collection_id, on_progress=None, **kwargs):
+        for done in range(progress_ticks + 1):
+            on_progress(done, progress_ticks)
+            await asyncio.sleep(0)
+        records = [
+            models.Record(filename=info["filename"], content=f"text of {info['filename']}",
+                          user_id=user_id, created_by_id=user_id, file_type=info["file_type"])
+            for info in file_info
+        ]
+        response = [{**info, "confidence": 0.9} for info in file_info]
+        return records, response
+
+    return run_ocr
+
+
+def _submit(user):
+    backend = InProcessJobBackend()
+    job = OcrJob(user.id, [b"a", b"b"], FILES)
+    # Only insert the state row; the test runs the job itself
+    backend._queue = asyncio.Queue()
+    backend.submit(job)
+    return backend, job
+
+
+def test_completed_job_saves_records_and_results(db, make_user, monkeypatch, writes):
+    monkeypatch.setattr(ocr_jobs, "run_ocr", _fake_ocr(progress_ticks=2))
+    user = make_user()
+    cleaned = []
+
+    async def scenario():
+        backend, job = _submit(user)
+        job.cleanup = lambda: cleaned.append(True)
+        await process_job(job)
+        return backend.get(job.id)
+
+    state = asyncio.run(scenario())
+
+    assert state["status"] == "completed"
+    assert state["user_id"] == user.id
+    assert state["processed_files"] == state["total_files"] == 2
+    assert state["processed_images"] == state["total_images"] == 2
+    saved = {record.id: record for record in db.query(models.Record).filter(models.Record.user_id == user.id)}
+    assert [result["record_id"] in saved for result in state["results"]] == [True, True]
+    assert cleaned == [True]
+
+
+def test_progress_writes_are_coalesced(db, make_user, monkeypatch, writes):
+    monkeypatch.setattr(ocr_jobs, "run_ocr", _fake_ocr(progress_ticks=200))
+    monkeypatch.setattr(ocr_jobs, "OCR_JOB_PROGRESS_INTERVAL_SECONDS", 60)
+    user = make_user()
+
+    async def scenario():
+        backend, job = _submit(user)
+        await process_job(job)
+        return backend.get(job.id)
+
+    state = asyncio.run(scenario())
+
+    progress_writes = [values for values in writes if "status" not in values]
+    # One write, then the interval outlasts the job; the final state supersedes the rest
+    assert len(progress_writes) == 1
+    assert state["processed_images"] == state["total_images"] == 200
+
+
+def test_progress_writes_land_in_order(db, make_user, monkeypatch, writes):
+    monkeypatch.setattr(ocr_jobs, "run_ocr", _fake_ocr(progress_ticks=50))
+    monkeypatch.setattr(ocr_jobs, "OCR_JOB_PROGRESS_INTERVAL_SECONDS", 0)
+    user = make_user()
+
+    async def scenario():
+        backend, job = _submit(user)
+        await process_job(job)
+
+    asyncio.run(scenario())
+
+    done = [values["processed_images"] for values in writes if "processed_images" in values]
+    assert done == sorted(done)
+
+
+def test_failed_job_records_the_error(db, make_user, monkeypatch, writes):
+    async def broken_ocr(*args, **kwargs):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(ocr_jobs, "run_ocr", broken_ocr)
+    user = make_user()
+
+    async def scenario():
+        backend, job = _submit(user)
+        await process_job(job)
+        return backend.get(job.id)
+
+    state = asyncio.run(scenario())
+
+    assert state["status"] == "failed"
+    assert state["error"] == "model unavailable"
+    assert [result["error"] for result in state["results"]] == ["model unavailable"] * 2
+    assert db.query(models.Record).count() == 0
+
+
+def test_unknown_job(db):
+    assert InProcessJobBackend().get("missing") is None
+
+
+def test_full_queue_refuses_jobs(db, make_user):
+    user = make_user()
+
+    async def scenario():
+        backend = InProcessJobBackend(queue_size=1)
+        backend._queue = asyncio.Queue(maxsize=1)
+        backend.submit(OcrJob(user.id, [b"a"], FILES[:1]))
+        with pytest.raises(ocr_jobs.JobQueueFull):
+            backend.submit(OcrJob(user.id, [b"b"], FILES[:1]))
+
+    asyncio.run(scenario())
+
+
+def test_results_are_stored_as_json(db, make_user, monkeypatch, writes):
+    monkeypatch.setattr(ocr_jobs, "run_ocr", _fake_ocr(progress_ticks=1))
+    user = make_user()
+
+    async def scenario():
+        backend, job = _submit(user)
+        await process_job(job)
+        return job.id
+
+    job_id = asyncio.run(scenario())
+
+    row = db.get(models.OcrJobState, job_id)
+    assert [result["filename"] for result in json.loads(row.results)] == ["a.png", "b.png"]
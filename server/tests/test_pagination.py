@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app import models
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_page, listing_etag
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+
+    assert decode_cursor(encode_cursor(created_at, "abc|def")) == (created_at, "abc|def")
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm8tc2VwYXJhdG9y", "eHx5"])
+def test_malformed_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+@pytest.fixture
+def records(db, make_user, make_record):
+    user = make_user()
+    base = datetime(2024, 1, 1)
+    # Two pairs share a timestamp, so ties must be broken by id
+    stamps = [base, base + timedelta(hours=1), base + timedelta(hours=1), base + timedelta(hours=2),
+              base + timedelta(hours=2)]
+    for i, created_at in enumerate(stamps):
+        make_record(user, content=f"record {i}", id=f"00000000-0000-0000-0000-00000000000{i}", created_at=created_at)
+    return db.query(models.Record)
+
+
+def _expected_order(query):
+    return [
+        record.id for record in
+        query.order_by(models.Record.created_at.desc(), models.Record.id.desc()).all()
+    ]
+
+
+def test_pages_cover_every_row_once_in_order(records):
+    seen = []
+    cursor = None
+    while True:
+        rows, cursor = keyset_page(records, models.Record, 2, cursor)
+        seen.extend(row.id for row in rows)
+        if cursor is None:
+            break
+
+    assert seen == _expected_order(records)
+
+
+def test_last_full_page_has_no_cursor(records):
+    rows, cursor = keyset_page(records, models.Record, 4)
+    assert len(rows) == 4 and cursor is not None
+
+    rows, cursor = keyset_page(records, models.Record, 4, cursor)
+    assert len(rows) == 1 and cursor is None
+
+
+def test_no_limit_returns_everything(records):
+    rows, cursor = keyset_page(records, models.Record, None)
+
+    assert [row.id for row in rows] == _expected_order(records)
+    assert cursor is None
+
+
+def _row(**overrides):
+    creator = SimpleNamespace(id=1, first_name="Ada", last_name="Lovelace", role="doctor")
+    values = {"id": "r1", "updated_at": datetime(2024, 1, 1), "created_by_id": 1, "creator": creator}
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_listing_etag_tracks_rows_and_variant():
+    etag = listing_etag([_row()], "full")
+
+    assert etag == listing_etag([_row()], "full")
+    assert etag != listing_etag([_row()], "summary")
+    assert etag != listing_etag([_row(updated_at=datetime(2024, 1, 2))], "full")
+
+
+def test_listing_etag_tracks_the_creator():
+    etag = listing_etag([_row()], "full")
+    renamed = SimpleNamespace(id=1, first_name="Ada", last_name="King", role="doctor")
+
+    assert etag != listing_etag([_row(creator=renamed)], "full")
+    assert etag != listing_etag([_row(created_by_id=2)], "full")
@@ -0,0 +1,68 @@
+import threading
+
+import bcrypt
+import pytest
+from fastapi import HTTPException
+
+from app.utils.passwords import PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    return PasswordHasher(workers=1, max_pending=1)
+
+
+def test_hash_and_verify(hasher):
+    hashed = hasher.hash("correct horse")
+
+    assert hasher.verify("correct horse", hashed) == (True, None)
+    assert hasher.verify("wrong horse", hashed) == (False, None)
+
+
+def test_missing_hash_never_matches(hasher):
+    assert hasher.verify("anything", None) == (False, None)
+
+
+def test_outdated_cost_is_rehashed(hasher):
+    weak = bcrypt.hashpw(b"correct horse", bcrypt.gensalt(4)).decode()
+
+    valid, new_hash = hasher.verify("correct horse", weak)
+
+    assert valid is True
+    assert new_hash is not None and new_hash != weak
+    assert hasher.verify("correct horse", new_hash) == (True, None)
+    assert hasher.metrics()["rehashed"] == 1
+
+
+def test_saturated_pool_refuses_with_retry_after(hasher):
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+
+    worker = threading.Thread(target=hasher._run, args=("hash", slow))
+    worker.start()
+    started.wait(5)
+    try:
+        with pytest.raises(HTTPException) as exc:
+            hasher.hash("correct horse")
+    finally:
+        release.set()
+        worker.join(5)
+
+    assert exc.value.status_code == 503
+    assert "Retry-After" in exc.value.headers
+    assert hasher.metrics()["rejected"] == 1
+    # The slot is free again once the running operation finishes
+    assert hasher.verify("x", hasher.hash("x"))[0] is True
+
+
+def test_metrics_count_operations(hasher):
+    hashed = hasher.hash("correct horse")
+    hasher.verify("correct horse", hashed)
+
+    metrics = hasher.metrics()
+
+    assert metrics["hash"]["count"] == metrics["verify"]["count"] == 1
+    assert metrics["hash"]["avg_seconds"] > 0
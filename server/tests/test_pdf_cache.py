@@ -0,0 +1,115 @@
+import os
+
+import pytest
+from starlette.requests import Request
+
+from app.utils import pdf_cache as pdf_cache_module
+from app.utils.pdf_cache import PdfCache, pdf_cache_key, pdf_response, render_record_pdf
+
+
+def _disk(directory, max_files=2, rescan_seconds=300):
+    return PdfCache(max_bytes=1024, directory=str(directory), disk_max_files=max_files,
+                    disk_rescan_seconds=rescan_seconds)
+
+
+def _files(directory):
+    return sorted(name[:-len(".pdf")] for name in os.listdir(directory) if name.endswith(".pdf"))
+
+
+def test_key_depends_on_content_only():
+    assert pdf_cache_key("a") == pdf_cache_key("a")
+    assert pdf_cache_key("a") != pdf_cache_key("b")
+    assert pdf_cache_key(None) == pdf_cache_key("")
+
+
+def test_memory_tier_counts_hits_and_misses():
+    cache = PdfCache(max_bytes=1024, directory=None, disk_max_files=0)
+
+    assert cache.get("k") is None
+    cache.set("k", b"pdf")
+
+    assert cache.get("k") == b"pdf"
+    assert cache.metrics()["hits"] == cache.metrics()["misses"] == 1
+
+
+def test_memory_tier_is_bounded_by_bytes():
+    cache = PdfCache(max_bytes=10, directory=None, disk_max_files=0)
+    cache.set("a", b"123456")
+    cache.set("b", b"123456")
+
+    assert cache.get("a") is None
+    assert cache.get("b") == b"123456"
+    cache.set("huge", b"x" * 11)  # Larger than the tier: not kept, no error
+    assert cache.get("huge") is None
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    _disk(tmp_path).set("k", b"pdf")
+
+    assert _disk(tmp_path).get("k") == b"pdf"
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = _disk(tmp_path, max_files=2)
+    cache.set("a", b"A")
+    cache.set("b", b"B")
+    cache._memory.clear()
+    cache.get("a")  # Now more recent than b
+
+    cache.set("c", b"C")
+
+    assert _files(tmp_path) == ["a", "c"]
+
+
+def test_disk_index_picks_up_files_from_other_workers(tmp_path):
+    cache = _disk(tmp_path, max_files=2, rescan_seconds=0)
+    other = _disk(tmp_path, max_files=2)
+    other.set("a", b"A")
+    other.set("b", b"B")
+
+    cache.set("c", b"C")
+
+    assert _files(tmp_path) == ["b", "c"]
+
+
+def test_render_only_on_a_miss(monkeypatch):
+    renders = []
+
+    def render(content):
+        renders.append(content)
+        return f"PDF of {content}".encode()
+
+    monkeypatch.setattr(pdf_cache_module, "pdf_cache", PdfCache(directory=None, disk_max_files=0))
+    monkeypatch.setattr(pdf_cache_module.pdf_renderer, "render", render)
+
+    assert render_record_pdf("# Report") == render_record_pdf("# Report") == b"PDF of # Report"
+    render_record_pdf("# Edited")
+
+    assert renders == ["# Report", "# Edited"]
+
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_response_revalidates_with_etag(monkeypatch):
+    monkeypatch.setattr(pdf_cache_module, "pdf_cache", PdfCache(directory=None, disk_max_files=0))
+    monkeypatch.setattr(pdf_cache_module.pdf_renderer, "render", lambda content: b"%PDF")
+
+    first = pdf_response(_request(), "# Report", "report.pdf")
+    etag = first.headers["etag"]
+
+    assert first.status_code == 200 and first.body == b"%PDF"
+    assert pdf_response(_request(etag), "# Report", "report.pdf").status_code == 304
+    assert pdf_response(_request(etag), "# Edited", "report.pdf").status_code == 200
+
+
+def test_not_modified_skips_rendering(monkeypatch):
+    def render(content):
+        raise AssertionError("rendered")
+
+    monkeypatch.setattr(pdf_cache_module.pdf_renderer, "render", render)
+    etag = f'"{pdf_cache_key("# Report")}"'
+
+    assert pdf_response(_request(etag), "# Report", "report.pdf").status_code == 304
@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils import pdf_render
+from app.utils.pdf_render import PdfRenderer
+
+# Worker functions live at module level so spawned workers can import them
+
+
+def _no_init():
+    pass
+
+
+def _echo(markdown_text):
+    if markdown_text.startswith("sleep"):
+        time.sleep(float(markdown_text.split()[1]))
+    if markdown_text == "crash":
+        os._exit(1)
+    if markdown_text == "fail":
+        raise ValueError("bad markdown")
+    return f"PDF {markdown_text}".encode()
+
+
+@pytest.fixture
+def renderer(monkeypatch):
+    monkeypatch.setattr(pdf_render, "_init_worker", _no_init)
+    monkeypatch.setattr(pdf_render, "_render", _echo)
+    renderer = PdfRenderer(workers=1, max_pending=2, timeout_seconds=60)
+    renderer.render("warm")  # Spawned workers take a while to import the app
+    yield renderer
+    renderer.shutdown()
+
+
+def _error(call) -> HTTPException:
+    with pytest.raises(HTTPException) as exc:
+        call()
+    return exc.value
+
+
+def test_renders_in_a_worker_process(renderer):
+    assert renderer.render("# Report") == b"PDF # Report"
+    assert renderer.metrics()["count"] == 2
+
+
+def test_timeout_recycles_the_pool(renderer):
+    pool = renderer._pool
+    renderer.timeout_seconds = 1
+
+    error = _error(lambda: renderer.render("sleep 30"))
+
+    assert error.status_code == 504
+    assert renderer._pool is not pool
+    renderer.timeout_seconds = 60
+    assert renderer.render("# After") == b"PDF # After"
+    assert renderer.metrics()["timed_out"] == 1
+
+
+def test_crashed_worker_recycles_the_pool(renderer):
+    error = _error(lambda: renderer.render("crash"))
+
+    assert error.status_code == 503
+    assert renderer.render("# After") == b"PDF # After"
+
+
+def test_render_errors_are_500(renderer):
+    assert _error(lambda: renderer.render("fail")).status_code == 500
+    assert renderer.metrics()["failed"] == 1
+
+
+def test_full_queue_refuses_with_retry_after(renderer):
+    busy = [threading.Thread(target=renderer.render, args=("sleep 0.5",)) for _ in range(2)]
+    for thread in busy:
+        thread.start()
+    time.sleep(0.1)
+
+    error = _error(lambda: renderer.render("# Report"))
+    for thread in busy:
+        thread.join()
+
+    assert error.status_code == 503
+    assert error.headers["Retry-After"]
+    assert renderer.metrics()["rejected"] == 1
+    assert renderer.render("# Report") == b"PDF # Report"
@@ -0,0 +1,120 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app import oauth2
+from app.utils import rate_limit
+from app.utils.rate_limit import MemoryRateLimitBackend, RateLimitRule, charge, client_key
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = MemoryRateLimitBackend()
+    monkeypatch.setattr(rate_limit, "_backend", backend)
+    return backend
+
+
+def test_bucket_allows_a_burst_up_to_capacity(clock, backend):
+    for _ in range(3):
+        assert backend.consume("k", 1, 3, 1.0) == (True, 0.0)
+
+    allowed, wait = backend.consume("k", 1, 3, 1.0)
+    assert not allowed
+    assert wait == pytest.approx(1.0)
+
+
+def test_bucket_refills_at_its_rate(clock, backend):
+    assert backend.consume("k", 3, 3, 0.5)[0]
+
+    clock.now += 2  # One unit back at 0.5 units per second
+    assert backend.consume("k", 1, 3, 0.5)[0]
+    assert not backend.consume("k", 1, 3, 0.5)[0]
+
+
+def test_bucket_never_refills_past_capacity(clock, backend):
+    assert backend.consume("k", 1, 3, 1.0)[0]
+
+    clock.now += 3600
+    for _ in range(3):
+        assert backend.consume("k", 1, 3, 1.0)[0]
+    assert not backend.consume("k", 1, 3, 1.0)[0]
+
+
+def test_refused_request_takes_nothing(clock, backend):
+    assert backend.consume("k", 2, 3, 1.0)[0]
+
+    assert not backend.consume("k", 2, 3, 1.0)[0]
+    assert backend.consume("k", 1, 3, 1.0)[0]
+
+
+def test_buckets_are_independent(clock, backend):
+    assert backend.consume("a", 3, 3, 1.0)[0]
+
+    assert not backend.consume("a", 1, 3, 1.0)[0]
+    assert backend.consume("b", 1, 3, 1.0)[0]
+
+
+def test_client_key_uses_the_bearer_token_user():
+    token = oauth2.create_access_token({"user_id": 7})
+
+    assert client_key({"authorization": f"Bearer {token}"}, ("10.0.0.1", 1234)) == "user:7"
+
+
+def test_client_key_ignores_invalid_tokens():
+    assert client_key({"authorization": "Bearer not-a-token"}, ("10.0.0.1", 1234)) == "ip:10.0.0.1"
+
+
+def test_client_key_trusts_only_proxy_appended_hops():
+    # The first hop was sent by the client; the last one by our proxy
+    headers = {"x-forwarded-for": "6.6.6.6, 203.0.113.5"}
+
+    assert client_key(headers, ("10.0.0.1", 1234), trusted_proxies=1) == "ip:203.0.113.5"
+    assert client_key(headers, ("10.0.0.1", 1234), trusted_proxies=2) == "ip:6.6.6.6"
+    assert client_key(headers, ("10.0.0.1", 1234), trusted_proxies=0) == "ip:10.0.0.1"
+
+
+def test_client_key_falls_back_to_the_socket_on_short_chains():
+    headers = {"x-forwarded-for": "203.0.113.5"}
+
+    assert client_key(headers, ("10.0.0.1", 1234), trusted_proxies=2) == "ip:10.0.0.1"
+
+
+def _request(rule: RateLimitRule, key: str) -> Request:
+    return Request({"type": "http", "headers": [], "state": {"rate_limit": (rule, key)}})
+
+
+def test_charge_takes_units_from_the_bucket(clock, backend):
+    rule = RateLimitRule("ocr", "POST", r"^/ocr/", 3, 60)
+
+    charge(_request(rule, "k"), 2)
+    with pytest.raises(HTTPException) as exc:
+        charge(_request(rule, "k"), 2)
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) >= 1
+
+
+def test_charge_rejects_requests_larger_than_the_bucket(clock, backend):
+    rule = RateLimitRule("ocr", "POST", r"^/ocr/", 5, 60)
+
+    with pytest.raises(HTTPException) as exc:
+        charge(_request(rule, "k"), 5)  # Plus the unit taken on arrival
+    assert exc.value.status_code == 413
+
+
+def test_charge_without_a_rule_does_nothing(backend):
+    charge(Request({"type": "http", "headers": []}), 100)
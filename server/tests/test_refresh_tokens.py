@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from app import oauth2
+from app.routers import auth
+from app.utils import refresh_tokens
+from app.utils.refresh_tokens import (
+    REUSED,
+    ROTATED,
+    UNKNOWN,
+    MemoryRefreshTokenStore,
+    SqlRefreshTokenStore,
+)
+
+
+@pytest.fixture(params=["memory", "sql"])
+def store(request, db, monkeypatch):
+    store = MemoryRefreshTokenStore() if request.param == "memory" else SqlRefreshTokenStore()
+    monkeypatch.setattr(refresh_tokens, "_store", store)
+    return store
+
+
+def _expires(days: int = 1) -> datetime:
+    return datetime.utcnow() + timedelta(days=days)
+
+
+def test_token_rotates_once(store, make_user):
+    user = make_user()
+    store.add("a", "session", user.id, _expires())
+
+    assert store.consume("a", user.id) == ROTATED
+    assert store.consume("a", user.id) == REUSED
+
+
+def test_reuse_revokes_the_whole_session(store, make_user):
+    user = make_user()
+    store.add("a", "session", user.id, _expires())
+    store.add("b", "session", user.id, _expires())
+    store.add("c", "other-session", user.id, _expires())
+    assert store.consume("a", user.id) == ROTATED
+
+    assert store.consume("a", user.id) == REUSED
+    assert store.consume("b", user.id) == REUSED
+    assert store.consume("c", user.id) == ROTATED
+
+
+def test_unknown_expired_and_foreign_tokens(store, make_user):
+    user = make_user()
+    other = make_user()
+    store.add("expired", "session", user.id, _expires(days=-1))
+    store.add("a", "session", user.id, _expires())
+
+    assert store.consume("missing", user.id) == UNKNOWN
+    assert store.consume("expired", user.id) == UNKNOWN
+    assert store.consume("a", other.id) == UNKNOWN
+    assert store.consume("a", user.id) == ROTATED
+
+
+def test_revoke_user(store, make_user):
+    user = make_user()
+    other = make_user()
+    store.add("a", "s1", user.id, _expires())
+    store.add("b", "s2", other.id, _expires())
+
+    store.revoke_user(user.id)
+
+    assert store.consume("a", user.id) == REUSED
+    assert store.consume("b", other.id) == ROTATED
+
+
+def test_purge_expired(store, make_user):
+    user = make_user()
+    store.add("old", "session", user.id, _expires(days=-1))
+    store.add("new", "session", user.id, _expires())
+
+    assert store.purge_expired(batch_size=1) == 1
+    assert store.consume("new", user.id) == ROTATED
+
+
+def test_refresh_endpoint_rotates_and_detects_reuse(store, db, make_user):
+    user = make_user()
+    first = oauth2.create_refresh_token(oauth2.token_claims(user))
+
+    second = auth.refresh_token(first, db)["refresh_token"]
+
+    # Replaying the consumed token revokes the session, including its successor
+    with pytest.raises(HTTPException) as exc:
+        auth.refresh_token(first, db)
+    assert exc.value.status_code == 401
+    with pytest.raises(HTTPException):
+        auth.refresh_token(second, db)
+
+
+def test_refresh_endpoint_keeps_the_session(store, db, make_user):
+    user = make_user()
+    first = oauth2.create_refresh_token(oauth2.token_claims(user))
+
+    second = auth.refresh_token(first, db)["refresh_token"]
+
+    claims = [jwt.decode(token, oauth2.SECRET_KEY, algorithms=[oauth2.ALGORITHM]) for token in (first, second)]
+    assert claims[0]["sid"] == claims[1]["sid"]
+    assert claims[0]["jti"] != claims[1]["jti"]
+
+
+def test_refresh_endpoint_refuses_tokens_without_jti(store, db, make_user):
+    user = make_user()
+    legacy = jwt.encode(
+        {**oauth2.token_claims(user), "role": user.role.value, "token_type": "refresh", "exp": _expires()},
+        oauth2.SECRET_KEY,
+        algorithm=oauth2.ALGORITHM
+    )
+
+    with pytest.raises(HTTPException) as exc:
+        auth.refresh_token(legacy, db)
+    assert exc.value.status_code == 401
+
+
+def test_refresh_endpoint_refuses_access_tokens(store, db, make_user):
+    user = make_user()
+    access = oauth2.create_access_token(oauth2.token_claims(user))
+
+    with pytest.raises(HTTPException):
+        auth.refresh_token(access, db)
@@ -0,0 +1,50 @@
+import pytest
+from fastapi import HTTPException
+
+from app import models, oauth2
+
+require_doctor = oauth2.require_role(models.UserRole.DOCTOR)
+
+
+def _principal(user, db):
+    return oauth2.get_current_principal(oauth2.create_access_token(oauth2.token_claims(user)), db)
+
+
+def test_matching_claims_are_admitted_without_the_row(db, make_user):
+    doctor = make_user(role=models.UserRole.DOCTOR)
+    principal = _principal(doctor, db)
+    db.delete(doctor)
+    db.commit()
+
+    assert require_doctor(principal, db).id == doctor.id
+
+
+def test_claims_predating_a_promotion_are_confirmed_against_the_row(db, make_user):
+    user = make_user()
+    principal = _principal(user, db)
+    user.role = models.UserRole.DOCTOR
+    db.commit()
+
+    admitted = require_doctor(principal, db)
+
+    assert admitted.role == models.UserRole.DOCTOR
+    assert admitted.from_token is False
+
+
+def test_other_roles_are_refused(db, make_user):
+    principal = _principal(make_user(), db)
+
+    with pytest.raises(HTTPException) as exc:
+        require_doctor(principal, db)
+    assert exc.value.status_code == 403
+
+
+def test_cached_user_wins_over_stale_claims(db, make_user):
+    user = make_user(role=models.UserRole.DOCTOR)
+    token = oauth2.create_access_token(oauth2.token_claims(user))
+    oauth2.get_current_user(token, db)
+
+    principal = oauth2.get_current_principal(token, db)
+
+    assert principal.from_token is False
+    assert principal.role == models.UserRole.DOCTOR
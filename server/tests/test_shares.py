@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app import models
+from app.utils import shares
+from app.utils.shares import get_or_create_share, resolve_record_share, sweep_shares
+
+
+@pytest.fixture
+def record(make_user, make_record):
+    return make_record(make_user())
+
+
+def _share(db, record, expires_in_days=None):
+    return get_or_create_share(db, created_by=record.user_id, record_id=record.id, expires_in_days=expires_in_days)
+
+
+def test_same_request_reuses_the_share(db, record):
+    first = _share(db, record, expires_in_days=7)
+
+    assert _share(db, record, expires_in_days=7).id == first.id
+    assert db.query(models.Share).count() == 1
+
+
+def test_never_expiring_share_is_reused_without_expiry(db, record):
+    first = _share(db, record)
+
+    assert first.expires_at is None
+    assert _share(db, record).id == first.id
+
+
+def test_never_expiring_share_does_not_satisfy_an_expiring_request(db, record):
+    forever = _share(db, record)
+
+    weekly = _share(db, record, expires_in_days=7)
+
+    assert weekly.id != forever.id
+    assert weekly.expires_at is not None
+
+
+def test_request_without_expiry_does_not_extend_an_expiring_share(db, record):
+    weekly = _share(db, record, expires_in_days=7)
+    expires_at = weekly.expires_at
+
+    forever = _share(db, record)
+
+    assert forever.id != weekly.id
+    db.refresh(weekly)
+    assert weekly.expires_at == expires_at
+
+
+def test_different_lifetimes_get_different_shares(db, record):
+    assert _share(db, record, expires_in_days=1).id != _share(db, record, expires_in_days=7).id
+
+
+def test_shares_are_per_creator(db, record, make_user):
+    other = make_user()
+    mine = _share(db, record)
+
+    theirs = get_or_create_share(db, created_by=other.id, record_id=record.id)
+
+    assert theirs.id != mine.id
+
+
+def test_expiry_is_rounded_down_to_the_hour(db, record):
+    before = datetime.utcnow()
+    share = _share(db, record, expires_in_days=7)
+
+    assert share.expires_at.minute == share.expires_at.second == share.expires_at.microsecond == 0
+    assert before + timedelta(days=7) - timedelta(hours=1) < share.expires_at <= before + timedelta(days=7)
+
+
+def test_default_lifetime(db, record, monkeypatch):
+    monkeypatch.setattr(shares, "SHARE_DEFAULT_TTL_DAYS", "3")
+
+    share = _share(db, record)
+
+    assert share.expires_at is not None
+    assert share.expires_at <= datetime.utcnow() + timedelta(days=3)
+
+
+def test_active_share_resolves(db, record):
+    share = _share(db, record, expires_in_days=1)
+
+    row = resolve_record_share(db, share.share_token)
+
+    assert row.id == record.id
+    assert row.content == record.content
+
+
+def test_expired_share_does_not_resolve(db, record):
+    share = _share(db, record, expires_in_days=1)
+    share.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    db.commit()
+
+    with pytest.raises(HTTPException) as exc:
+        resolve_record_share(db, share.share_token)
+    assert exc.value.status_code == 404
+
+
+def test_sweep_deactivates_expired_shares(db, record):
+    share = _share(db, record, expires_in_days=1)
+    share.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    live = _share(db, record)
+    db.commit()
+
+    counts = sweep_shares(batch_size=1)
+
+    assert counts == {"deactivated": 1, "deleted": 0}
+    db.expire_all()
+    assert share.is_active is False
+    assert share.reuse_key is None
+    assert live.is_active is True
+
+
+def test_sweep_deletes_long_inactive_shares(db, record, monkeypatch):
+    share = _share(db, record, expires_in_days=1)
+    share.expires_at = datetime.utcnow() - timedelta(days=40)
+    db.commit()
+    monkeypatch.setattr(shares, "SHARE_RETENTION_DAYS", 30)
+
+    counts = sweep_shares()
+
+    assert counts == {"deactivated": 1, "deleted": 1}
+    db.expire_all()
+    assert db.query(models.Share).count() == 0
+
+
+def test_request_after_sweep_creates_a_new_share(db, record):
+    share = _share(db, record, expires_in_days=1)
+    share.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    db.commit()
+    sweep_shares()
+    db.expire_all()
+
+    assert _share(db, record, expires_in_days=1).id != share.id
@@ -0,0 +1,106 @@
+import pyotp
+import pytest
+from fastapi import HTTPException
+
+from app.utils import totp as totp_module
+from app.utils.totp import TotpVerifier
+
+SECRET = pyotp.random_base32()
+
+
+class FrozenTime:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Start of a time step, so stepping forward 30 seconds lands in the next one
+    clock = FrozenTime(1_700_000_010.0)
+    monkeypatch.setattr(totp_module, "time", clock)
+    return clock
+
+
+def _code(clock: FrozenTime, offset_steps: int = 0) -> str:
+    return pyotp.TOTP(SECRET).at(int(clock.now) + 30 * offset_steps)
+
+
+def test_valid_code_is_accepted_once(clock):
+    verifier = TotpVerifier(valid_window=0)
+    code = _code(clock)
+
+    assert verifier.verify(1, SECRET, code)
+    assert not verifier.verify(1, SECRET, code)
+
+
+def test_replay_is_tracked_per_user(clock):
+    verifier = TotpVerifier(valid_window=0)
+    code = _code(clock)
+
+    assert verifier.verify(1, SECRET, code)
+    assert verifier.verify(2, SECRET, code)
+
+
+def test_next_step_code_is_accepted(clock):
+    verifier = TotpVerifier(valid_window=0)
+    assert verifier.verify(1, SECRET, _code(clock))
+
+    clock.now += 30
+    assert verifier.verify(1, SECRET, _code(clock))
+
+
+def test_replay_is_refused_for_the_whole_valid_window(clock):
+    verifier = TotpVerifier(valid_window=1)
+    code = _code(clock)
+    assert verifier.verify(1, SECRET, code)
+
+    # Still inside the window as the previous step, but already used
+    clock.now += 30
+    assert not verifier.verify(1, SECRET, code)
+
+
+def test_malformed_and_wrong_codes_are_refused(clock):
+    verifier = TotpVerifier(valid_window=0)
+
+    assert not verifier.verify(1, SECRET, "12345")
+    assert not verifier.verify(1, SECRET, "abcdef")
+    assert not verifier.verify(1, SECRET, _code(clock, offset_steps=5))
+    assert not verifier.verify(1, "", _code(clock))
+
+
+def test_failures_lock_the_user_out(clock):
+    verifier = TotpVerifier(max_attempts=3, valid_window=0)
+    wrong = _code(clock, offset_steps=5)
+    for _ in range(3):
+        verifier.check_rate_limit(1)
+        assert not verifier.verify(1, SECRET, wrong)
+
+    with pytest.raises(HTTPException) as exc:
+        verifier.check_rate_limit(1)
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == str(verifier.attempt_window_seconds)
+    verifier.check_rate_limit(2)
+
+
+def test_replays_count_as_failures(clock):
+    verifier = TotpVerifier(max_attempts=2, valid_window=0)
+    code = _code(clock)
+    assert verifier.verify(1, SECRET, code)
+
+    assert not verifier.verify(1, SECRET, code)
+    assert not verifier.verify(1, SECRET, code)
+    with pytest.raises(HTTPException):
+        verifier.check_rate_limit(1)
+
+
+def test_success_clears_failures(clock):
+    verifier = TotpVerifier(max_attempts=2, valid_window=0)
+    wrong = _code(clock, offset_steps=5)
+    assert not verifier.verify(1, SECRET, wrong)
+    assert verifier.verify(1, SECRET, _code(clock))
+
+    assert not verifier.verify(1, SECRET, wrong)
+    verifier.check_rate_limit(1)
@@ -0,0 +1,130 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from app import models, oauth2
+from app.database import SessionLocal
+from app.utils import user_cache
+from app.utils.token_revocations import sync_token_revocations
+
+
+def _token(user) -> str:
+    return oauth2.create_access_token(oauth2.token_claims(user))
+
+
+def _rename_elsewhere(user_id: int, first_name: str) -> None:
+    """Change a user the way another worker would: without touching this worker's caches."""
+    other = SessionLocal()
+    try:
+        other.execute(update(models.User.__table__).where(
+            models.User.__table__.c.id == user_id
+        ).values(first_name=first_name))
+        other.commit()
+    finally:
+        other.close()
+
+
+def _unauthorized(call):
+    with pytest.raises(HTTPException) as exc:
+        call()
+    assert exc.value.status_code == 401
+
+
+def test_second_request_is_served_from_the_cache(db, make_user):
+    user = make_user(first_name="Ada")
+    token = _token(user)
+    oauth2.get_current_user(token, db)
+    _rename_elsewhere(user.id, "Grace")
+    db.expire_all()
+
+    assert oauth2.get_current_user(token, db).first_name == "Ada"
+
+
+def test_invalidation_reloads_the_user(db, make_user):
+    user = make_user(first_name="Ada")
+    token = _token(user)
+    oauth2.get_current_user(token, db)
+    _rename_elsewhere(user.id, "Grace")
+    db.expire_all()
+
+    user_cache.invalidate_user_cache(user.id)
+
+    assert oauth2.get_current_user(token, db).first_name == "Grace"
+
+
+def test_write_paths_always_load_the_row(db, make_user):
+    user = make_user(first_name="Ada")
+    token = _token(user)
+    oauth2.get_current_user(token, db)
+    _rename_elsewhere(user.id, "Grace")
+    db.expire_all()
+
+    assert oauth2.get_current_user_for_update(token, db).first_name == "Grace"
+
+
+def test_revoked_tokens_are_refused_even_when_cached(db, make_user):
+    user = make_user()
+    old = _token(user)
+    oauth2.get_current_user(old, db)
+
+    oauth2.revoke_tokens(user)
+    db.commit()
+
+    _unauthorized(lambda: oauth2.get_current_user(old, db))
+    _unauthorized(lambda: oauth2.get_current_principal(old, db))
+    assert oauth2.get_current_user(_token(user), db).id == user.id
+
+
+def test_deleted_users_are_refused(db, make_user):
+    user = make_user()
+    token = _token(user)
+    oauth2.get_current_user(token, db)
+
+    oauth2.revoke_deleted_user(db, user.id)
+    db.delete(user)
+    db.commit()
+
+    _unauthorized(lambda: oauth2.get_current_user(token, db))
+
+
+def test_revocations_from_other_workers_apply_after_sync(db, make_user):
+    user = make_user()
+    token = _token(user)
+    oauth2.get_current_user(token, db)
+    other = SessionLocal()
+    try:
+        # Written directly, so this worker's mirror only learns of it by syncing
+        other.add(models.TokenRevocation(user_id=user.id, min_version=1, revoked_at=datetime.utcnow()))
+        other.commit()
+    finally:
+        other.close()
+
+    assert sync_token_revocations() == 1
+
+    _unauthorized(lambda: oauth2.get_current_user(token, db))
+    assert user_cache.get_cached_snapshot(user.id, None) is None
+
+
+def test_rolled_back_revocations_do_not_apply(db, make_user):
+    user = make_user()
+    token = _token(user)
+
+    oauth2.revoke_tokens(user)
+    db.rollback()
+
+    assert oauth2.get_current_user(token, db).id == user.id
+
+
+def test_principal_comes_from_the_claims_without_the_row(db, make_user):
+    user = make_user()
+    token = _token(user)
+    db.delete(user)
+    db.commit()
+
+    principal = oauth2.get_current_principal(token, db)
+
+    assert principal.id == user.id
+    assert principal.from_token is True
+    assert principal.role == models.UserRole.PATIENT